@@ -0,0 +1,220 @@
+/*
+ * file: libwapiti.c
+ *
+ * Description: a small C API over Wapiti 1.5.0 to load a model once and
+ * label sequences given as arrays of tokens, used by obj/libwapiti.py
+ * through ctypes. It is built with the sources of ext/wapiti, see the
+ * Makefile in this directory.
+ *
+ * author: Yoann Dupont
+ * copyright (c) 2016 Yoann Dupont - all rights reserved
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program. If not, see GNU official website.
+ */
+#include <errno.h>
+#include <setjmp.h>
+#include <stdarg.h>
+
+/* The reader is included rather than linked so that sequences can be built
+ * directly from token arrays with its static rdr_pattok2seq and
+ * rdr_rawtok2seq functions. */
+#include "reader.c"
+
+#include "decoder.h"
+#include "model.h"
+#include "options.h"
+
+typedef struct semw_model_s semw_model_t;
+struct semw_model_s {
+	opt_t  opt;
+	mdl_t *mdl;
+};
+
+/* Wapiti calls fatal() on any error, which exits the process. The fatal
+ * and pfatal of the copy of tools.c linked in the library are made weak,
+ * the ones below replace them (for the calls from tools.c as well) and jump
+ * back to the API call with the message instead. */
+static __thread jmp_buf *semw_env = NULL;
+static __thread char     semw_msg[1024] = "";
+
+static void semw_fail(const char *msg, va_list args, const char *err) {
+	int len = vsnprintf(semw_msg, sizeof(semw_msg), msg, args);
+	if (err != NULL && len >= 0 && (size_t)len < sizeof(semw_msg))
+		snprintf(semw_msg + len, sizeof(semw_msg) - len, " <%s>", err);
+	if (semw_env != NULL)
+		longjmp(*semw_env, 1);
+	fprintf(stderr, "error: %s\n", semw_msg);
+	exit(EXIT_FAILURE);
+}
+
+void fatal(const char *msg, ...) {
+	va_list args;
+	va_start(args, msg);
+	semw_fail(msg, args, NULL);
+	va_end(args);
+}
+
+void pfatal(const char *msg, ...) {
+	const char *err = strerror(errno);
+	va_list args;
+	va_start(args, msg);
+	semw_fail(msg, args, err);
+	va_end(args);
+}
+
+/* semw_error:
+ *   Returns the message of the last error that occured in the calling
+ *   thread.
+ */
+const char *semw_error(void) {
+	return semw_msg;
+}
+
+/* semw_drop:
+ *   Frees a model whose loading failed half way. The patterns of the reader
+ *   may not all be read: they are only freed once the labels, which come
+ *   after them in the file, started to be read. Otherwise the patterns
+ *   already compiled are lost rather than freeing uninitialised ones.
+ */
+static void semw_drop(mdl_t *mdl) {
+	rdr_t *rdr = mdl->reader;
+	if (rdr->pats == NULL || qrk_count(rdr->lbl) == 0)
+		rdr->npats = 0;
+	mdl_free(mdl);
+}
+
+/* semw_load:
+ *   Loads a model file. Returns NULL on error.
+ */
+semw_model_t *semw_load(const char *path) {
+	jmp_buf env;
+	// both are read after a longjmp, hence volatile.
+	semw_model_t *volatile model = NULL;
+	FILE *volatile file = NULL;
+	if (setjmp(env) != 0) {
+		semw_env = NULL;
+		if (file != NULL)
+			fclose(file);
+		if (model != NULL) {
+			if (model->mdl != NULL)
+				semw_drop(model->mdl);
+			free(model);
+		}
+		return NULL;
+	}
+	semw_env = &env;
+	file = fopen(path, "r");
+	if (file == NULL)
+		pfatal("cannot open model file %s", path);
+	model = xmalloc(sizeof(semw_model_t));
+	model->opt = opt_defaults;
+	model->mdl = NULL;
+	model->mdl = mdl_new(rdr_new(false));
+	model->mdl->opt = &model->opt;
+	mdl_load(model->mdl, file);
+	fclose(file);
+	semw_env = NULL;
+	return model;
+}
+
+/* semw_free:
+ *   Frees a model returned by semw_load.
+ */
+void semw_free(semw_model_t *model) {
+	if (model == NULL)
+		return;
+	mdl_free(model->mdl);
+	free(model);
+}
+
+/* semw_nlabels:
+ *   Returns the number of labels of the model.
+ */
+uint32_t semw_nlabels(const semw_model_t *model) {
+	return model->mdl->nlbl;
+}
+
+/* semw_labelstr:
+ *   Returns the string of a label identifier.
+ */
+const char *semw_labelstr(const semw_model_t *model, uint32_t label) {
+	return qrk_id2str(model->mdl->reader->lbl, label);
+}
+
+/* semw_label:
+ *   Labels a sequence of T tokens. tokens holds the columns of every token
+ *   one after the other, counts[t] being the number of columns of token t.
+ *   The identifiers of the best labels are written in out. Returns 0 on
+ *   success and -1 on error.
+ *
+ *   The model is only read, so a model can label sequences from several
+ *   threads at once.
+ */
+int semw_label(semw_model_t *model, uint32_t T, const uint32_t counts[],
+               char *tokens[], uint32_t out[]) {
+	if (T == 0)
+		return 0;
+	// a token without the columns the patterns read makes Wapiti fail
+	// while it builds the sequence, what it allocated would be lost.
+	const rdr_t *reader = model->mdl->reader;
+	uint32_t ncols = 0;
+	for (uint32_t p = 0; p < reader->npats; p++) {
+		const pat_t *pat = reader->pats[p];
+		for (uint32_t i = 0; i < pat->nitems; i++)
+			if (pat->items[i].type != 's')
+				ncols = max(ncols, pat->items[i].column + 1);
+	}
+	for (uint32_t t = 0; t < T; t++) {
+		if (counts[t] < ncols) {
+			snprintf(semw_msg, sizeof(semw_msg),
+			         "missing tokens, cannot apply pattern");
+			return -1;
+		}
+	}
+	jmp_buf env;
+	// freed after a longjmp if the error came once they were allocated.
+	tok_t  *volatile tok     = NULL;
+	seq_t  *volatile seq     = NULL;
+	double *volatile pscores = NULL;
+	if (setjmp(env) != 0) {
+		semw_env = NULL;
+		free(tok);
+		if (seq != NULL)
+			rdr_freeseq(seq);
+		free(pscores);
+		return -1;
+	}
+	semw_env = &env;
+	mdl_t *mdl = model->mdl;
+	rdr_t *rdr = mdl->reader;
+	tok = xmalloc(sizeof(tok_t) + T * sizeof(char **));
+	tok->len  = T;
+	tok->lbl  = NULL;
+	tok->cnts = (uint32_t *)counts;
+	for (uint32_t t = 0, n = 0; t < T; n += counts[t++])
+		tok->toks[t] = tokens + n;
+	if (rdr->npats == 0)
+		seq = rdr_rawtok2seq(rdr, tok);
+	else
+		seq = rdr_pattok2seq(rdr, tok);
+	free(tok);
+	tok = NULL;
+	double score;
+	pscores = xmalloc(sizeof(double) * T);
+	tag_viterbi(mdl, seq, out, &score, pscores);
+	free(pscores);
+	rdr_freeseq(seq);
+	semw_env = NULL;
+	return 0;
+}
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: cache.py
+
+Description: caches used to avoid recomputing results. LRUCache is a
+bounded in-memory cache, DiskStore a persistent key-value store backed by
+SQLite, LabelCache caches the labels Wapiti gives to sentences and
+StageCache the states of documents along a pipeline.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see GNU official website.
+"""
+
+import base64
+import collections
+import cPickle
+import hashlib
+import os, os.path
+import sqlite3
+import threading
+import zlib
+
+class LRUCache(object):
+    """
+    A dictionary holding at most capacity items. When full, the least
+    recently used item is evicted.
+    
+    Attributes
+    ----------
+    _capacity : int
+        the maximum number of items
+    _items : collections.OrderedDict
+        the items, from the least to the most recently used
+    _hits : int
+        the number of successful lookups
+    _misses : int
+        the number of failed lookups
+    _evictions : int
+        the number of evicted items
+    """
+    
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError("cache capacity must be positive, got %s" %capacity)
+        
+        self._capacity  = capacity
+        self._items     = collections.OrderedDict()
+        self._hits      = 0
+        self._misses    = 0
+        self._evictions = 0
+        self._lock      = threading.Lock()
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __contains__(self, key):
+        return key in self._items
+    
+    @property
+    def capacity(self):
+        return self._capacity
+    
+    @property
+    def hits(self):
+        return self._hits
+    
+    @property
+    def misses(self):
+        return self._misses
+    
+    @property
+    def evictions(self):
+        return self._evictions
+    
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self._misses += 1
+                return default
+            self._items[key] = value
+            self._hits += 1
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self._capacity:
+                self._items.popitem(last=False)
+                self._evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+    
+    def stats(self):
+        """
+        Returns a dictionary with the size and hit/miss/eviction counts.
+        """
+        
+        return {"size":len(self._items), "capacity":self._capacity, "hits":self._hits, "misses":self._misses, "evictions":self._evictions}
+
+class DiskStore(object):
+    """
+    A persistent mapping from str keys to unicode values, stored in an
+    SQLite database. An SQLite connection cannot be used across a fork, a
+    forked process opens its own connection.
+    
+    Attributes
+    ----------
+    _path : str
+        the database file
+    _connection : sqlite3.Connection
+        the connection to the database
+    _pid : int
+        the identifier of the process that opened the connection
+    """
+    
+    def __init__(self, path):
+        self._path       = path
+        self._lock       = threading.Lock()
+        self._connection = None
+        self._pid        = None
+        self.connection.execute("CREATE TABLE IF NOT EXISTS store (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.commit()
+    
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM store").fetchone()[0]
+    
+    @property
+    def path(self):
+        return self._path
+    
+    @property
+    def connection(self):
+        if self._pid != os.getpid():
+            # processes writing concurrently wait for each other.
+            self._connection = sqlite3.connect(self._path, timeout=60, check_same_thread=False)
+            self._pid        = os.getpid()
+        return self._connection
+    
+    def __contains__(self, key):
+        with self._lock:
+            return self.connection.execute("SELECT 1 FROM store WHERE key = ?", (key,)).fetchone() is not None
+    
+    def get(self, key, default=None):
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM store WHERE key = ?", (key,)).fetchone()
+        return (row[0] if row is not None else default)
+    
+    def put_many(self, items):
+        """
+        Stores (key, value) couples at once, in a single transaction.
+        """
+        
+        with self._lock:
+            self.connection.executemany("INSERT OR REPLACE INTO store (key, value) VALUES (?, ?)", items)
+            self.connection.commit()
+    
+    def put(self, key, value):
+        self.put_many([(key, value)])
+    
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid        = None
+
+__digests = {}
+
+def file_digest(path):
+    """
+    Returns the SHA-1 hex digest of the content of a file. Digests are
+    computed once per file and recomputed if the file changed.
+    """
+    
+    key   = os.path.abspath(path)
+    mtime = os.path.getmtime(key)
+    if key not in __digests or __digests[key][0] != mtime:
+        digest = hashlib.sha1()
+        with open(key, "rb") as input_stream:
+            for block in iter(lambda: input_stream.read(1 << 20), ""):
+                digest.update(block)
+        __digests[key] = (mtime, digest.hexdigest())
+    return __digests[key][1]
+
+class LabelCache(object):
+    """
+    A cache of the labels Wapiti gives to sentences. The key of a sentence
+    is the hash of the model file and of the exact lines given to Wapiti,
+    so that a cached result is only reused for the same model and the same
+    features.
+    
+    Sentences are looked up in a bounded in-memory LRU cache, then in an
+    optional on-disk store that persists across runs.
+    
+    Attributes
+    ----------
+    _memory : LRUCache
+        the in-memory cache
+    _disk : DiskStore
+        the on-disk store, None if labels are only kept in memory
+    _disk_hits : int
+        the number of sentences found on disk but not in memory
+    """
+    
+    def __init__(self, capacity=10000, path=None):
+        self._memory    = LRUCache(capacity)
+        self._disk      = (DiskStore(path) if path is not None else None)
+        self._disk_hits = 0
+    
+    @property
+    def memory(self):
+        return self._memory
+    
+    @property
+    def disk(self):
+        return self._disk
+    
+    def key(self, model_digest, sentence):
+        digest = hashlib.sha1(model_digest)
+        digest.update(u"\n".join(sentence).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def get(self, key):
+        """
+        Returns the labels of the sentence with the given key, None if it
+        is not in the cache.
+        """
+        
+        tags = self._memory.get(key)
+        if tags is None and self._disk is not None:
+            value = self._disk.get(key)
+            if value is not None:
+                tags = value.split(u"\n")
+                self._memory.put(key, tags)
+                self._disk_hits += 1
+        return (tags[:] if tags is not None else None)
+    
+    def put_many(self, items):
+        """
+        Caches (key, tags) couples.
+        """
+        
+        for key, tags in items:
+            self._memory.put(key, tags[:])
+        if self._disk is not None:
+            self._disk.put_many([(key, u"\n".join(tags)) for key, tags in items])
+    
+    def label(self, sentences, model, label_function):
+        """
+        Returns the labels of sentences, calling label_function on the
+        sentences that are not cached and caching their labels.
+        
+        Parameters
+        ----------
+        sentences : list of list of unicode
+            the sentences to label, one line per token.
+        model : str
+            the Wapiti model file.
+        label_function : function
+            called with the list of sentences to label, returns their
+            labels.
+        """
+        
+        digest  = file_digest(model)
+        keys    = [self.key(digest, sentence) for sentence in sentences]
+        tags    = [self.get(key) for key in keys]
+        missing = [nth for nth, sentence_tags in enumerate(tags) if sentence_tags is None]
+        
+        # the same sentence may appear several times, it is labelled once.
+        unique = collections.OrderedDict()
+        for nth in missing:
+            unique.setdefault(keys[nth], nth)
+        if unique:
+            labelled = label_function([sentences[nth] for nth in unique.values()])
+            self.put_many(zip(unique.keys(), labelled))
+            labelled = dict(zip(unique.keys(), labelled))
+            for nth in missing:
+                tags[nth] = labelled[keys[nth]][:]
+        
+        return tags
+    
+    def stats(self):
+        """
+        Returns a dictionary of statistics: the size, capacity and
+        evictions of the memory cache, the hits (in memory or on disk),
+        misses, the hits that came from disk and the number of sentences
+        on disk.
+        """
+        
+        stats = self._memory.stats()
+        stats["hits"]     += self._disk_hits
+        stats["misses"]   -= self._disk_hits
+        stats["disk_hits"] = self._disk_hits
+        stats["disk_size"] = (len(self._disk) if self._disk is not None else 0)
+        return stats
+    
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+class StageCache(object):
+    """
+    A persistent cache of the states of documents after each process of a
+    pipeline. States are content-addressed: the key of the state after a
+    process is the hash of the key of the state before it and of the
+    description of the process (see key), the first key being the hash of
+    the input document (see document_key). A state is therefore only
+    found again if the input and every process up to it are the same, and
+    a pipeline can resume from the first process that changed.
+    
+    Attributes
+    ----------
+    _disk : DiskStore
+        the store of the states, compressed pickled documents.
+    _hits : int
+        the number of states found in the cache
+    _misses : int
+        the number of states computed
+    """
+    
+    def __init__(self, path):
+        self._disk   = DiskStore(path)
+        self._hits   = 0
+        self._misses = 0
+    
+    def __contains__(self, key):
+        return key in self._disk
+    
+    @property
+    def disk(self):
+        return self._disk
+    
+    def document_key(self, document):
+        """
+        Returns the key of a document before any process: the hash of its
+        content and of its corpus. The name of the document is left out,
+        documents with the same content share their states.
+        """
+        
+        digest = hashlib.sha1((document.content or u"").encode("utf-8"))
+        digest.update(u"\t".join(document.corpus.fields).encode("utf-8"))
+        digest.update(unicode(document.corpus).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def key(self, previous, description):
+        digest = hashlib.sha1(previous)
+        digest.update(description.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def put(self, key, document):
+        """
+        Stores the state of a document.
+        """
+        
+        self._misses += 1
+        self._disk.put(key, base64.b64encode(zlib.compress(cPickle.dumps(document, cPickle.HIGHEST_PROTOCOL))))
+    
+    def load(self, key, document):
+        """
+        Puts document in the state stored with the given key, its name is
+        kept.
+        """
+        
+        state = cPickle.loads(zlib.decompress(base64.b64decode(self._disk.get(key))))
+        name  = document.name
+        document.__dict__.clear()
+        document.__dict__.update(state.__dict__)
+        document._name = name
+        for holder in document.segmentations.values() + document.annotations.values():
+            holder._document = document
+    
+    def hit(self):
+        self._hits += 1
+    
+    def stats(self):
+        """
+        Returns a dictionary with the number of states found (hits),
+        computed (misses) and stored.
+        """
+        
+        return {"hits":self._hits, "misses":self._misses, "size":len(self._disk)}
+    
+    def close(self):
+        self._disk.close()
@@ -0,0 +1,528 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: crf.py
+
+Description: an in-process decoder for the linear-chain CRF models written
+by Wapiti. It reads the text model files, applies their patterns to the
+input tokens and runs Viterbi with NumPy, without starting any process.
+Decoding should give the same labels as "wapiti label".
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see GNU official website.
+"""
+
+import os.path
+import re
+
+import numpy
+
+# Wapiti model types, as written in the model file header.
+MAXENT = 0
+MEMM   = 1
+CRF    = 2
+
+# Wapiti works on bytes with the C locale character classes.
+_classes = {
+    "a" : "A-Za-z",
+    "d" : "0-9",
+    "l" : "a-z",
+    "p" : re.escape("!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~"),
+    "s" : " \\t\\n\\v\\f\\r",
+    "u" : "A-Z",
+    "w" : "A-Za-z0-9"
+}
+
+def translate_regexp(regexp):
+    """
+    Translates a Wapiti regular expression to a python one.
+    
+    Wapiti implements a small subset of regular expressions with
+    backtracking: "*" is tried from the shortest match on and "?" from
+    the longest one, which is what "*?" and "?" do in python.
+    
+    Parameters
+    ----------
+    regexp : str
+        the Wapiti regular expression.
+    
+    Returns
+    -------
+    str
+        the equivalent python regular expression.
+    """
+    
+    parts = []
+    i     = 0
+    if regexp.startswith("^"):
+        parts.append("\\A")
+        i = 1
+    while i < len(regexp):
+        c = regexp[i]
+        if c == "$" and i == len(regexp)-1:
+            parts.append("\\Z")
+            break
+        if c in "*?":
+            raise ValueError("unescaped * or ? in regexp: %s" %regexp)
+        if c == "." :
+            item = "."
+        elif c == "\\" and i+1 < len(regexp):
+            i += 1
+            c  = regexp[i]
+            if c.lower() in _classes:
+                item = ("[%s]" if c.islower() else "[^%s]") %_classes[c.lower()]
+            else:
+                item = re.escape(c)
+        else:
+            item = re.escape(c)
+        i += 1
+        if i < len(regexp) and regexp[i] == "*":
+            item += "*?"
+            i    += 1
+        elif i < len(regexp) and regexp[i] == "?":
+            item += "?"
+            i    += 1
+        parts.append(item)
+    return "".join(parts)
+
+class Pattern(object):
+    """
+    A compiled Wapiti pattern. A pattern is a string with commands of the
+    form %c[offset,column] or %c[offset,column,"regexp"] that are replaced
+    by a value computed on the token found at the relative (or absolute
+    if offset starts with "@") offset and the given column.
+    
+    Attributes
+    ----------
+    _source : str
+        the pattern as written in the model file
+    _items : list of tuple
+        the compiled items of the pattern. An item is a tuple (type,
+        value, offset, column, absolute, caps).
+    """
+    
+    _command = re.compile(r'%([xXtTmM])\[(@?)([+-]?\d+),(\d+)(?:,"((?:[^"\\]|\\.)*)")?\]')
+    _bounds  = (["_x-1", "_x-2", "_x-3", "_x-4", "_x-#"], ["_x+1", "_x+2", "_x+3", "_x+4", "_x+#"])
+    
+    def __init__(self, source):
+        self._source = source
+        self._items  = []
+        self._ntoks  = 0
+        
+        pos = 0
+        for match in Pattern._command.finditer(source):
+            if match.start() != pos:
+                self._add_string(source[pos : match.start()])
+            command = match.group(1)
+            column  = int(match.group(4))
+            regexp  = match.group(5)
+            if command.lower() in "tm":
+                if regexp is None:
+                    raise ValueError("missing arg in pattern: %s" %source)
+                regexp = re.compile(translate_regexp(regexp), re.S)
+            self._items.append((command.lower(), regexp, int(match.group(3)), column, match.group(2) == "@", command.isupper()))
+            self._ntoks = max(self._ntoks, column)
+            pos = match.end()
+        if pos != len(source):
+            self._add_string(source[pos:])
+    
+    def _add_string(self, string):
+        if "%" in string:
+            raise ValueError("invalid pattern: %s" %self._source)
+        self._items.append(("s", string, 0, 0, False, False))
+    
+    @property
+    def source(self):
+        return self._source
+    
+    @property
+    def kind(self):
+        return self._source[0].lower()
+    
+    def __call__(self, tokens):
+        """
+        Returns the observations of the pattern at every position of a
+        sequence.
+        
+        Parameters
+        ----------
+        tokens : list of list of str
+            the columns of each token of the sequence.
+        """
+        
+        length = len(tokens)
+        parts  = []
+        for kind, value, offset, column, absolute, caps in self._items:
+            if kind == "s":
+                parts.append([value] * length)
+                continue
+            
+            if absolute:
+                position = (offset + length if offset < 0 else offset - 1)
+                values   = [self._token(tokens, position, column)] * length
+            else:
+                values = [self._token(tokens, at + offset, column) for at in xrange(length)]
+            
+            if kind in "tm":
+                results = {}
+                for token in set(values):
+                    match = value.search(token)
+                    if kind == "t":
+                        results[token] = ("true" if match else "false")
+                    else:
+                        results[token] = (match.group() if match else "")
+                values = [results[token] for token in values]
+            
+            parts.append([token.lower() for token in values] if caps else values)
+        
+        if len(parts) == 1:
+            return parts[0]
+        return ["".join(observation) for observation in zip(*parts)]
+    
+    def _token(self, tokens, position, column):
+        if position < 0:
+            return Pattern._bounds[0][min(-position-1, 4)]
+        elif position >= len(tokens):
+            return Pattern._bounds[1][min(position-len(tokens), 4)]
+        elif column >= len(tokens[position]):
+            raise ValueError("missing tokens, cannot apply pattern: %s" %self._source)
+        return tokens[position][column]
+
+def _read_netstrings(data, pos, count):
+    """
+    Reads count netstrings ("<length>:<string>," and a newline) from data, starting at
+    byte pos. Returns the strings and the position after the last one.
+    """
+    
+    # Strings written by Wapiti never contain a newline in practice, which
+    # allows to split lines at once. The lengths are checked and the slow
+    # way is used if a string happens to contain one.
+    lines   = data[pos:].split("\n", count)[:count]
+    colons  = [line.find(":") for line in lines]
+    strings = [line[colon+1 : -1] for line, colon in zip(lines, colons)]
+    if len(lines) == count and all(colon > 0 and line[-1:] == "," and int(line[:colon]) == len(string) for line, colon, string in zip(lines, colons, strings)):
+        return strings, pos + sum(len(line) for line in lines) + count
+    
+    strings = []
+    for _ in xrange(count):
+        colon = data.index(":", pos)
+        start = colon + 1
+        end   = start + int(data[pos : colon])
+        if data[end] != ",":
+            raise ValueError("invalid netstring at byte %i" %pos)
+        strings.append(data[start : end])
+        pos = end + 2 # skipping the comma and the newline
+    return strings, pos
+
+def _read_header(data, pos, prefix):
+    end = data.index("\n", pos)
+    if not data.startswith(prefix, pos):
+        raise ValueError('expected "%s" at byte %i' %(prefix, pos))
+    return data[pos + len(prefix) : end], end+1
+
+class Model(object):
+    """
+    A Wapiti model loaded in memory.
+    
+    Weights are stored in one NumPy vector laid out as in Wapiti: each
+    unigram observation has a block of Y weights (one per label) and each
+    bigram observation has a block of Y*Y weights (one per couple of
+    labels).
+    
+    Attributes
+    ----------
+    _type : int
+        the model type (MAXENT, MEMM or CRF)
+    _patterns : list of Pattern
+        the patterns used to build observations
+    _labels : list of str
+        the labels, in Wapiti order
+    _observations : dict (str -> int)
+        the observation identifiers
+    _uoff : numpy.array of int
+        the offset of unigram weights for each observation
+    _boff : numpy.array of int
+        the offset of bigram weights for each observation
+    _theta : numpy.array of float
+        the weights of the model
+    """
+    
+    def __init__(self, path=None):
+        self._path         = None
+        self._type         = CRF
+        self._autouni      = False
+        self._patterns     = []
+        self._labels       = []
+        self._observations = {}
+        self._uoff         = None
+        self._boff         = None
+        self._is_uni       = None
+        self._is_bi        = None
+        self._theta        = None
+        
+        if path is not None:
+            self.load(path)
+    
+    @property
+    def path(self):
+        return self._path
+    
+    @property
+    def type(self):
+        return self._type
+    
+    @property
+    def patterns(self):
+        return self._patterns
+    
+    @property
+    def labels(self):
+        return self._labels
+    
+    @property
+    def observations(self):
+        return self._observations
+    
+    @property
+    def theta(self):
+        return self._theta
+    
+    def load(self, path):
+        with open(path, "rb") as input_stream:
+            data = input_stream.read()
+        
+        header, pos = _read_header(data, 0, "#mdl#")
+        if "#" in header:
+            model_type, nact = header.split("#")
+            self._type = int(model_type)
+        else: # old model format
+            self._type, nact = MAXENT, header
+        nact = int(nact)
+        
+        header, pos = _read_header(data, pos, "#rdr#")
+        header = header.split("/")
+        npats  = int(header[0])
+        self._autouni = (len(header) > 2 and header[2] != "0")
+        patterns, pos = _read_netstrings(data, pos, npats)
+        self._patterns = [Pattern(pattern) for pattern in patterns]
+        
+        count, pos = _read_header(data, pos, "#qrk#")
+        self._labels, pos = _read_netstrings(data, pos, int(count))
+        count, pos = _read_header(data, pos, "#qrk#")
+        observations, pos = _read_netstrings(data, pos, int(count))
+        
+        # offsets are computed as in Wapiti: observations are laid out in
+        # order, with Y unigram and/or Y*Y bigram weights each.
+        Y       = len(self._labels)
+        kinds   = numpy.array([observation[0] for observation in observations])
+        is_uni  = (kinds == "u") | (kinds == "*")
+        is_bi   = (kinds == "b") | (kinds == "*")
+        sizes   = is_uni * Y + is_bi * Y * Y
+        starts  = numpy.cumsum(sizes) - sizes
+        uoff    = numpy.where(is_uni, starts, -1)
+        boff    = numpy.where(is_bi, starts + is_uni * Y, -1)
+        
+        # weights are "<feature>=<value>" lines, values being written as
+        # hexadecimal floats except on some Windows builds.
+        weights = data[pos:].split("\n", nact)[:nact]
+        theta   = numpy.zeros(int(sizes.sum()), dtype=numpy.float64)
+        if weights:
+            weights = "\n".join(weights).replace("=", "\n").split("\n")
+            parse   = (float.fromhex if "x" in weights[1] else float)
+            theta[numpy.array(weights[0::2]).astype(numpy.int64)] = map(parse, weights[1::2])
+        
+        self._path         = path
+        self._observations = dict((observation, o) for o, observation in enumerate(observations))
+        self._uoff         = uoff
+        self._boff         = boff
+        self._is_uni       = is_uni.tolist()
+        self._is_bi        = is_bi.tolist()
+        self._theta        = theta
+    
+    def sequence_observations(self, tokens):
+        """
+        Returns the identifiers of the unigram and bigram observations
+        found at each position of a sequence.
+        
+        Parameters
+        ----------
+        tokens : list of list of str
+            the columns of each token of the sequence.
+        
+        Returns
+        -------
+        list of list of int, list of list of int
+            the unigram and bigram observations at each position.
+        """
+        
+        get     = self._observations.get
+        autouni = self._autouni
+        if self._patterns:
+            strings = zip(*[pattern(tokens) for pattern in self._patterns])
+        else:
+            strings = tokens
+        if autouni:
+            strings = [["u" + string for string in position] for position in strings]
+        
+        unigrams, bigrams = [], []
+        is_uni, is_bi = self._is_uni, self._is_bi
+        for position in strings:
+            observations = [o for o in map(get, position) if o is not None]
+            unigrams.append([o for o in observations if is_uni[o]])
+            bigrams.append([o for o in observations if is_bi[o]] if not autouni else [])
+        return unigrams, bigrams
+    
+    def _segment_sums(self, observations, offsets, width, length):
+        """
+        Sums the weight blocks of the observations at each position, in
+        the order observations were found, like Wapiti does.
+        """
+        
+        sums   = numpy.zeros((length, width), dtype=numpy.float64)
+        counts = numpy.array([len(obs) for obs in observations], dtype=numpy.int64)
+        flat   = [o for obs in observations for o in obs]
+        if not flat:
+            return sums
+        
+        rows      = self._theta[offsets[flat][:, None] + numpy.arange(width)]
+        nonempty  = numpy.nonzero(counts)[0]
+        starts    = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))[nonempty]
+        sums[nonempty] = numpy.add.reduceat(rows, starts, axis=0)
+        return sums
+    
+    def scores(self, tokens):
+        """
+        Returns the score lattice psi of a sequence, psi[t, y', y] being
+        the score of going from label y' to label y at position t.
+        """
+        
+        Y      = len(self._labels)
+        T      = len(tokens)
+        uni, bi = self.sequence_observations(tokens)
+        
+        psi = numpy.empty((T, Y, Y), dtype=numpy.float64)
+        psi[:] = self._segment_sums(uni, self._uoff, Y, T)[:, None, :]
+        if T > 1:
+            psi[1:] += self._segment_sums(bi[1:], self._boff, Y*Y, T-1).reshape(T-1, Y, Y)
+        
+        if self._type == MEMM:
+            psi  = numpy.exp(psi)
+            psi /= psi.sum(axis=2)[:, :, None]
+        
+        return psi
+    
+    def viterbi(self, lattices):
+        """
+        Decodes a batch of score lattices at once.
+        
+        Parameters
+        ----------
+        lattices : list of numpy.array
+            the score lattices of the sequences, as returned by scores.
+        
+        Returns
+        -------
+        list of list of int
+            the best label sequence for each lattice.
+        """
+        
+        Y       = len(self._labels)
+        B       = len(lattices)
+        lengths = numpy.array([len(lattice) for lattice in lattices])
+        T       = lengths.max()
+        product = (self._type == MEMM)
+        
+        psi = numpy.zeros((B, T, Y, Y), dtype=numpy.float64)
+        for b, lattice in enumerate(lattices):
+            psi[b, : len(lattice)] = lattice
+        
+        back = numpy.zeros((B, T, Y), dtype=numpy.int64)
+        cur  = psi[:, 0, 0, :].copy()
+        for t in xrange(1, T):
+            if product:
+                values = cur[:, :, None] * psi[:, t]
+            else:
+                values = cur[:, :, None] + psi[:, t]
+            back[:, t] = values.argmax(axis=1)
+            active     = (lengths > t)
+            cur[active] = values.max(axis=1)[active]
+        
+        paths = []
+        for b in xrange(B):
+            best = int(cur[b].argmax())
+            path = [best]
+            for t in xrange(lengths[b]-1, 0, -1):
+                best = int(back[b, t, best])
+                path.append(best)
+            path.reverse()
+            paths.append(path)
+        return paths
+    
+    def label(self, sequences, max_tokens=4096):
+        """
+        Labels sequences of tokens.
+        
+        Sequences are sorted by length and decoded in batches of similar
+        lengths, each batch holding at most max_tokens padded tokens.
+        
+        Parameters
+        ----------
+        sequences : list of list of list of str
+            the columns of each token of each sequence.
+        max_tokens : int
+            the maximum number of (padded) tokens decoded at once.
+        
+        Returns
+        -------
+        list of list of str
+            the labels of each sequence.
+        """
+        
+        labels = [None] * len(sequences)
+        order  = sorted(xrange(len(sequences)), key=lambda i: len(sequences[i]))
+        batch  = []
+        for nth, index in enumerate(order):
+            batch.append(index)
+            following = (len(sequences[order[nth+1]]) if nth+1 < len(order) else 0)
+            if nth+1 == len(order) or following * (len(batch)+1) > max_tokens:
+                lattices = [self.scores(sequences[i]) for i in batch]
+                for i, path in zip(batch, self.viterbi(lattices)):
+                    labels[i] = [self._labels[y] for y in path]
+                batch = []
+        return labels
+    
+    def label_sentences(self, sentences, encoding):
+        """
+        Labels sentences given as lines of whitespace-separated fields,
+        the way Wapiti reads them.
+        """
+        
+        sequences = [[line.encode(encoding).split() for line in sentence] for sentence in sentences]
+        return [[label.decode(encoding) for label in labels] for labels in self.label(sequences)]
+
+__models = {}
+
+def get_model(path):
+    """
+    Returns the model loaded from path. Models are loaded once per
+    process and reloaded if the file changed.
+    """
+    
+    key   = os.path.abspath(path)
+    mtime = os.path.getmtime(key)
+    if key not in __models or __models[key][0] != mtime:
+        __models[key] = (mtime, Model(key))
+    return __models[key][1]
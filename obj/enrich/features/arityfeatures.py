@@ -46,6 +46,11 @@ class BOSFeature(NullaryFeature):
     
     def __call__(self, list2dict, position, *args, **kwargs):
         return position == 0
+    
+    def column(self, sentence, values=None):
+        if values is not None:
+            return super(BOSFeature, self).column(sentence, values)
+        return [position == 0 for position in xrange(len(sentence))]
 
 class EOSFeature(NullaryFeature):
     def __init__(self, *args, **kwargs):
@@ -54,15 +59,27 @@ class EOSFeature(NullaryFeature):
     
     def __call__(self, list2dict, position, *args, **kwargs):
         return position == len(list2dict)-1
+    
+    def column(self, sentence, values=None):
+        if values is not None:
+            return super(EOSFeature, self).column(sentence, values)
+        return [position == len(sentence)-1 for position in xrange(len(sentence))]
 
 class LowerFeature(NullaryFeature):
+    _local = True
+    
     def __init__(self, *args, **kwargs):
         super(LowerFeature, self).__init__(*args, **kwargs)
     
     def __call__(self, *args, **kwargs):
         return self._getter(*args, **kwargs).lower()
     
+    def column(self, sentence, values=None):
+        return [value.lower() for value in self._getter.column(sentence, values)]
+    
 class SubstringFeature(NullaryFeature):
+    _local = True
+    
     def __init__(self, from_index=0, to_index=2**31, *args, **kwargs):
         super(SubstringFeature, self).__init__(from_index, to_index, *args, **kwargs)
         self._default    = kwargs.pop("default", '""')
@@ -75,6 +92,9 @@ class SubstringFeature(NullaryFeature):
             return s
         else:
             return self._default
+    
+    def column(self, sentence, values=None):
+        return [value[self._from_index : self._to_index] or self._default for value in self._getter.column(sentence, values)]
 
 
 
@@ -85,6 +105,8 @@ class UnaryFeature(ArityFeature):
         self._element = element
 
 class IsUpperFeature(UnaryFeature):
+    _local = True
+    
     def __init__(self, index, *args, **kwargs):
         super(IsUpperFeature, self).__init__(index, *args, **kwargs)
         self._is_boolean = True
@@ -92,6 +114,9 @@ class IsUpperFeature(UnaryFeature):
     
     def __call__(self, *args, **kwargs):
         return self._getter(*args, **kwargs)[self._index].isupper()
+    
+    def column(self, sentence, values=None):
+        return [value[self._index].isupper() for value in self._getter.column(sentence, values)]
 
 
 
@@ -102,6 +127,8 @@ class BinaryFeature(ArityFeature):
         self._element2 = element2
     
 class SubstitutionFeature(BinaryFeature):
+    _local = True
+    
     def __init__(self, pattern, replacement, *args, **kwargs):
         super(SubstitutionFeature, self).__init__(pattern, replacement, *args, **kwargs)
         flags = kwargs.pop("flags", 0)
@@ -110,6 +137,11 @@ class SubstitutionFeature(BinaryFeature):
     
     def __call__(self, *args, **kwargs):
         return self._replacer.sub(self._replacement, self._getter(*args, **kwargs))
+    
+    def column(self, sentence, values=None):
+        sub         = self._replacer.sub
+        replacement = self._replacement
+        return [sub(replacement, value) for value in self._getter.column(sentence, values)]
 
 
 
@@ -118,6 +150,8 @@ class NaryFeature(ArityFeature):
         super(NaryFeature, self).__init__(self, *args, **kwargs)
 
 class SequencerFeature(NaryFeature):
+    _local = True
+    
     def __init__(self, *args, **kwargs):
         super(SequencerFeature, self).__init__(*args, **kwargs)
         
@@ -133,3 +167,9 @@ class SequencerFeature(NaryFeature):
         for feature in self._features[1:]:
             current = feature(current, *args, **kwargs)
         return current
+    
+    def column(self, sentence, values=None):
+        column = self._features[0].column(sentence, values)
+        for feature in self._features[1:]:
+            column = feature.column(sentence, column)
+        return column
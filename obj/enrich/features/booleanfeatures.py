@@ -25,6 +25,8 @@ along with this program. If not, see GNU official website.
 from feature import Feature
 
 class BooleanFeature(Feature):
+    _local = True
+    
     def __init__(self, *args, **kwargs):
         super(BooleanFeature, self).__init__(*args, **kwargs)
         self._is_boolean = True
@@ -40,6 +42,9 @@ class NotFeature(UnaryFeature):
     
     def __call__(self, *args, **kwargs):
         return not self.element(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        return [not value for value in self.element.column(sentence, values)]
 
 class BinaryFeature(BooleanFeature):
     def __init__(self, left, right, *args, **kwargs):
@@ -53,6 +58,11 @@ class AndFeature(BinaryFeature):
     
     def __call__(self, *args, **kwargs):
         return self.left(*args, **kwargs) and self.right(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        # the right operand is only computed where needed, as in __call__.
+        right = self.right
+        return [left and right.value_at(sentence, position, values) for position, left in enumerate(self.left.column(sentence, values))]
 
 class OrFeature(BinaryFeature):
     def __init__(self, left, right, *args, **kwargs):
@@ -60,3 +70,8 @@ class OrFeature(BinaryFeature):
     
     def __call__(self, *args, **kwargs):
         return self.left(*args, **kwargs) or self.right(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        # the right operand is only computed where needed, as in __call__.
+        right = self.right
+        return [left or right.value_at(sentence, position, values) for position, left in enumerate(self.left.column(sentence, values))]
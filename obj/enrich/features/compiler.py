@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: compiler.py
+
+Description: compiles the features of an enrichment file into a single
+Python function that enriches a sentence. Every feature is turned into an
+expression where getters, regular expressions and boolean operators are
+inlined, which avoids the chains of calls of the feature objects.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see GNU official website.
+"""
+
+import linecache
+
+from obj.enrich.features.feature            import SharedFeature
+from obj.enrich.features.getterfeatures     import IdentityFeature, DictGetterFeature
+from obj.enrich.features.arityfeatures      import BOSFeature, EOSFeature, LowerFeature, SubstringFeature, IsUpperFeature, SubstitutionFeature, SequencerFeature
+from obj.enrich.features.booleanfeatures    import NotFeature, AndFeature, OrFeature
+from obj.enrich.features.listfeatures       import SomeFeature, AllFeature, NoneFeature
+from obj.enrich.features.matcherfeatures    import MatchFeature, CheckFeature, SubsequenceFeature, TokenFeature
+from obj.enrich.features.stringfeatures     import EqualFeature, EqualCaselessFeature
+from obj.enrich.features.dictionaryfeatures import TokenDictionaryFeature
+
+def subsequence(match):
+    return (match.group() if match is not None else None)
+
+def matched_string(match):
+    return (match.string if match is not None else None)
+
+class FeatureCompiler(object):
+    """
+    Compiles features into the source of a function that enriches a
+    sentence (a list of dict) in place, the way src.pretreatment.enrich
+    does: features are computed one after the other, each one for every
+    token of the sentence.
+    
+    Each feature becomes an expression of the sentence, the position of
+    the current token and, when the feature is called on the result of
+    another one (as in a sequencer), the value it is called on. The
+    features that cannot be inlined are called as they are, or compute
+    their column (see Feature.column), so any feature can be compiled.
+    
+    Attributes
+    ----------
+    _namespace : dict
+        the objects the generated source refers to (regular expressions,
+        dictionaries, features...), by name.
+    """
+    
+    def __init__(self):
+        self._namespace = {"subsequence":subsequence, "matched_string":matched_string}
+    
+    def constant(self, value, prefix="c"):
+        """
+        Returns the name of value in the generated source.
+        """
+        
+        name = "%s%i" %(prefix, len(self._namespace))
+        self._namespace[name] = value
+        return name
+    
+    def expression(self, feature, value=None):
+        """
+        Returns the expression that computes a feature. If value is None,
+        the feature is called on the sentence and the position, otherwise
+        it is called on the result of the expression value.
+        """
+        
+        compiler = FeatureCompiler._compilers.get(type(feature), None)
+        if compiler is not None:
+            expression = compiler(self, feature, value)
+            if expression is not None:
+                return expression
+        
+        name = self.constant(feature, "f")
+        if value is None:
+            return "%s(sentence, position)" %name
+        return "%s(%s, sentence, position)" %(name, value)
+    
+    def getter(self, feature, value):
+        return self.expression(feature._getter, value)
+    
+    def identity(self, feature, value):
+        return ("sentence" if value is None else value)
+    
+    def dict_getter(self, feature, value):
+        if value is not None:
+            return None
+        if feature.shift == 0:
+            return "token.get(%r)" %feature.entry
+        position = "position%+i" %feature.shift
+        return "(sentence[%s].get(%r) if 0 <= %s < length else None)" %(position, feature.entry, position)
+    
+    def bos(self, feature, value):
+        return ("(position == 0)" if value is None else None)
+    
+    def eos(self, feature, value):
+        return ("(position == length-1)" if value is None else None)
+    
+    def lower(self, feature, value):
+        return "%s.lower()" %self.getter(feature, value)
+    
+    def substring(self, feature, value):
+        return "(%s[%i : %i] or %s)" %(self.getter(feature, value), feature._from_index, feature._to_index, self.constant(feature._default))
+    
+    def is_upper(self, feature, value):
+        return "%s[%i].isupper()" %(self.getter(feature, value), feature._index)
+    
+    def substitution(self, feature, value):
+        return "%s(%s, %s)" %(self.constant(feature._replacer.sub), self.constant(feature._replacement), self.getter(feature, value))
+    
+    def sequencer(self, feature, value):
+        expression = self.expression(feature._features[0], value)
+        for element in feature._features[1:]:
+            expression = self.expression(element, expression)
+        return expression
+    
+    def shared(self, value, expression):
+        """
+        Returns expression(value) where value is computed once, for the
+        features that call several others on the same value.
+        """
+        
+        if value is None or value.isalnum():
+            return expression(value)
+        return "(lambda value: %s)(%s)" %(expression("value"), value)
+    
+    def not_(self, feature, value):
+        return "(not %s)" %self.expression(feature.element, value)
+    
+    def and_(self, feature, value):
+        return self.shared(value, lambda value: "(%s and %s)" %(self.expression(feature.left, value), self.expression(feature.right, value)))
+    
+    def or_(self, feature, value):
+        return self.shared(value, lambda value: "(%s or %s)" %(self.expression(feature.left, value), self.expression(feature.right, value)))
+    
+    def some(self, feature, value):
+        if not feature._elements:
+            return "False"
+        return self.shared(value, lambda value: "bool(%s)" %" or ".join([self.expression(element, value) for element in feature._elements]))
+    
+    def all(self, feature, value):
+        if not feature._elements:
+            return "True"
+        return self.shared(value, lambda value: "bool(%s)" %" and ".join([self.expression(element, value) for element in feature._elements]))
+    
+    def none(self, feature, value):
+        if not feature._elements:
+            return "True"
+        return self.shared(value, lambda value: "(not (%s))" %" or ".join([self.expression(element, value) for element in feature._elements]))
+    
+    def search(self, feature, value):
+        return "%s(%s or '')" %(self.constant(feature._regexp.search), self.getter(feature, value))
+    
+    def check(self, feature, value):
+        return "(%s is not None)" %self.search(feature, value)
+    
+    def subsequence(self, feature, value):
+        return "subsequence(%s)" %self.search(feature, value)
+    
+    def token(self, feature, value):
+        return "matched_string(%s)" %self.search(feature, value)
+    
+    def equal(self, feature, value):
+        return "(%s == %s)" %(self.constant(feature._reference), self.getter(feature, value))
+    
+    def equal_caseless(self, feature, value):
+        return "(%s == %s.lower())" %(self.constant(feature._reference), self.getter(feature, value))
+    
+    def token_dictionary(self, feature, value):
+        return "(%s in %s)" %(self.getter(feature, value), self.constant(feature._value))
+    
+    def shared_feature(self, feature, value):
+        if value is None and feature.field is not None:
+            return "token[%r]" %feature.field
+        # inlined expressions are cheap, they are not shared.
+        return self.expression(feature.feature, value)
+    
+    _compilers = {
+        IdentityFeature        : identity,
+        DictGetterFeature      : dict_getter,
+        BOSFeature             : bos,
+        EOSFeature             : eos,
+        LowerFeature           : lower,
+        SubstringFeature       : substring,
+        IsUpperFeature         : is_upper,
+        SubstitutionFeature    : substitution,
+        SequencerFeature       : sequencer,
+        NotFeature             : not_,
+        AndFeature             : and_,
+        OrFeature              : or_,
+        SomeFeature            : some,
+        AllFeature             : all,
+        NoneFeature            : none,
+        MatchFeature           : search,
+        CheckFeature           : check,
+        SubsequenceFeature     : subsequence,
+        TokenFeature           : token,
+        EqualFeature           : equal,
+        EqualCaselessFeature   : equal_caseless,
+        TokenDictionaryFeature : token_dictionary,
+        SharedFeature          : shared_feature
+    }
+    
+    def source(self, features, name="enrich_sentence"):
+        """
+        Returns the source of a function enriching a sentence with
+        features.
+        """
+        
+        lines = ["def %s(sentence):" %name, "    length = len(sentence)"]
+        for feature in features:
+            lines.append("    # %s (%s)" %(feature.name, feature.__class__.__name__))
+            if feature.is_sequence or type(feature) not in FeatureCompiler._compilers:
+                # features that are not inlined compute their whole column.
+                value = ("int(value)" if feature.is_boolean and not feature.is_sequence else "value")
+                lines.append("    for token, value in zip(sentence, %s.column(sentence)):" %self.constant(feature, "f"))
+                lines.append("        token[%r] = %s" %(feature.name, value))
+            else:
+                expression = self.expression(feature)
+                if feature.is_boolean:
+                    expression = "int(%s)" %expression
+                lines.append("    for position in xrange(length):")
+                lines.append("        token = sentence[position]")
+                lines.append("        token[%r] = %s" %(feature.name, expression))
+        return u"\n".join(lines) + u"\n"
+    
+    def compile(self, features, filename="<features>", name="enrich_sentence"):
+        """
+        Returns the function enriching a sentence with features and its
+        source. The source is registered under filename, so that
+        tracebacks show the generated lines.
+        """
+        
+        source = self.source(features, name=name)
+        exec compile(source, filename, "exec") in self._namespace
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+        return self._namespace[name], source
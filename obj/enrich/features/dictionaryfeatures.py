@@ -44,8 +44,19 @@ class DictionaryFeature(Feature):
             self._path = os.path.abspath(os.path.expanduser(path))
         self._value  = value
         self._getter = getter
+    
+    def files(self):
+        return (set([self._path]) if self._path is not None else set())
+    
+    def signature(self, ignored=()):
+        # features loaded from the same file have the same dictionary.
+        if self._path is not None:
+            ignored = tuple(ignored) + ("_value",)
+        return super(DictionaryFeature, self).signature(ignored)
 
 class TokenDictionaryFeature(DictionaryFeature):
+    _local = True
+    
     def __init__(self, getter=DEFAULT_GETTER, *args, **kwargs):
         super(TokenDictionaryFeature, self).__init__(getter=getter, *args, **kwargs)
         self._is_boolean = True
@@ -60,6 +71,10 @@ class TokenDictionaryFeature(DictionaryFeature):
     
     def __call__(self, *args, **kwargs):
         return self._getter(*args, **kwargs) in self._value
+    
+    def column(self, sentence, values=None):
+        value = self._value
+        return [element in value for element in self._getter.column(sentence, values)]
 
 class MultiwordDictionaryFeature(DictionaryFeature):
     def __init__(self, *args, **kwargs):
@@ -73,6 +88,9 @@ class MultiwordDictionaryFeature(DictionaryFeature):
         except (pickle.UnpicklingError, ImportError, EOFError):
             self._value = compile_multiword(self._path, "utf-8")
     
+    def entries(self):
+        return set([self._entry])
+    
     """def __call__(self, list2dict, *args, **kwargs):
         l         = ["O"]*len(list2dict)
         tmp       = self._value._data
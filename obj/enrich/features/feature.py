@@ -23,7 +23,30 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see GNU official website.
 """
 
+import threading
+
+def signature(value):
+    """
+    Returns the signature of an attribute of a feature (see
+    Feature.signature). Objects that are not features, regular
+    expressions or plain values are only the same as themselves.
+    """
+    
+    if isinstance(value, Feature):
+        return value.signature()
+    if type(value) in (list, tuple):
+        return tuple([signature(element) for element in value])
+    if hasattr(value, "pattern") and hasattr(value, "flags"):
+        return (u"regexp", value.pattern, value.flags)
+    if value is None or type(value) in (str, unicode, int, long, float, bool):
+        return value
+    return (u"object", id(value))
+
 class Feature(object):
+    # can the value of the feature only depend on the current token (see
+    # is_local) ?
+    _local = False
+    
     def __init__(self, *args, **kwargs):
         self._is_boolean  = False
         self._is_sequence = False
@@ -47,6 +70,203 @@ class Feature(object):
     def name(self):
         return self._name
     
+    @property
+    def is_local(self):
+        """
+        Is the value of this feature for a token only a function of the
+        fields of this token (or of the value it is called on) ? It is
+        then the same for every occurrence of a token and can be computed
+        once per distinct token.
+        """
+        
+        return self._local and all([child.is_local for child in self.children()])
+    
     @property
     def display(self):
         return self._display
+    
+    def column(self, sentence, values=None):
+        """
+        Returns the values of this feature for every token of a sentence.
+        If values is given, the feature is called on each of them instead
+        (as in a sequencer). Features override it to compute the whole
+        column at once.
+        """
+        
+        if values is not None:
+            return [self(value, sentence, position) for position, value in enumerate(values)]
+        if self._is_sequence:
+            return self(sentence)
+        return [self(sentence, position) for position in xrange(len(sentence))]
+    
+    def value_at(self, sentence, position, values=None):
+        """
+        Returns the value of this feature for the token at position, the
+        way column does.
+        """
+        
+        if values is not None:
+            return self(values[position], sentence, position)
+        return self(sentence, position)
+    
+    def children(self):
+        """
+        Returns the features this feature is made of (its getter, its
+        operands...).
+        """
+        
+        children = []
+        for value in self.__dict__.values():
+            if isinstance(value, Feature):
+                children.append(value)
+            elif type(value) in (list, tuple):
+                children.extend([element for element in value if isinstance(element, Feature)])
+        return children
+    
+    def map_children(self, function):
+        """
+        Replaces every child of this feature by function(child).
+        """
+        
+        for key, value in self.__dict__.items():
+            if isinstance(value, Feature):
+                self.__dict__[key] = function(value)
+            elif type(value) in (list, tuple):
+                self.__dict__[key] = type(value)([(function(element) if isinstance(element, Feature) else element) for element in value])
+    
+    def signature(self, ignored=()):
+        """
+        Returns a value that is the same for features that compute the same
+        thing: the class of the feature and the signatures of its
+        attributes (its getter, pattern, operands...). The name and
+        display of the feature are left out, as well as the attributes in
+        ignored.
+        """
+        
+        items = [(key, signature(value)) for key, value in sorted(self.__dict__.items()) if key not in ("_name", "_display") and key not in ignored]
+        return (self.__class__, tuple(items))
+    
+    def entries(self):
+        """
+        Returns the set of fields this feature reads in a sentence.
+        """
+        
+        entries = set()
+        for child in self.children():
+            entries.update(child.entries())
+        return entries
+    
+    def files(self):
+        """
+        Returns the set of files (dictionaries...) this feature was built
+        from.
+        """
+        
+        files = set()
+        for child in self.children():
+            files.update(child.files())
+        return files
+
+class ConstantFeature(Feature):
+    """
+    A feature that gives the same value to every token. It stands for a
+    feature whose values are never read, so that the fields of a corpus
+    stay the same without computing them.
+    """
+    
+    def __init__(self, value, *args, **kwargs):
+        super(ConstantFeature, self).__init__(*args, **kwargs)
+        self._is_sequence = True
+        self._value       = value
+    
+    def __call__(self, list2dict, *args, **kwargs):
+        return [self._value] * len(list2dict)
+
+class SharedFeature(Feature):
+    """
+    A sub-feature found several times in the features of an enrichment
+    file (see obj.information.Informations.share). Every occurrence is
+    the same SharedFeature: the column of the feature is computed once
+    for a sentence and reused by the others until forget is called. If
+    the sub-feature is the same as a feature computed before, its values
+    are read in the field of that feature instead. When called on values
+    (as in a sequencer), it is not shared.
+    
+    Attributes
+    ----------
+    _feature : Feature
+        the shared feature.
+    _field : str
+        the field where the values of the feature already are, None if
+        they have to be computed.
+    _last : threading.local
+        the last sentence and its column, for each thread.
+    _saved : int
+        the number of values taken from a column already computed.
+    """
+    
+    _local = True
+    
+    def __init__(self, feature, field=None, *args, **kwargs):
+        super(SharedFeature, self).__init__(*args, **kwargs)
+        self._is_boolean  = feature.is_boolean
+        self._is_sequence = feature.is_sequence
+        self._feature     = feature
+        self._field       = field
+        self._last        = threading.local()
+        self._saved       = 0
+    
+    @property
+    def feature(self):
+        return self._feature
+    
+    @property
+    def field(self):
+        return self._field
+    
+    @property
+    def saved(self):
+        return self._saved
+    
+    def __call__(self, *args, **kwargs):
+        return self._feature(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        if values is not None:
+            return self._feature.column(sentence, values)
+        if self._field is not None:
+            self._saved += len(sentence)
+            field = self._field
+            return [token[field] for token in sentence]
+        if getattr(self._last, "sentence", None) is sentence:
+            self._saved += len(sentence)
+            return self._last.column
+        column              = self._feature.column(sentence)
+        self._last.sentence = sentence
+        self._last.column   = column
+        return column
+    
+    def value_at(self, sentence, position, values=None):
+        if values is None and self._field is not None:
+            self._saved += 1
+            return sentence[position][self._field]
+        if values is None and getattr(self._last, "sentence", None) is sentence:
+            self._saved += 1
+            return self._last.column[position]
+        return self._feature.value_at(sentence, position, values)
+    
+    def entries(self):
+        if self._field is not None:
+            return self._feature.entries() | set([self._field])
+        return self._feature.entries()
+    
+    def forget(self):
+        """
+        Forgets the last column computed in the current thread.
+        """
+        
+        self._last.sentence = None
+        self._last.column   = None
+    
+    def signature(self, ignored=()):
+        return self._feature.signature(ignored)
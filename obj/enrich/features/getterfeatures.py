@@ -36,11 +36,17 @@ class IdentityFeature(GetterFeature):
     in a sentence. This may cause performance issue, but it is the only
     way currently known to have an "feature package" that is consistent.
     """
+    
+    _local = True
+    
     def __init__(self, *args, **kwargs):
         super(IdentityFeature, self).__init__(*args, **kwargs)
     
     def __call__(self, element, *args, **kwargs):
         return element
+    
+    def column(self, sentence, values=None):
+        return (values if values is not None else [sentence] * len(sentence))
 DEFAULT_GETTER = IdentityFeature()
 
 class DictGetterFeature(GetterFeature):
@@ -49,6 +55,29 @@ class DictGetterFeature(GetterFeature):
         self.entry = kwargs.get("entry", "word")
         self.shift = int(kwargs.get("shift", 0))
     
+    @property
+    def is_local(self):
+        return self.shift == 0
+    
+    def entries(self):
+        return set([self.entry])
+    
+    def column(self, sentence, values=None):
+        if values is not None:
+            return super(DictGetterFeature, self).column(sentence, values)
+        
+        entry  = self.entry
+        shift  = self.shift
+        column = [token.get(entry, None) for token in sentence]
+        if shift == 0:
+            return column
+        elif abs(shift) >= len(column):
+            return [None] * len(column)
+        elif shift > 0:
+            return column[shift : ] + [None] * shift
+        else:
+            return [None] * (-shift) + column[ : shift]
+    
     def __call__(self, list2dict, position, *args, **kwargs):
         current_position = position + self.shift
         
@@ -63,10 +92,27 @@ class FindFeature(GetterFeature):
         self._matcher      = args[0]
         self._return_entry = kwargs.get("return_entry", "word")
         assert self._matcher is not None and self._matcher.is_boolean, "Matcher field in FindFeature does not return a boolean."
+    
+    def entries(self):
+        return self._matcher.entries() | set([self._return_entry])
 
 class FindForwardFeature(FindFeature):
     def __init__(self, *args, **kwargs):
         super(FindForwardFeature, self).__init__(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        if values is not None:
+            return super(FindForwardFeature, self).column(sentence, values)
+        
+        # the match of a token is the nearest match after it.
+        matches = self._matcher.column(sentence)
+        column  = [None] * len(sentence)
+        found   = None
+        for position in reversed(xrange(len(sentence))):
+            column[position] = found
+            if matches[position]:
+                found = sentence[position][self._return_entry]
+        return column
         
     def __call__(self, list2dict, position, *args, **kwargs):
         for X in range(position+1, len(list2dict)):
@@ -77,6 +123,20 @@ class FindForwardFeature(FindFeature):
 class FindBackwardFeature(FindFeature):
     def __init__(self, *args, **kwargs):
         super(FindBackwardFeature, self).__init__(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        if values is not None:
+            return super(FindBackwardFeature, self).column(sentence, values)
+        
+        # the match of a token is the nearest match before it.
+        matches = self._matcher.column(sentence)
+        column  = [None] * len(sentence)
+        found   = None
+        for position in xrange(len(sentence)):
+            column[position] = found
+            if matches[position]:
+                found = sentence[position][self._return_entry]
+        return column
         
     def __call__(self, list2dict, position, *args, **kwargs):
         for X in reversed(range(0, position)):
@@ -30,6 +30,8 @@ from feature        import Feature
 from getterfeatures import DEFAULT_GETTER
 
 class ListFeature(Feature):
+    _local = True
+    
     def __init__(self, *args, **kwargs):
         super(ListFeature, self).__init__(*args, **kwargs)
         self._elements   = args
@@ -38,6 +40,16 @@ class ListFeature(Feature):
         for element in self._elements:
             if not element.is_boolean:
                 raise TypeError("Non boolean element in list node: %s" %(element.__class__.__name__))
+    
+    def first_column(self, sentence, values=None):
+        """
+        Returns the column of the first element, the other elements are
+        only computed where needed, as in __call__.
+        """
+        
+        if self._elements:
+            return self._elements[0].column(sentence, values)
+        return [None] * len(sentence)
 
 class SomeFeature(ListFeature):
     def __init__(self, *args, **kwargs):
@@ -48,6 +60,10 @@ class SomeFeature(ListFeature):
             if element(*args, **kwargs):
                 return True
         return False
+    
+    def column(self, sentence, values=None):
+        others = self._elements[1:]
+        return [bool(first) or any(element.value_at(sentence, position, values) for element in others) for position, first in enumerate(self.first_column(sentence, values))]
 
 class AllFeature(ListFeature):
     def __init__(self, *args, **kwargs):
@@ -58,6 +74,12 @@ class AllFeature(ListFeature):
             if not element(*args, **kwargs):
                 return False
         return True
+    
+    def column(self, sentence, values=None):
+        if not self._elements:
+            return [True] * len(sentence)
+        others = self._elements[1:]
+        return [bool(first) and all(element.value_at(sentence, position, values) for element in others) for position, first in enumerate(self.first_column(sentence, values))]
 
 class NoneFeature(ListFeature):
     def __init__(self, *args, **kwargs):
@@ -68,3 +90,7 @@ class NoneFeature(ListFeature):
             if element(*args, **kwargs):
                 return False
         return True
+    
+    def column(self, sentence, values=None):
+        others = self._elements[1:]
+        return [not first and not any(element.value_at(sentence, position, values) for element in others) for position, first in enumerate(self.first_column(sentence, values))]
@@ -30,6 +30,8 @@ from feature        import Feature
 from getterfeatures import DEFAULT_GETTER
 
 class MatchFeature(Feature):
+    _local = True
+    
     def __init__(self, pattern, flags=0, getter=DEFAULT_GETTER, *args, **kwargs):
         super(MatchFeature, self).__init__(pattern, *args, flags=flags, getter=getter, **kwargs)
         self._regexp = re.compile(pattern, flags)
@@ -37,6 +39,10 @@ class MatchFeature(Feature):
     
     def __call__(self, *args, **kwargs):
         return self._regexp.search(self._getter(*args, **kwargs) or "")
+    
+    def column(self, sentence, values=None):
+        search = self._regexp.search
+        return [search(value or "") for value in self._getter.column(sentence, values)]
 
 class CheckFeature(MatchFeature):
     def __init__(self, pattern, flags=0, getter=DEFAULT_GETTER, *args, **kwargs):
@@ -45,6 +51,9 @@ class CheckFeature(MatchFeature):
     
     def __call__(self, *args, **kwargs):
         return super(CheckFeature, self).__call__(*args, **kwargs) is not None
+    
+    def column(self, sentence, values=None):
+        return [matcher is not None for matcher in super(CheckFeature, self).column(sentence, values)]
 
 class SubsequenceFeature(MatchFeature):
     def __call__(self, *args, **kwargs):
@@ -53,6 +62,9 @@ class SubsequenceFeature(MatchFeature):
             return matcher
         else:
             return matcher.group()
+    
+    def column(self, sentence, values=None):
+        return [(matcher.group() if matcher is not None else None) for matcher in super(SubsequenceFeature, self).column(sentence, values)]
 
 class TokenFeature(MatchFeature):
     def __call__(self, *args, **kwargs):
@@ -61,3 +73,6 @@ class TokenFeature(MatchFeature):
             return matcher
         else:
             return matcher.string
+    
+    def column(self, sentence, values=None):
+        return [(matcher.string if matcher is not None else None) for matcher in super(TokenFeature, self).column(sentence, values)]
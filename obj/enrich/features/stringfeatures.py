@@ -26,6 +26,8 @@ from feature        import Feature
 from getterfeatures import DEFAULT_GETTER
 
 class StringFeature(Feature):
+    _local = True
+    
     def __init__(self, reference, getter=DEFAULT_GETTER, *args, **kwargs):
         super(StringFeature, self).__init__(self, reference, *args, **kwargs)
         self._reference = reference
@@ -38,6 +40,10 @@ class EqualFeature(StringFeature):
     
     def __call__(self, *args, **kwargs):
         return self._reference == self._getter(*args, **kwargs)
+    
+    def column(self, sentence, values=None):
+        reference = self._reference
+        return [reference == value for value in self._getter.column(sentence, values)]
 
 class EqualCaselessFeature(StringFeature):
     def __init__(self, reference, *args, **kwargs):
@@ -47,4 +53,8 @@ class EqualCaselessFeature(StringFeature):
     
     def __call__(self, *args, **kwargs):
         return self._reference == self._getter(*args, **kwargs).lower()
+    
+    def column(self, sentence, values=None):
+        reference = self._reference
+        return [reference == value.lower() for value in self._getter.column(sentence, values)]
 
@@ -27,10 +27,14 @@ import logging
 
 from xml.etree.ElementTree import ElementTree, tostring as element2string
 
+from obj.enrich.features.feature     import ConstantFeature, SharedFeature
+from obj.enrich.features.getterfeatures import IdentityFeature, DictGetterFeature
+from obj.enrich.features.compiler    import FeatureCompiler
 from obj.enrich.features.xml2feature import XML2Feature
+from obj.cache                       import LRUCache
 from obj.logger                      import default_handler
 
-import os.path
+import collections, copy, os.path
 
 tmp                = os.path.normpath(__file__).split(os.sep)
 tmp                = u'.'.join(tmp[tmp.index("obj") : ]).rsplit(".",1)[0]
@@ -82,6 +86,11 @@ class Informations(object):
         self._aentries = [] # informations that are after ...
         self._features = [] # informations that are added
         self._names    = set()
+        self._path     = None
+        self._function = None # the compiled features, see compile
+        self._source   = None
+        self._caches   = None # the values of local features, see cache
+        self._shared   = []   # the sub-features found several times, see share
         self._x2f      = None # the feature parser, initialised in parse
         
         if path is not None:
@@ -90,6 +99,7 @@ class Informations(object):
     def parse(self, filename):
         parsing = ElementTree()
         parsing.parse(filename)
+        self._path = filename
         
         children = parsing.getroot().getchildren()
         
@@ -136,6 +146,8 @@ class Informations(object):
                     xml2feature_logger.exception(exc)
                     raise
             self.check_entry(self._features[-1].name)
+        
+        self.share()
     
     def check_entry(self, entry_name):
         if entry_name in self._names:
@@ -154,3 +166,166 @@ class Informations(object):
     @property
     def features(self):
         return self._features
+    
+    @property
+    def function(self):
+        return self._function
+    
+    @property
+    def source(self):
+        return self._source
+    
+    @property
+    def caches(self):
+        return self._caches
+    
+    @property
+    def shared(self):
+        return self._shared
+    
+    @property
+    def saved_evaluations(self):
+        """
+        The number of values of shared sub-features that were reused
+        instead of computed again (see share).
+        """
+        
+        return sum([feature.saved for feature in self._shared])
+    
+    def share(self):
+        """
+        Finds the sub-features that appear several times in the features
+        (see Feature.signature), such as the same regular expression
+        checked by two find features, and replaces every occurrence by a
+        single SharedFeature: their values are then computed once per
+        sentence. A sub-feature that is the same as a feature before it
+        reads the field of this feature instead (booleans and sequences
+        excepted, their fields do not hold the values as computed).
+        Getters are not shared, reading a field again costs as much as
+        reading a shared value.
+        """
+        
+        def shareable(feature):
+            return not isinstance(feature, (IdentityFeature, DictGetterFeature, SharedFeature))
+        
+        counts = collections.Counter()
+        def count(feature):
+            for child in feature.children():
+                if shareable(child):
+                    counts[child.signature()] += 1
+                count(child)
+        for feature in self._features:
+            count(feature)
+        
+        shared   = collections.OrderedDict()
+        computed = {} # the fields of the features before the current one
+        def share(feature):
+            signature = (feature.signature() if shareable(feature) else None)
+            if signature in computed:
+                key = (signature, computed[signature])
+                if key not in shared:
+                    feature.map_children(share)
+                    shared[key] = SharedFeature(feature, field=computed[signature])
+                return shared[key]
+            if signature is None or counts[signature] < 2:
+                feature.map_children(share)
+                return feature
+            if signature not in shared:
+                feature.map_children(share)
+                shared[signature] = SharedFeature(feature)
+            return shared[signature]
+        for feature in self._features:
+            feature.map_children(share)
+            if not (feature.is_boolean or feature.is_sequence):
+                computed.setdefault(feature.signature(), feature.name)
+        
+        self._shared = shared.values()
+        if self._shared:
+            xml2feature_logger.debug(u"%s: %i shared sub-features" %(self._path, len(self._shared)))
+    
+    def compile(self):
+        """
+        Compiles the features into a single function that enriches a
+        sentence (see obj.enrich.features.compiler.FeatureCompiler). Its
+        generated source is kept in source.
+        """
+        
+        self._function, self._source = FeatureCompiler().compile(self._features, filename="<compiled %s>" %self._path)
+        xml2feature_logger.debug(u"compiled %s:\n%s" %(self._path, self._source))
+    
+    def cache(self, capacity=10000):
+        """
+        Keeps the values of local features (see Feature.is_local) in a
+        bounded cache, one per feature, so that they are reused from one
+        document to the next. Other features do not only depend on the
+        token and are never cached. Compiled informations do not use the
+        caches.
+        
+        Parameters
+        ----------
+        capacity : int
+            the maximum number of distinct tokens kept for each feature.
+        """
+        
+        self._caches = {}
+        for feature in self._features:
+            if feature.is_local and not feature.is_sequence:
+                self._caches[feature] = LRUCache(capacity)
+    
+    def cache_stats(self):
+        """
+        Returns a dictionary with the number of cached features and the
+        size, capacity, hits, misses and evictions of their caches added
+        up. Hits and misses are counted by token.
+        """
+        
+        stats = {"features":0, "size":0, "capacity":0, "hits":0, "misses":0, "evictions":0}
+        for feature in self._features: # features removed by without are not counted.
+            if feature in (self._caches or {}):
+                stats["features"] += 1
+                for key, value in self._caches[feature].stats().items():
+                    stats[key] += value
+        return stats
+    
+    def files(self):
+        """
+        Returns the files these informations were read from: the
+        enrichment file followed by the dictionaries of its features.
+        """
+        
+        files = set()
+        for feature in self._features:
+            files.update(feature.files())
+        return ([self._path] if self._path is not None else []) + sorted(files)
+    
+    def used_features(self, fields):
+        """
+        Returns the names of the features needed to compute the given
+        fields: the features named in fields and, recursively, the
+        features they read.
+        """
+        
+        names  = set([feature.name for feature in self._features])
+        needed = set([field for field in fields if field in names])
+        for feature in reversed(self._features): # a feature only reads the features before it
+            if feature.name in needed:
+                needed.update(feature.entries() & names)
+        return needed
+    
+    def without(self, removed, placeholder=u"_"):
+        """
+        Returns a copy of these informations where the features named in
+        removed are not computed. Displayed features are replaced by a
+        constant placeholder, so that the fields stay the same.
+        """
+        
+        informations = copy.copy(self)
+        informations._features = []
+        for feature in self._features:
+            if feature.name not in removed:
+                informations._features.append(feature)
+            elif feature.display:
+                informations._features.append(ConstantFeature(placeholder, name=feature.name))
+        if self._function is not None:
+            informations.compile()
+        return informations
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: journal.py
+
+Description: the progress journal of a batch. It records the inputs whose
+outputs were completely written, so that an interrupted batch can resume
+where it stopped.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see GNU official website.
+"""
+
+import hashlib
+import os, os.path
+import sys
+
+def absolute_path(path):
+    """
+    Returns the absolute path of a file as unicode.
+    """
+    
+    path = os.path.abspath(path)
+    return (path.decode(sys.getfilesystemencoding()) if type(path) == str else path)
+
+def digest(path):
+    """
+    Returns the SHA-1 hex digest of the content of a file, None if the
+    file does not exist.
+    """
+    
+    if not os.path.exists(path):
+        return None
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as input_stream:
+        for block in iter(lambda: input_stream.read(1 << 20), ""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+class Journal(object):
+    """
+    The journal of the inputs of a batch that are done. Each line holds
+    an input and its digest followed by every output and its digest,
+    separated by tabulations. An input is only written in the journal
+    once all its outputs are written.
+    
+    Lines are appended and synced to disk one at a time. A line cut short
+    by a crash has no end of line: it is ignored and removed when the
+    journal is read again.
+    
+    Attributes
+    ----------
+    _path : str
+        the journal file.
+    _done : dict(unicode -> (str, list of (unicode, str)))
+        the digest and outputs (with their digests) of each input read
+        from the journal.
+    _descriptor : int
+        the file descriptor lines are appended to.
+    """
+    
+    def __init__(self, path, resume=False):
+        """
+        Parameters
+        ----------
+        path : str
+            the journal file.
+        resume : bool
+            keep the inputs already in the journal, an existing journal is
+            emptied otherwise.
+        """
+        
+        self._path       = path
+        self._done       = {}
+        self._descriptor = None
+        
+        size = 0
+        if resume and os.path.exists(path):
+            with open(path, "rb") as input_stream:
+                for line in input_stream:
+                    if not line.endswith("\n"):
+                        break
+                    size += len(line)
+                    parts = line.decode("utf-8").rstrip(u"\n").split(u"\t")
+                    self._done[parts[0]] = (parts[1], zip(parts[2::2], parts[3::2]))
+        
+        self._descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0644)
+        os.ftruncate(self._descriptor, size)
+    
+    def __len__(self):
+        return len(self._done)
+    
+    @property
+    def path(self):
+        return self._path
+    
+    def done(self, input):
+        """
+        Returns whether an input is done: it is in the journal, it did not
+        change since and all its outputs are still the ones that were
+        written.
+        """
+        
+        input = absolute_path(input)
+        if input not in self._done:
+            return False
+        input_digest, outputs = self._done[input]
+        return digest(input) == input_digest and all([digest(output) == output_digest for output, output_digest in outputs])
+    
+    def add(self, input, outputs):
+        """
+        Writes in the journal that an input is done, once outputs are
+        written.
+        """
+        
+        input   = absolute_path(input)
+        outputs = [(absolute_path(output), digest(output)) for output in outputs]
+        missing = [output for output, output_digest in outputs if output_digest is None]
+        if missing:
+            raise IOError(u"outputs of %s not written: %s" %(input, u", ".join(missing)))
+        
+        self._done[input] = (digest(input), outputs)
+        parts = [input, self._done[input][0]]
+        for output, output_digest in outputs:
+            parts.extend([output, output_digest])
+        os.write(self._descriptor, (u"\t".join(parts) + u"\n").encode("utf-8"))
+        os.fsync(self._descriptor)
+    
+    def close(self):
+        if self._descriptor is not None:
+            os.close(self._descriptor)
+            self._descriptor = None
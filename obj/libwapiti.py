@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: libwapiti.py
+
+Description: a ctypes binding to libwapiti, the shared library built from
+the Wapiti sources in ext/libwapiti. Models are loaded once per process
+and sequences are given to Wapiti as arrays of tokens, without starting
+any process or formatting any text. Labelling releases the GIL, so
+several threads can label with the same model at once.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see GNU official website.
+"""
+
+import ctypes
+import os.path
+import threading
+
+from software import SEM_HOME
+
+__library_name = os.path.join(SEM_HOME, "ext", "libwapiti", "libwapiti.so")
+__library      = None
+__lock         = threading.RLock()
+
+def library_name():
+    """
+    returns the path of the Wapiti shared library.
+    """
+    
+    return __library_name
+
+def library():
+    """
+    Returns the Wapiti shared library, loading it the first time.
+    
+    The library is built by running "make" in ext/libwapiti once the
+    Wapiti sources are extracted in ext/wapiti.
+    """
+    
+    global __library
+    
+    with __lock:
+        if __library is None:
+            if not os.path.exists(library_name()):
+                raise OSError('Wapiti library not found: "%s", run "make" in %s' %(library_name(), os.path.dirname(library_name())))
+            # functions of a CDLL release the GIL while they run.
+            lib = ctypes.CDLL(library_name())
+            lib.semw_error.argtypes    = []
+            lib.semw_error.restype     = ctypes.c_char_p
+            lib.semw_load.argtypes     = [ctypes.c_char_p]
+            lib.semw_load.restype      = ctypes.c_void_p
+            lib.semw_free.argtypes     = [ctypes.c_void_p]
+            lib.semw_free.restype      = None
+            lib.semw_nlabels.argtypes  = [ctypes.c_void_p]
+            lib.semw_nlabels.restype   = ctypes.c_uint32
+            lib.semw_labelstr.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+            lib.semw_labelstr.restype  = ctypes.c_char_p
+            lib.semw_label.argtypes    = [ctypes.c_void_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_char_p), ctypes.POINTER(ctypes.c_uint32)]
+            lib.semw_label.restype     = ctypes.c_int
+            __library = lib
+    return __library
+
+class Model(object):
+    """
+    A Wapiti model loaded in the Wapiti library.
+    
+    Attributes
+    ----------
+    _path : str
+        the path of the model file
+    _handle : int
+        the address of the model in the library
+    _labels : list of str
+        the labels of the model, in Wapiti order
+    """
+    
+    def __init__(self, path):
+        self._library = library()
+        self._path    = path
+        self._handle  = self._library.semw_load(path)
+        if not self._handle:
+            raise RuntimeError("cannot load Wapiti model: %s" %self._library.semw_error())
+        self._labels  = [self._library.semw_labelstr(self._handle, y) for y in xrange(self._library.semw_nlabels(self._handle))]
+    
+    def __del__(self):
+        if getattr(self, "_handle", None):
+            self._library.semw_free(self._handle)
+            self._handle = None
+    
+    @property
+    def path(self):
+        return self._path
+    
+    @property
+    def labels(self):
+        return self._labels
+    
+    def label(self, sequences):
+        """
+        Labels sequences of tokens.
+        
+        Parameters
+        ----------
+        sequences : list of list of list of str
+            the columns of each token of each sequence.
+        
+        Returns
+        -------
+        list of list of str
+            the labels of each sequence.
+        """
+        
+        result = []
+        for sequence in sequences:
+            length  = len(sequence)
+            columns = [column for token in sequence for column in token]
+            counts  = (ctypes.c_uint32 * length)(*[len(token) for token in sequence])
+            tokens  = (ctypes.c_char_p * len(columns))(*columns)
+            out     = (ctypes.c_uint32 * length)()
+            if self._library.semw_label(self._handle, length, counts, tokens, out) != 0:
+                raise RuntimeError("cannot label sequence with %s: %s" %(self._path, self._library.semw_error()))
+            result.append([self._labels[y] for y in out])
+        return result
+    
+    def label_sentences(self, sentences, encoding):
+        """
+        Labels sentences given as lines of whitespace-separated fields,
+        the way Wapiti reads them.
+        """
+        
+        sequences = [[line.encode(encoding).split() for line in sentence] for sentence in sentences]
+        return [[label.decode(encoding) for label in labels] for labels in self.label(sequences)]
+
+__models = {}
+
+def get_model(path):
+    """
+    Returns the model loaded from path. Models are loaded once per
+    process and reloaded if the file changed.
+    """
+    
+    key   = os.path.abspath(path)
+    mtime = os.path.getmtime(key)
+    with __lock:
+        if key not in __models or __models[key][0] != mtime:
+            __models[key] = (mtime, Model(key))
+        return __models[key][1]
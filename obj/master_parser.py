@@ -44,7 +44,7 @@ class Master(object):
     """
     
     _allowed_pipes   = set([u"segmentation", u"enrich", u"label", u"clean_info", u"export"])
-    _allowed_options = set([u"file", u"encoding", u"log", u"clean"])
+    _allowed_options = set([u"file", u"encoding", u"log", u"clean", u"wapiti", u"pipelining", u"optimise", u"stage-cache"])
     
     class Process(object):
         """
@@ -89,9 +89,36 @@ class Master(object):
             The file to log to.
         _clean : boolean
             Are temporary files cleaned up at the end of the process ?
+        _wapiti_backend : str
+            How Wapiti is called for labelling (see obj.wapiti.backends).
+        _wapiti_workers : int
+            The number of workers labelling a document in parallel.
+        _wapiti_stream : boolean
+            Are documents streamed to Wapiti instead of being sent at once ?
+        _wapiti_cache : int
+            The number of sentences kept in the label cache, 0 for no cache.
+        _wapiti_cache_file : str
+            The file where the label cache is persisted, None to keep it
+            in memory only.
+        _wapiti_max_length : int
+            The length above which sentences are split for labelling, None
+            to never split them.
+        _wapiti_overlap : int
+            The number of tokens shared by windows of split sentences.
+        _pipelining_block_size : int
+            The number of sentences in the blocks that go through the
+            enrichment and labelling processes concurrently, 0 to pass the
+            whole document through a process before the next one.
+        _pipelining_queue_size : int
+            The number of blocks waiting between two processes.
+        _optimise : boolean
+            Are the features whose values are never read left uncomputed ?
+        _stage_cache_file : str
+            The file where the state of documents after each process is
+            cached, None for no cache.
         """
         
-        def __init__(self, file_format="text", fields=None, word_field=None, ienc="utf-8", oenc="utf-8", log_level=logging.CRITICAL, log_file=None, clean=False):
+        def __init__(self, file_format="text", fields=None, word_field=None, ienc="utf-8", oenc="utf-8", log_level=logging.CRITICAL, log_file=None, clean=False, wapiti_backend=u"server", wapiti_workers=1, wapiti_stream=False, wapiti_cache=0, wapiti_cache_file=None, wapiti_max_length=None, wapiti_overlap=10, pipelining_block_size=0, pipelining_queue_size=2, optimise=False, stage_cache_file=None):
             self._format     = file_format.lower()
             self._fields     = fields or []
             self._word_field = word_field
@@ -101,6 +128,20 @@ class Master(object):
             self._log_file   = log_file
             self._clean      = clean
             
+            self._wapiti_backend = wapiti_backend
+            self._wapiti_workers = wapiti_workers
+            self._wapiti_stream  = wapiti_stream
+            self._wapiti_cache   = wapiti_cache
+            self._wapiti_cache_file = wapiti_cache_file
+            self._wapiti_max_length = wapiti_max_length
+            self._wapiti_overlap    = wapiti_overlap
+            
+            self._pipelining_block_size = pipelining_block_size
+            self._pipelining_queue_size = pipelining_queue_size
+            self._optimise              = optimise
+            
+            self._stage_cache_file = stage_cache_file
+            
             if self._fields and not self._word_field:
                 self._word_field = self._fields[0]
         
@@ -136,6 +177,50 @@ class Master(object):
         def clean(self):
             return self._clean
         
+        @property
+        def wapiti_backend(self):
+            return self._wapiti_backend
+        
+        @property
+        def wapiti_workers(self):
+            return self._wapiti_workers
+        
+        @property
+        def wapiti_stream(self):
+            return self._wapiti_stream
+        
+        @property
+        def wapiti_cache(self):
+            return self._wapiti_cache
+        
+        @property
+        def wapiti_cache_file(self):
+            return self._wapiti_cache_file
+        
+        @property
+        def wapiti_max_length(self):
+            return self._wapiti_max_length
+        
+        @property
+        def wapiti_overlap(self):
+            return self._wapiti_overlap
+        
+        @property
+        def pipelining_block_size(self):
+            return self._pipelining_block_size
+        
+        @property
+        def pipelining_queue_size(self):
+            return self._pipelining_queue_size
+        
+        @property
+        def optimise(self):
+            return self._optimise
+        
+        @property
+        def stage_cache_file(self):
+            return self._stage_cache_file
+        
         def set_ienc(self, ienc):
             self._ienc = ienc
         
@@ -151,6 +236,39 @@ class Master(object):
         def set_clean(self, clean):
             self._clean = clean
         
+        def set_wapiti_backend(self, wapiti_backend):
+            self._wapiti_backend = wapiti_backend
+        
+        def set_wapiti_workers(self, wapiti_workers):
+            self._wapiti_workers = wapiti_workers
+        
+        def set_wapiti_stream(self, wapiti_stream):
+            self._wapiti_stream = wapiti_stream
+        
+        def set_wapiti_cache(self, wapiti_cache):
+            self._wapiti_cache = wapiti_cache
+        
+        def set_wapiti_cache_file(self, wapiti_cache_file):
+            self._wapiti_cache_file = wapiti_cache_file
+        
+        def set_wapiti_max_length(self, wapiti_max_length):
+            self._wapiti_max_length = wapiti_max_length
+        
+        def set_wapiti_overlap(self, wapiti_overlap):
+            self._wapiti_overlap = wapiti_overlap
+        
+        def set_pipelining_block_size(self, pipelining_block_size):
+            self._pipelining_block_size = pipelining_block_size
+        
+        def set_pipelining_queue_size(self, pipelining_queue_size):
+            self._pipelining_queue_size = pipelining_queue_size
+        
+        def set_optimise(self, optimise):
+            self._optimise = optimise
+        
+        def set_stage_cache_file(self, stage_cache_file):
+            self._stage_cache_file = stage_cache_file
+        
     def __init__(self, infile):
         self.pipeline = []
         self.options  = Master.Options()
@@ -195,3 +313,19 @@ class Master(object):
                     self.options.set_log_file(child.attrib.get("file", None))
                 elif option == "clean":
                     self.options.set_clean(True)
+                elif option == "wapiti":
+                    self.options.set_wapiti_backend(child.attrib.get("backend", self.options.wapiti_backend))
+                    self.options.set_wapiti_workers(int(child.attrib.get("workers", self.options.wapiti_workers)))
+                    self.options.set_wapiti_stream(child.attrib.get("stream", u"false").lower() == u"true")
+                    self.options.set_wapiti_cache(int(child.attrib.get("cache", self.options.wapiti_cache)))
+                    self.options.set_wapiti_cache_file(child.attrib.get("cache-file", self.options.wapiti_cache_file))
+                    if "max-length" in child.attrib:
+                        self.options.set_wapiti_max_length(int(child.attrib["max-length"]))
+                    self.options.set_wapiti_overlap(int(child.attrib.get("overlap", self.options.wapiti_overlap)))
+                elif option == "pipelining":
+                    self.options.set_pipelining_block_size(int(child.attrib.get("block-size", 100)))
+                    self.options.set_pipelining_queue_size(int(child.attrib.get("queue-size", self.options.pipelining_queue_size)))
+                elif option == "optimise":
+                    self.options.set_optimise(True)
+                elif option == "stage-cache":
+                    self.options.set_stage_cache_file(child.attrib.get("file", "stages.db"))
@@ -6,7 +6,6 @@ file: wapiti.py
 Description: a very simple wrapper for calling wapiti. Provides train
 and test procedures.
 TODO: add every option for train and test
-TODO: add support for other modes, such as dump and update (1.5.0+)
 
 author: Yoann Dupont
 copyright (c) 2016 Yoann Dupont - all rights reserved
@@ -25,9 +24,15 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see GNU official website.
 """
 
+import atexit
+import bisect
+import collections
+import heapq
 import logging
 import os.path
+import re
 import subprocess
+import threading
 import time
 
 from obj.logger import default_handler
@@ -48,9 +53,12 @@ def command_name():
     
     return __command_name
 
-def train(input, pattern=None, output=None, algorithm=None, nthreads=1, maxiter=None, rho1=None, rho2=None, model=None):
+def train(input, pattern=None, output=None, algorithm=None, nthreads=1, maxiter=None, rho1=None, rho2=None, model=None, devel=None, compact=False):
     """
     The train command of Wapiti.
+    
+    If model is given, training starts from the weights of this model
+    instead of zeros.
     """
     
     cmd = [command_name(), "train"]
@@ -61,6 +69,8 @@ def train(input, pattern=None, output=None, algorithm=None, nthreads=1, maxiter=
     if rho1 is not None:      cmd.extend(["-1", str(rho1)])
     if rho2 is not None:      cmd.extend(["-2", str(rho2)])
     if model is not None:     cmd.extend(["-m", str(model)])
+    if devel is not None:     cmd.extend(["-d", str(devel)])
+    if compact:               cmd.extend(["-c"])
     
     cmd.append(str(input))
     if output is not None: cmd.append(str(output))
@@ -71,14 +81,18 @@ def train(input, pattern=None, output=None, algorithm=None, nthreads=1, maxiter=
         if output is None: output = "*stdout"
         raise RuntimeError("Wapiti exited with status %i.\n%10s: %s\n%10s: %s\n%10s: %s" %(exit_status, "input", input, "pattern", pattern, "output", output))
 
-def label(input, model, output=None, only_labels=False, nbest=None):
+def label(input, model, output=None, only_labels=False, nbest=None, check=False):
     """
     The label command of Wapiti.
+    
+    If check is True, the last column of input is the reference label,
+    it is not used as a feature.
     """
     
     cmd = [command_name(), "label", "-m", str(model)]
     
     if only_labels:       cmd.extend(["-l"])
+    if check:             cmd.extend(["-c"])
     if nbest is not None: cmd.extend(["-n", str(nbest)])
     
     cmd.append(input)
@@ -90,6 +104,315 @@ def label(input, model, output=None, only_labels=False, nbest=None):
         if output is None: output = "*stdout"
         raise RuntimeError("Wapiti exited with status %i.\n\tmodel: %s\n\tinput: %s\n\toutput: %s" %(exit_status, model, input, output))
 
+def dump(model, output=None, precision=None, all_weights=False):
+    """
+    The dump command of Wapiti: writes the weights of a model in a
+    readable format, one "observation previous_label label weight" line
+    per weight ("#" as previous label for unigram weights).
+    """
+    
+    cmd = [command_name(), "dump"]
+    
+    if precision is not None: cmd.extend(["-p", str(precision)])
+    if all_weights:           cmd.extend(["--all"])
+    
+    cmd.append(str(model))
+    if output is not None: cmd.append(str(output))
+    
+    exit_status = subprocess.call(cmd)
+    
+    if exit_status != 0:
+        if output is None: output = "*stdout"
+        raise RuntimeError("Wapiti exited with status %i.\n\tmodel: %s\n\toutput: %s" %(exit_status, model, output))
+
+def update(model, patch, output=None, compact=False):
+    """
+    The update command of Wapiti: sets the weights of a model to the
+    values given in a patch file written in the dump format.
+    """
+    
+    cmd = [command_name(), "update", "-m", str(model)]
+    
+    if compact: cmd.extend(["-c"])
+    
+    cmd.append(str(patch))
+    if output is not None: cmd.append(str(output))
+    
+    exit_status = subprocess.call(cmd)
+    
+    if exit_status != 0:
+        if output is None: output = "*stdout"
+        raise RuntimeError("Wapiti exited with status %i.\n\tmodel: %s\n\tpatch: %s\n\toutput: %s" %(exit_status, model, patch, output))
+
+def model_labels(model):
+    """
+    Returns the labels of a Wapiti model, read from the header of the
+    model file.
+    """
+    
+    with open(model, "rb") as input_stream:
+        if not input_stream.readline().startswith("#mdl#"):
+            raise ValueError("not a Wapiti model: %s" %model)
+        header = input_stream.readline().strip()
+        if not header.startswith("#rdr#"):
+            raise ValueError("not a Wapiti model: %s" %model)
+        for _ in xrange(int(header[5:].split("/")[0])):
+            input_stream.readline()
+        header = input_stream.readline().strip()
+        if not header.startswith("#qrk#"):
+            raise ValueError("not a Wapiti model: %s" %model)
+        labels = []
+        for _ in xrange(int(header[5:])):
+            line = input_stream.readline().rstrip("\r\n")
+            labels.append(line[line.index(":")+1 : -1])
+    
+    return labels
+
+def model_patterns(model):
+    """
+    Returns the patterns of a Wapiti model, read from the header of the
+    model file.
+    """
+    
+    with open(model, "rb") as input_stream:
+        if not input_stream.readline().startswith("#mdl#"):
+            raise ValueError("not a Wapiti model: %s" %model)
+        header = input_stream.readline().strip()
+        if not header.startswith("#rdr#"):
+            raise ValueError("not a Wapiti model: %s" %model)
+        patterns = []
+        for _ in xrange(int(header[5:].split("/")[0])):
+            line = input_stream.readline().rstrip("\r\n")
+            patterns.append(line[line.index(":")+1 : -1].decode("utf-8"))
+    
+    return patterns
+
+# a reference to a token in a pattern: %x[offset,column] or %t/%m[offset,column,"regexp"]
+__pattern_reference = re.compile(r"%[xXtTmM]\[\s*-?\d+\s*,\s*(\d+)")
+
+def model_columns(model):
+    """
+    Returns the set of the indices of the columns read by the patterns of
+    a Wapiti model. The other columns have no influence on labelling.
+    """
+    
+    columns = set()
+    for pattern in model_patterns(model):
+        columns.update([int(column) for column in __pattern_reference.findall(pattern)])
+    return columns
+
+class WapitiServer(object):
+    """
+    A long-lived "wapiti label" process for a given model. The model is
+    loaded once when the process starts and stays in memory between calls,
+    so the labelling cost of a batch is the decoding time only.
+    
+    Sentences are sent to Wapiti as framed batches: each sentence is
+    terminated by an empty line and Wapiti answers with one label per
+    token followed by an empty line, flushing its output after each
+    sentence. If the child process dies, it is restarted and the current
+    batch is sent again. A batch that a running Wapiti process does not
+    answer properly is not sent again: it would fail the same way. A
+    server inherited by a forked process starts its own child, the one of
+    the parent process is left untouched.
+    
+    Attributes
+    ----------
+    _model : str
+        the model file given to Wapiti
+    _encoding : str
+        the encoding used to communicate with Wapiti
+    _max_restarts : int
+        the number of times a batch is retried after the child crashed
+    _process : subprocess.Popen
+        the Wapiti process, None if not started
+    _pid : int
+        the identifier of the process that started the Wapiti process
+    _stderr : collections.deque
+        the last lines written by Wapiti on its error output
+    """
+    
+    def __init__(self, model, encoding="utf-8", max_restarts=2):
+        self._model        = model
+        self._encoding     = encoding
+        self._max_restarts = max_restarts
+        self._process      = None
+        self._pid          = None
+        self._stderr       = collections.deque(maxlen=50)
+        self._lock         = threading.Lock()
+    
+    @property
+    def model(self):
+        return self._model
+    
+    @property
+    def encoding(self):
+        return self._encoding
+    
+    @property
+    def alive(self):
+        return self._process is not None and self._process.poll() is None
+    
+    def start(self):
+        cmd = [command_name(), "label", "-m", self._model, "--label"]
+        
+        wapiti_logger.debug('starting wapiti server for "%s"' %self._model)
+        self._stderr.clear()
+        self._pid     = os.getpid()
+        self._process = subprocess.Popen(cmd, bufsize=-1, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        
+        # Wapiti regularly writes progress information on stderr, it has to be
+        # consumed or the child will block once the pipe is full.
+        drainer = threading.Thread(target=self._drain_stderr, args=(self._process.stderr,))
+        drainer.daemon = True
+        drainer.start()
+    
+    def stop(self):
+        if self._process is None:
+            return
+        if self._pid != os.getpid(): # the Wapiti process belongs to the parent process
+            self._process = None
+            return
+        
+        wapiti_logger.debug('stopping wapiti server for "%s"' %self._model)
+        try:
+            self._process.stdin.close()
+        except IOError:
+            pass
+        if self._process.poll() is None:
+            try:
+                self._process.terminate()
+            except OSError:
+                pass
+        self._process.wait()
+        self._process = None
+    
+    def label(self, sentences):
+        """
+        Returns the labels Wapiti predicted for every sentence.
+        
+        Parameters
+        ----------
+        sentences : list of list of unicode
+            the sentences to label. Each token is a line of
+            whitespace-separated fields, as Wapiti expects them.
+        
+        Returns
+        -------
+        list of list of unicode
+            the labels for each token of each sentence.
+        """
+        
+        if len(sentences) == 0:
+            return []
+        
+        with self._lock:
+            if self._process is not None and self._pid != os.getpid():
+                # inherited from the parent process, sharing its pipes
+                # would mix the outputs of both processes.
+                self._process = None
+            for attempt in range(self._max_restarts + 1):
+                if not self.alive:
+                    if self._process is not None:
+                        self._log_crash()
+                        self.stop()
+                    self.start()
+                try:
+                    return self._communicate(sentences)
+                except (IOError, EOFError), exc:
+                    # the end of the output means Wapiti is exiting even
+                    # if it is not dead yet.
+                    crashed = isinstance(exc, EOFError) or not self.alive
+                    self._log_crash()
+                    # the output of Wapiti may be out of step with the
+                    # sentences sent, it cannot be used any longer.
+                    self.stop()
+                    if not crashed:
+                        raise
+                    wapiti_logger.warn('wapiti server for "%s" failed (%s), restarting it' %(self._model, exc))
+        
+        raise RuntimeError('Wapiti server for "%s" crashed %i times in a row' %(self._model, self._max_restarts+1))
+    
+    def _communicate(self, sentences):
+        process = self._process
+        errors  = []
+        
+        # The batch is written from another thread: Wapiti answers while it
+        # reads, writing everything before reading could fill both pipes.
+        def write():
+            try:
+                for sentence in sentences:
+                    process.stdin.write((u"\n".join(sentence) + u"\n\n").encode(self._encoding))
+                process.stdin.flush()
+            except IOError, exc:
+                errors.append(exc)
+        
+        writer = threading.Thread(target=write)
+        writer.daemon = True
+        writer.start()
+        
+        tags = []
+        for sentence in sentences:
+            tags.append([])
+            while True:
+                line = process.stdout.readline()
+                if line == "":
+                    raise EOFError("unexpected end of wapiti output")
+                line = line.strip()
+                if line == "":
+                    if len(tags[-1]) > 0:
+                        break
+                else:
+                    tags[-1].append(line.decode(self._encoding))
+            if len(tags[-1]) != len(sentence):
+                raise IOError("expected %i labels from wapiti, got %i" %(len(sentence), len(tags[-1])))
+        
+        writer.join()
+        if errors:
+            raise errors[0]
+        
+        return tags
+    
+    def _drain_stderr(self, stream):
+        for line in iter(stream.readline, ""):
+            self._stderr.append(line.rstrip())
+    
+    def _log_crash(self):
+        # Wapiti also writes its progress on stderr, only an exit status
+        # tells an error.
+        if self._process is not None and self._process.poll() not in (None, 0):
+            wapiti_logger.error("Wapiti exited with status %i" %self._process.returncode)
+        for error_part in [line for line in self._stderr if line.strip() != ""]:
+            wapiti_logger.debug(error_part)
+
+__servers      = {}
+__servers_lock = threading.Lock()
+
+def get_server(model, encoding="utf-8", worker=0):
+    """
+    Returns the running Wapiti server for the given model, creating it if
+    needed. Servers are shared across calls and stopped at exit. Each
+    worker has its own server, so that parallel workers do not wait for
+    each other.
+    """
+    
+    key = (os.path.abspath(model), encoding.lower(), worker)
+    with __servers_lock:
+        if key not in __servers:
+            __servers[key] = WapitiServer(model, encoding=encoding)
+        return __servers[key]
+
+def stop_servers():
+    """
+    Stops every Wapiti server started by get_server.
+    """
+    
+    for server in __servers.values():
+        server.stop()
+    __servers.clear()
+
+atexit.register(stop_servers)
+
 def label_corpus(corpus, model, field, encoding):
     corpus_unicode = unicode(corpus).encode(encoding)
     
@@ -110,16 +433,123 @@ def label_corpus(corpus, model, field, encoding):
             corpus.sentences[i][j][field] = element
             j += 1
 
-def label_document(document, model, field, encoding, annotation_name=None, annotation_fields=None):
-    if annotation_fields is None:
-        fields = document.corpus.fields
-    else:
-        fields = annotation_fields
+def stream_label_corpus(corpus, model, field, encoding, fields):
+    """
+    Labels a corpus with a new "wapiti label" process, streaming it
+    sentence by sentence: a writer thread feeds Wapiti while labels are
+    read line by line and written straight into the field of the tokens.
+    Only one sentence at a time is formatted, so memory does not depend on
+    the size of the corpus.
     
-    if annotation_name is None:
-        annotation_name = unicode(field)
+    Parameters
+    ----------
+    corpus : obj.storage.Corpus
+        the corpus to label, modified in place.
+    model : str
+        the Wapiti model file.
+    field : str
+        the field where labels are written in the corpus.
+    encoding : str
+        the encoding used to communicate with Wapiti.
+    fields : list of str
+        the fields given to Wapiti.
+    """
+    
+    fmt = u"\t".join([u"%%(%s)s" %f for f in fields])
+    cmd = [command_name(), "label", "-m", model, "--label"]
+    
+    wapiti_process = subprocess.Popen(cmd, bufsize=-1, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    errors         = []
+    stderr         = collections.deque(maxlen=50)
     
-    corpus_unicode = document.corpus.unicode(fields).encode(encoding)
+    def write():
+        try:
+            for sentence in corpus:
+                wapiti_process.stdin.write(u"".join([(fmt %token) + u"\n" for token in sentence]).encode(encoding) + "\n")
+        except IOError, exc:
+            errors.append(exc)
+        finally:
+            try:
+                wapiti_process.stdin.close()
+            except IOError:
+                pass
+    
+    def drain():
+        for line in iter(wapiti_process.stderr.readline, ""):
+            stderr.append(line.rstrip())
+    
+    threads = [threading.Thread(target=write), threading.Thread(target=drain)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    
+    sentences = corpus.sentences
+    i = 0
+    j = 0
+    for line in wapiti_process.stdout:
+        line = line.strip()
+        if line == "":
+            if j > 0:
+                if j != len(sentences[i]):
+                    errors.append(IOError("expected %i labels from wapiti, got %i" %(len(sentences[i]), j)))
+                i += 1
+                j  = 0
+        elif i < len(sentences) and j < len(sentences[i]):
+            sentences[i][j][field] = line.decode(encoding)
+            j += 1
+        else:
+            errors.append(IOError("wapiti returned more labels than tokens"))
+            break
+    
+    for thread in threads:
+        thread.join()
+    wapiti_process.wait()
+    
+    try:
+        if wapiti_process.returncode != 0:
+            raise RuntimeError("Wapiti exited with status %i" %wapiti_process.returncode)
+        if errors:
+            raise errors[0]
+        if i != len(sentences):
+            raise IOError("expected %i sentences from wapiti, got %i" %(len(sentences), i))
+    except (RuntimeError, IOError), exc:
+        for error_part in [line for line in stderr if line.strip() != ""]:
+            wapiti_logger.error(error_part)
+        wapiti_logger.exception(exc)
+        raise
+
+def corpus_sentences(corpus, fields):
+    """
+    Returns the sentences of a corpus as Wapiti reads them: one line per
+    token, its fields separated by tabulations.
+    """
+    
+    fmt = u"\t".join([u"%%(%s)s" %field for field in fields])
+    return [[fmt %token for token in sentence] for sentence in corpus]
+
+def label_sentences(sentences, model, encoding, worker=0):
+    """
+    Labels sentences with a new "wapiti label" process.
+    
+    Parameters
+    ----------
+    sentences : list of list of unicode
+        the sentences to label, one line per token.
+    model : str
+        the Wapiti model file.
+    encoding : str
+        the encoding used to communicate with Wapiti.
+    worker : int
+        the index of the calling worker, unused as every call starts its
+        own process.
+    
+    Returns
+    -------
+    list of list of unicode
+        the labels for each token of each sentence.
+    """
+    
+    corpus_unicode = u"\n".join([u"".join([line + u"\n" for line in sentence]) for sentence in sentences]).encode(encoding)
     
     cmd = [command_name(), "label", "-m", model, "--label"]
     
@@ -135,21 +565,367 @@ def label_document(document, model, field, encoding, annotation_name=None, annot
         wapiti_logger.exception(re)
         raise
     
-    
-    i    = 0
-    j    = 0
     tags = [[]]
-    document.corpus.fields.append(field)
     for element in w_stdout.split("\n"):
         element = element.strip()
         if "" == element:
             if len(tags[-1]) > 0:
                 tags.append([])
-                i += 1
-                j  = 0
         else:
-            tags[-1].append(element)
-            j += 1
+            tags[-1].append(element.decode(encoding))
+    
+    return [t for t in tags if t]
+
+def server_label_sentences(sentences, model, encoding, worker=0):
+    """
+    Labels sentences with the persistent Wapiti server of the model.
+    """
+    
+    return get_server(model, encoding=encoding, worker=worker).label(sentences)
+
+def python_label_sentences(sentences, model, encoding, worker=0):
+    """
+    Labels sentences in-process with the python decoder of obj.crf.
+    """
+    
+    # imported here so that NumPy is only required by this backend.
+    from obj.crf import get_model
+    
+    return get_model(model).label_sentences(sentences, encoding)
+
+def library_label_sentences(sentences, model, encoding, worker=0):
+    """
+    Labels sentences in-process with the Wapiti library (see
+    obj.libwapiti).
+    """
+    
+    from obj.libwapiti import get_model
+    
+    return get_model(model).label_sentences(sentences, encoding)
+
+# every backend is called as function(sentences, model, encoding, worker)
+# and returns the labels of each sentence. worker is the index of the
+# calling worker when labelling in parallel.
+backends = {
+    u"subprocess" : label_sentences,
+    u"server"     : server_label_sentences,
+    u"python"     : python_label_sentences,
+    u"library"    : library_label_sentences
+}
+
+def preload_model(model, backend):
+    """
+    Loads a model in the current process for the backends that label
+    in-process, so that processes forked afterwards share it instead of
+    loading it again.
+    """
+    
+    if backend == u"python":
+        from obj.crf import get_model
+        get_model(model)
+    elif backend == u"library":
+        from obj.libwapiti import get_model
+        get_model(model)
+
+def shard_sentences(sentences, shards):
+    """
+    Splits sentences in at most the given number of shards of balanced
+    number of tokens. Longest sentences are placed first, each in the
+    shard with the fewest tokens so far.
+    
+    Returns
+    -------
+    list of list of int
+        the indices of the sentences of each shard, in increasing order.
+    """
+    
+    shards  = max(1, min(shards, len(sentences)))
+    indices = [[] for _ in xrange(shards)]
+    heap    = [(0, nth) for nth in xrange(shards)]
+    for index in sorted(xrange(len(sentences)), key=lambda i: -len(sentences[i])):
+        size, nth = heapq.heappop(heap)
+        indices[nth].append(index)
+        heapq.heappush(heap, (size + len(sentences[index]), nth))
+    return [sorted(shard) for shard in indices if shard]
+
+def parallel_label_sentences(sentences, model, encoding, label_function, workers):
+    """
+    Labels sentences with label_function on length-balanced shards, each
+    shard being labelled by its own worker thread. Labels are returned in
+    the original order of sentences.
+    """
+    
+    shards = shard_sentences(sentences, workers)
+    if len(shards) < 2:
+        return label_function(sentences, model, encoding)
+    
+    tags   = [None] * len(sentences)
+    errors = []
+    def work(worker, shard):
+        try:
+            labels = label_function([sentences[index] for index in shard], model, encoding, worker=worker)
+            for index, sentence_tags in zip(shard, labels):
+                tags[index] = sentence_tags
+        except Exception, e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=work, args=(worker, shard)) for worker, shard in enumerate(shards)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    
+    return tags
+
+__label_caches = {}
+
+def get_label_cache(capacity=10000, path=None):
+    """
+    Returns the label cache stored in path (in memory only if path is
+    None), creating it if needed. Caches are shared across calls so that
+    every document of a run benefits from them.
+    """
+    
+    from obj.cache import LabelCache
+    
+    key = (os.path.abspath(path) if path is not None else None)
+    if key not in __label_caches:
+        __label_caches[key] = LabelCache(capacity=capacity, path=path)
+    return __label_caches[key]
+
+def get_label_function(backend):
+    """
+    Returns the labelling function of a backend (see backends).
+    """
+    
+    try:
+        return backends[backend]
+    except KeyError:
+        raise ValueError(u'unknown wapiti backend: "%s"' %backend)
+
+# tokens after which an over-long sentence may be split.
+split_tokens = set([u",", u";", u":"])
+
+def split_windows(length, max_length, breaks=(), overlap=0):
+    """
+    Splits a sentence of the given length in windows of at most
+    max_length tokens. A window ends at the last break (the index of a
+    token that may start a window) it contains, if any. Otherwise the
+    window is cut at max_length tokens and the next one starts overlap
+    tokens before, so that tokens around the cut are labelled with some
+    context in both windows.
+    
+    Returns
+    -------
+    list of tuple
+        a (start, end, owned_start, owned_end) tuple for each window: the
+        window spans tokens [start, end) and the labels of tokens
+        [owned_start, owned_end) are taken from it.
+    """
+    
+    if not 0 <= overlap < max_length:
+        raise ValueError("overlap must be in [0, %i[, got %i" %(max_length, overlap))
+    
+    breaks  = sorted(set(breaks))
+    windows = []
+    start   = 0
+    owned   = 0
+    while length - start > max_length:
+        limit = start + max_length
+        index = bisect.bisect_right(breaks, limit) - 1
+        if index >= 0 and breaks[index] > owned:
+            cut = breaks[index]
+            windows.append((start, cut, owned, cut))
+            start = owned = cut
+        else:
+            following = limit - overlap
+            middle    = following + overlap // 2
+            windows.append((start, limit, owned, middle))
+            start, owned = following, middle
+    windows.append((start, length, owned, length))
+    
+    return windows
+
+def sentence_breaks(sentence, document=None, offset=0):
+    """
+    Returns the indices of the tokens of a sentence that follow a
+    splitting token (see split_tokens) or a newline in the content of the
+    document.
+    
+    Parameters
+    ----------
+    sentence : list of unicode
+        the sentence, one line per token, the first field being the word.
+    document : obj.storage.Document
+        the document of the sentence, used to find newlines if given.
+    offset : int
+        the index of the first token of the sentence in the document.
+    """
+    
+    breaks = [i for i in xrange(1, len(sentence)) if sentence[i-1].split(u"\t", 1)[0] in split_tokens]
+    
+    if document is not None and document.content is not None and u"tokens" in document.segmentations:
+        spans   = document.segmentation(u"tokens").spans
+        content = document.content
+        for i in xrange(1, len(sentence)):
+            if u"\n" in content[spans[offset+i-1].ub : spans[offset+i].lb]:
+                breaks.append(i)
+    
+    return sorted(set(breaks))
+
+def label_batch(sentences, model, encoding, backend=u"subprocess", workers=1, cache=None, max_length=None, overlap=10, breaks=None):
+    """
+    Labels sentences with a Wapiti model in a single batch, using the
+    given number of workers and label cache (see label_document).
+    
+    If max_length is given, sentences longer than max_length are decoded
+    as smaller windows (see split_windows) and their labels are put back
+    together. breaks gives the indices where each sentence may be split,
+    defaults to the tokens following a splitting token.
+    """
+    
+    if max_length is not None:
+        if breaks is None:
+            breaks = [sentence_breaks(sentence) for sentence in sentences]
+        
+        pieces  = []
+        windows = []
+        for sentence, splits in zip(sentences, breaks):
+            if len(sentence) > max_length:
+                windows.append(split_windows(len(sentence), max_length, breaks=splits, overlap=overlap))
+            else:
+                windows.append([(0, len(sentence), 0, len(sentence))])
+            pieces.extend([sentence[start : end] for start, end, _, _ in windows[-1]])
+        
+        split = [len(sentence_windows) for sentence_windows in windows if len(sentence_windows) > 1]
+        if split:
+            wapiti_logger.info("%i over-long sentences split in %i windows" %(len(split), sum(split)))
+        
+        piece_tags = iter(label_batch(pieces, model, encoding, backend=backend, workers=workers, cache=cache))
+        tags       = []
+        for sentence_windows in windows:
+            tags.append([])
+            for start, end, owned_start, owned_end in sentence_windows:
+                tags[-1].extend(next(piece_tags)[owned_start - start : owned_end - start])
+        
+        return tags
+    
+    label_function = get_label_function(backend)
+    
+    def label_all(sentences):
+        if workers > 1:
+            return parallel_label_sentences(sentences, model, encoding, label_function, workers)
+        else:
+            return label_function(sentences, model, encoding)
+    
+    if cache is not None:
+        return cache.label(sentences, model, label_all)
+    else:
+        return label_all(sentences)
+
+def label_document(document, model, field, encoding, annotation_name=None, annotation_fields=None, backend=u"subprocess", workers=1, stream=False, cache=None, max_length=None, overlap=10):
+    """
+    Labels the corpus of a document with a Wapiti model and adds the
+    resulting annotation to the document.
+    
+    Parameters
+    ----------
+    document : obj.storage.Document
+        the document to label.
+    model : str
+        the Wapiti model file.
+    field : str
+        the field where labels are written in the corpus.
+    encoding : str
+        the encoding used to communicate with Wapiti.
+    annotation_name : str
+        the name of the annotation, defaults to field.
+    annotation_fields : list of str
+        the fields given to Wapiti, defaults to every field of the corpus.
+    backend : str
+        the way Wapiti is called, one of the keys of obj.wapiti.backends:
+        "subprocess" starts a new Wapiti process, "server" reuses a
+        persistent Wapiti process for the model and "python" decodes the
+        model in-process (requires NumPy) and "library" labels with the
+        Wapiti shared library built in ext/libwapiti.
+    workers : int
+        the number of workers labelling the document in parallel. The
+        sentences are split in as many shards of similar sizes. Workers
+        are threads, so the "python" backend does not benefit from them.
+    stream : bool
+        if True, the corpus is streamed to a new Wapiti process and labels
+        are written straight into the corpus instead of being collected
+        (see stream_label_corpus). It keeps memory low on huge documents
+        and only works with the "subprocess" backend and a single worker.
+    cache : obj.cache.LabelCache
+        if given, sentences already labelled with the model are taken
+        from the cache and only the others are given to Wapiti (see
+        get_label_cache).
+    max_length : int
+        if given, sentences longer than max_length tokens are split for
+        decoding, after a splitting token (see split_tokens) or a newline
+        if possible, in fixed windows otherwise. The labels are put back
+        together so that the sentences are left unchanged.
+    overlap : int
+        the number of tokens shared by consecutive fixed windows.
+    """
+    
+    if not stream:
+        label_documents([document], model, field, encoding, annotation_name=annotation_name, annotation_fields=annotation_fields, backend=backend, workers=workers, cache=cache, max_length=max_length, overlap=overlap)
+        return
+    
+    if backend != u"subprocess" or workers > 1 or cache is not None or max_length is not None:
+        raise ValueError(u'streaming requires the "subprocess" wapiti backend, a single worker, no cache and no maximum length')
+    
+    if annotation_fields is None:
+        fields = document.corpus.fields
+    else:
+        fields = annotation_fields
+    
+    if annotation_name is None:
+        annotation_name = unicode(field)
+    
+    stream_label_corpus(document.corpus, model, field, encoding, fields)
+    tags = [[token[field] for token in sentence] for sentence in document.corpus]
+    
+    document.corpus.fields.append(field)
+    if tags:
+        document.add_annotation_from_tags(tags, field, annotation_name)
+
+def label_documents(documents, model, field, encoding, annotation_name=None, annotation_fields=None, backend=u"subprocess", workers=1, cache=None, max_length=None, overlap=10):
+    """
+    Labels the corpora of many documents with a Wapiti model in a single
+    batch and adds the resulting annotation to each document. The model
+    is loaded (or the Wapiti process started) once for the whole batch
+    instead of once per document.
+    
+    Parameters are the same as in label_document, except for documents,
+    the list of obj.storage.Document to label. Documents without any
+    sentence are left without annotation.
+    """
+    
+    if annotation_name is None:
+        annotation_name = unicode(field)
+    
+    sentences = []
+    bounds    = []
+    breaks    = ([] if max_length is not None else None)
+    for document in documents:
+        fields = (annotation_fields if annotation_fields is not None else document.corpus.fields)
+        start  = len(sentences)
+        sentences.extend(corpus_sentences(document.corpus, fields))
+        bounds.append((start, len(sentences)))
+        if breaks is not None:
+            offset = 0
+            for sentence in sentences[start:]:
+                breaks.append(sentence_breaks(sentence, document=document, offset=offset))
+                offset += len(sentence)
+    
+    tags = (label_batch(sentences, model, encoding, backend=backend, workers=workers, cache=cache, max_length=max_length, overlap=overlap, breaks=breaks) if sentences else [])
     
-    tags = [t for t in tags if t]
-    document.add_annotation_from_tags(tags, field, annotation_name)
+    for document, (start, end) in zip(documents, bounds):
+        document.corpus.fields.append(field)
+        if end > start:
+            document.add_annotation_from_tags(tags[start : end], field, annotation_name)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: prune_model.py
+
+Description: shrinks a Wapiti model by removing its weakest features. The
+model is dumped, weights whose absolute value is below a threshold (and,
+if training data is given, weights of rarely seen observations) are set
+to zero and the model is compacted, which removes every observation
+left without weights. Smaller models load faster and use less memory.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import codecs, collections, logging, os, os.path, shutil, subprocess, tempfile, time
+
+from obj.logger import default_handler, file_handler
+from obj        import wapiti
+
+prune_model_logger = logging.getLogger("sem.prune_model")
+prune_model_logger.addHandler(default_handler)
+
+def observation_counts(model, infile):
+    """
+    Returns how many times each observation of a model occurs in a CoNLL
+    file, the last column being the label.
+    """
+    
+    # imported here so that NumPy is only required for frequency pruning.
+    from obj.crf import get_model
+    
+    crf    = get_model(model)
+    counts = collections.Counter()
+    tokens = []
+    for line in open(infile, "rU"):
+        # columns are split as Wapiti does, on any whitespace.
+        line = line.split()
+        if line:
+            tokens.append(line[:-1])
+        elif tokens:
+            unigrams, bigrams = crf.sequence_observations(tokens)
+            for observations in unigrams + bigrams:
+                counts.update(set(observations))
+            tokens = []
+    if tokens:
+        unigrams, bigrams = crf.sequence_observations(tokens)
+        for observations in unigrams + bigrams:
+            counts.update(set(observations))
+    
+    names = dict((o, observation) for observation, o in crf.observations.iteritems())
+    return dict((names[o], count) for o, count in counts.iteritems())
+
+def load_time(model, repeat=3):
+    """
+    Returns the time, in seconds, Wapiti takes to load a model and label
+    nothing (the best of repeat runs).
+    """
+    
+    best = None
+    with open(os.devnull, "w") as devnull:
+        for _ in xrange(repeat):
+            start   = time.time()
+            process = subprocess.Popen([wapiti.command_name(), "label", "-m", model], stdin=subprocess.PIPE, stdout=devnull, stderr=devnull)
+            process.communicate("")
+            laps    = time.time() - start
+            best    = (laps if best is None else min(best, laps))
+    return best
+
+def accuracy(model, infile, ienc="utf-8"):
+    """
+    Returns the token accuracy of a model on a CoNLL file, the last column
+    being the reference label.
+    """
+    
+    handle, output = tempfile.mkstemp(suffix=".labels")
+    os.close(handle)
+    try:
+        wapiti.label(infile, model, output=output, only_labels=True, check=True)
+        reference = [line.split()[-1] for line in codecs.open(infile, "rU", ienc) if line.strip()]
+        guess     = [line.strip() for line in codecs.open(output, "rU", ienc) if line.strip()]
+    finally:
+        os.remove(output)
+    
+    if len(reference) != len(guess):
+        raise RuntimeError("expected %i labels from Wapiti, got %i" %(len(reference), len(guess)))
+    if not reference:
+        return 1.0
+    return sum(1 for r, g in zip(reference, guess) if r == g) / float(len(reference))
+
+def prune_model(model, outfile, threshold=0.0, min_count=None, data=None, heldout=None,
+                ienc="utf-8",
+                log_level="WARNING", log_file=None):
+    """
+    Prunes a Wapiti model and writes the result in outfile.
+    
+    Parameters
+    ----------
+    model : str
+        the model to prune.
+    outfile : str
+        the pruned model file, may be the same file as model.
+    threshold : float
+        weights whose absolute value is below threshold are removed. A
+        positive threshold or a min_count has to be given.
+    min_count : int
+        observations seen less than min_count times in data are removed.
+    data : str
+        the CoNLL file used to count observations (usually the training
+        data), required by min_count.
+    heldout : str
+        a labelled CoNLL file on which the accuracy of both models is
+        compared.
+    
+    Returns
+    -------
+    dict
+        a report with the sizes (in bytes), numbers of weights, load times
+        (in seconds) and, if heldout is given, the accuracies of the
+        original and pruned models.
+    """
+    
+    if log_file is not None:
+        prune_model_logger.addHandler(file_handler(log_file))
+    prune_model_logger.setLevel(log_level)
+    
+    if min_count is not None and data is None:
+        raise ValueError("pruning by frequency requires data to count observations")
+    if threshold <= 0.0 and min_count is None:
+        raise ValueError("nothing to prune: give a positive threshold or a minimum count")
+    
+    counts = None
+    if min_count is not None:
+        prune_model_logger.info(u'counting observations in "%s"' %data)
+        counts = observation_counts(model, data)
+    
+    directory = os.path.dirname(os.path.abspath(outfile))
+    handle, output = tempfile.mkstemp(dir=directory, suffix=".model")
+    os.close(handle)
+    handle, dump   = tempfile.mkstemp(suffix=".dump")
+    os.close(handle)
+    handle, patch  = tempfile.mkstemp(suffix=".patch")
+    os.close(handle)
+    
+    kept     = 0
+    removed  = 0
+    unpruned = 0
+    try:
+        prune_model_logger.info(u'dumping "%s"' %model)
+        wapiti.dump(model, output=dump, precision=16)
+        
+        # weights are removed by setting them to zero, compacting the model
+        # then removes the observations that have no weight left.
+        with open(dump) as input_stream, open(patch, "w") as output_stream:
+            for line in input_stream:
+                # fields are separated by tabs, an observation may hold
+                # spaces (from the text of a pattern). Wapiti reads patches
+                # split on any whitespace, such weights cannot be removed.
+                if not line.strip():
+                    continue
+                observation, previous, label, weight = line.rstrip("\n").split("\t")
+                if abs(float(weight)) < threshold or (counts is not None and counts.get(observation, 0) < min_count):
+                    if len(observation.split()) > 1:
+                        unpruned += 1
+                        kept     += 1
+                        continue
+                    output_stream.write("%s\t%s\t%s\t0\n" %(observation, previous, label))
+                    removed += 1
+                else:
+                    kept += 1
+        
+        if unpruned:
+            prune_model_logger.warn(u"%i weights of observations holding spaces kept, Wapiti cannot update them" %unpruned)
+        prune_model_logger.info(u"removing %i weights out of %i" %(removed, kept + removed))
+        wapiti.update(model, patch, output=output, compact=True)
+        
+        report = {
+            "size"        : os.path.getsize(model),
+            "pruned_size" : os.path.getsize(output),
+            "weights"     : kept + removed,
+            "kept"        : kept,
+            "load"        : load_time(model),
+            "pruned_load" : load_time(output)
+        }
+        if heldout is not None:
+            report["accuracy"]        = accuracy(model, heldout, ienc=ienc)
+            report["pruned_accuracy"] = accuracy(output, heldout, ienc=ienc)
+        
+        # mkstemp creates the file readable by its owner only, the pruned
+        # model gets the permissions of the original one.
+        shutil.copymode(model, output)
+        os.rename(output, outfile)
+    finally:
+        for filename in (output, dump, patch):
+            if os.path.exists(filename):
+                os.remove(filename)
+    
+    prune_model_logger.info(u"size: %(size)i -> %(pruned_size)i bytes, weights: %(weights)i -> %(kept)i, load time: %(load).3fs -> %(pruned_load).3fs" %report)
+    if heldout is not None:
+        prune_model_logger.info(u"accuracy: %.4f -> %.4f (%+.4f)" %(report["accuracy"], report["pruned_accuracy"], report["pruned_accuracy"] - report["accuracy"]))
+    
+    return report
+
+
+
+if __name__ == "__main__":
+    import argparse, sys
+    
+    parser = argparse.ArgumentParser(description="Shrinks a Wapiti model by removing its features with small weights or rare observations, and reports the gain in size and load time and the loss in accuracy.")
+    
+    parser.add_argument("model",
+                        help="The model to prune")
+    parser.add_argument("outfile",
+                        help="The pruned model file")
+    parser.add_argument("-t", "--threshold", dest="threshold", type=float, default=0.0,
+                        help="Remove weights whose absolute value is below this threshold (default: %(default)s)")
+    parser.add_argument("-m", "--min-count", dest="min_count", type=int,
+                        help="Remove observations seen less than this number of times in the data")
+    parser.add_argument("-d", "--data", dest="data",
+                        help="The CoNLL file where observations are counted (usually the training data)")
+    parser.add_argument("-e", "--heldout", dest="heldout",
+                        help="A labelled CoNLL file to compare the accuracies of both models")
+    parser.add_argument("--input-encoding", dest="ienc", default="utf-8",
+                        help="Encoding of the input (default: %(default)s)")
+    parser.add_argument("-l", "--log", dest="log_level", choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"), default="INFO",
+                        help="The log level (default: %(default)s)")
+    parser.add_argument("--log-file", dest="log_file",
+                        help="The name of the log file")
+    
+    if __package__:
+        args = parser.parse_args(sys.argv[2:])
+    else:
+        args = parser.parse_args()
+    
+    prune_model(args.model, args.outfile,
+                threshold=args.threshold, min_count=args.min_count, data=args.data, heldout=args.heldout,
+                ienc=args.ienc,
+                log_level=args.log_level, log_file=args.log_file)
+    sys.exit(0)
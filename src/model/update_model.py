@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""
+file: update_model.py
+
+Description: continues the training of an existing Wapiti model on new
+annotated data. Training starts from the weights of the model instead of
+zeros, so it converges in a few iterations instead of retraining from
+scratch.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import codecs, logging, os, os.path, shutil, tempfile, time
+
+from datetime import timedelta
+
+from obj.logger import default_handler, file_handler
+from obj        import wapiti
+
+update_model_logger = logging.getLogger("sem.update_model")
+update_model_logger.addHandler(default_handler)
+
+def data_labels(infile, ienc="utf-8"):
+    """
+    Returns the set of labels (last column) found in a CoNLL file.
+    """
+    
+    labels = set()
+    for line in codecs.open(infile, "rU", ienc):
+        line = line.strip()
+        if line:
+            labels.add(line.split()[-1])
+    return labels
+
+def update_model(model, infiles, outfile,
+                 pattern=None, devel=None, maxiter=None, algorithm=None, nthreads=1, rho1=None, rho2=None, compact=False,
+                 ienc="utf-8",
+                 log_level="WARNING", log_file=None):
+    """
+    Trains a Wapiti model on infiles, starting from the weights of model,
+    and writes the result in outfile. The model is only replaced once
+    training succeeded, so outfile may be the same file as model.
+    
+    Training only optimises the weights for the given data: to add a few
+    hundred sentences to a model, give the new sentences along with the
+    original training data (or a sample of it) so that the model does not
+    drift away from what it learned before. As training starts from a good
+    solution, a small maxiter is usually enough.
+    
+    Parameters
+    ----------
+    model : str
+        the model to start from.
+    infiles : list of str
+        the CoNLL training files, labels being the last column. They must
+        have the same columns as the data the model was trained on.
+    outfile : str
+        the updated model file.
+    pattern : str
+        a file of patterns added to the ones of the model.
+    devel : str
+        the CoNLL development file used to evaluate training.
+    maxiter, algorithm, nthreads, rho1, rho2 :
+        the training options of Wapiti (see obj.wapiti.train).
+    compact : bool
+        remove the observations with null weights from the model.
+    """
+    
+    if log_file is not None:
+        update_model_logger.addHandler(file_handler(log_file))
+    update_model_logger.setLevel(log_level)
+    
+    # Wapiti silently discards the weights of the model (mdl_sync starts
+    # again from zeros) if the data has labels the model does not know,
+    # the model has to be trained again instead.
+    known_labels = set(wapiti.model_labels(model))
+    new_labels   = set()
+    for infile in infiles:
+        new_labels.update(data_labels(infile, ienc=ienc))
+    unknown = new_labels - set([label.decode(ienc) for label in known_labels])
+    if unknown:
+        raise ValueError(u"labels not in model %s: %s, a new model has to be trained" %(model, u", ".join(sorted(unknown))))
+    
+    start     = time.time()
+    directory = os.path.dirname(os.path.abspath(outfile))
+    handle, output = tempfile.mkstemp(dir=directory, suffix=".model")
+    os.close(handle)
+    
+    # Wapiti only adds the observations of the new data to the model if a
+    # pattern file is given: rdr_loadpat appends its patterns to the ones
+    # of the model, an empty file adds no pattern.
+    empty_pattern = None
+    if pattern is None:
+        handle, empty_pattern = tempfile.mkstemp(suffix=".pattern")
+        os.close(handle)
+        pattern = empty_pattern
+    
+    data = None
+    try:
+        if len(infiles) == 1:
+            input = infiles[0]
+        else:
+            # Wapiti reads a single file, sentences of every file are put together.
+            handle, data = tempfile.mkstemp(suffix=".conll")
+            with os.fdopen(handle, "w") as output_stream:
+                for infile in infiles:
+                    with open(infile, "rU") as input_stream:
+                        shutil.copyfileobj(input_stream, output_stream)
+                    output_stream.write("\n\n")
+            input = data
+        
+        # the model is written next to outfile and renamed, outfile is
+        # left as it was if training fails.
+        update_model_logger.info(u'updating "%s" with %s' %(model, u", ".join(infiles)))
+        wapiti.train(input, pattern=pattern, output=output, model=model, devel=devel, maxiter=maxiter, algorithm=algorithm, nthreads=nthreads, rho1=rho1, rho2=rho2, compact=compact)
+        # mkstemp creates the file readable by its owner only, the updated
+        # model gets the permissions of the original one.
+        shutil.copymode(model, output)
+        os.rename(output, outfile)
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
+        if data is not None:
+            os.remove(data)
+        if empty_pattern is not None:
+            os.remove(empty_pattern)
+    
+    laps = time.time() - start
+    update_model_logger.info(u'model written in "%s" in %s' %(outfile, timedelta(seconds=laps)))
+
+
+
+if __name__ == "__main__":
+    import argparse, sys
+    
+    parser = argparse.ArgumentParser(description="Continues the training of a Wapiti model on new annotated data, starting from its current weights.")
+    
+    parser.add_argument("model",
+                        help="The model to update")
+    parser.add_argument("infiles", nargs="+",
+                        help="The CoNLL training files (labels in the last column)")
+    parser.add_argument("-o", "--output", dest="outfile",
+                        help="The updated model file (default: overwrites the model)")
+    parser.add_argument("-p", "--pattern", dest="pattern",
+                        help="A file of patterns to add to the ones of the model")
+    parser.add_argument("-d", "--devel", dest="devel",
+                        help="The CoNLL development file")
+    parser.add_argument("-i", "--maxiter", dest="maxiter", type=int,
+                        help="The maximum number of training iterations")
+    parser.add_argument("-a", "--algorithm", dest="algorithm",
+                        help="The training algorithm")
+    parser.add_argument("-t", "--threads", dest="nthreads", type=int, default=1,
+                        help="The number of training threads (default: %(default)s)")
+    parser.add_argument("-1", "--rho1", dest="rho1", type=float,
+                        help="The L1 penalty")
+    parser.add_argument("-2", "--rho2", dest="rho2", type=float,
+                        help="The L2 penalty")
+    parser.add_argument("-c", "--compact", dest="compact", action="store_true",
+                        help="Remove observations with null weights from the model")
+    parser.add_argument("--input-encoding", dest="ienc", default="utf-8",
+                        help="Encoding of the input (default: %(default)s)")
+    parser.add_argument("-l", "--log", dest="log_level", choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"), default="WARNING",
+                        help="The log level (default: %(default)s)")
+    parser.add_argument("--log-file", dest="log_file",
+                        help="The name of the log file")
+    
+    if __package__:
+        args = parser.parse_args(sys.argv[2:])
+    else:
+        args = parser.parse_args()
+    
+    update_model(args.model, args.infiles, args.outfile or args.model,
+                 pattern=args.pattern, devel=args.devel, maxiter=args.maxiter, algorithm=args.algorithm, nthreads=args.nthreads,
+                 rho1=args.rho1, rho2=args.rho2, compact=args.compact,
+                 ienc=args.ienc,
+                 log_level=args.log_level, log_file=args.log_file)
+    sys.exit(0)
@@ -34,6 +34,35 @@ from obj.logger import default_handler, file_handler
 clean_info_logger = logging.getLogger("sem.clean_info")
 clean_info_logger.addHandler(default_handler)
 
+def kept_fields(fields, ranges):
+    """
+    Returns the fields kept after cleaning.
+    
+    Parameters
+    ----------
+    fields : list of str
+        the fields before cleaning.
+    ranges : str or list of int or list of str
+        the fields to keep, as in document_clean.
+    """
+    
+    allowed = None
+    if type(ranges) in (str, unicode):
+        try:
+            allowed = sorted(ranges_to_set(ranges, len(fields), include_zero=True)) # comma-separated numbers or number ranges
+        except:
+            allowed = ranges.split(u",") # comma-separated named fields
+    else:
+        allowed = ranges
+    
+    if len(allowed) == 0:
+        raise RuntimeError("No more data after cleaning !")
+    
+    if type(allowed[0]) in (int, long):
+        return [fields[i] for i in allowed]
+    else:
+        return allowed
+
 def document_clean(document, ranges,
                    log_level="CRITICAL", log_file=None):
     """
@@ -58,23 +87,7 @@ def document_clean(document, ranges,
     
     clean_info_logger.info(u'cleaning document')
     
-    fields  = None
-    allowed = None
-    if type(ranges) in (str, unicode):
-        try:
-            allowed = sorted(ranges_to_set(ranges, len(document.corpus.fields), include_zero=True)) # comma-separated numbers or number ranges
-        except:
-            allowed = ranges.split(u",") # comma-separated named fields
-    else:
-        allowed = ranges
-    
-    if len(allowed) == 0:
-        raise RuntimeError("No more data after cleaning !")
-    
-    if type(allowed[0]) in (int, long):
-        fields = [document.corpus.fields[i] for i in allowed]
-    else:
-        fields = allowed
+    fields = kept_fields(document.corpus.fields, ranges)
     
     to_remove = [field for field in document.corpus.fields if field not in fields]
     document.corpus.fields = fields
@@ -37,13 +37,87 @@ import os.path
 enrich_logger = logging.getLogger("sem.%s" %os.path.basename(__file__).split(".")[0])
 enrich_logger.addHandler(default_handler)
 
-def enrich(keycorpus, informations):
+_missing = object() # the value of a token that is not cached
+
+def local_column(feature, sentence, entries, values):
+    """
+    Returns the column of a local feature (see Feature.is_local) for a
+    sentence. The value of a local feature only depends on the fields it
+    reads on the token, the feature is therefore only computed for the
+    first occurrence of every distinct token and its value is reused for
+    the others.
+    
+    Parameters
+    ----------
+    feature : obj.enrich.features.feature.Feature
+        the local feature.
+    sentence : list of dict
+        the tokens of the sentence.
+    entries : list of str
+        the fields the feature reads (see Feature.entries).
+    values : dict
+        the values of the feature for the tokens already seen, by the
+        value of entries. It is updated with the new tokens.
+    """
+    
+    if len(entries) == 1:
+        entry = entries[0]
+        keys  = [token.get(entry) for token in sentence]
+    else:
+        keys = [tuple([token.get(entry) for entry in entries]) for token in sentence]
+    
+    unseen = {}
+    for position, key in enumerate(keys):
+        if key not in values and key not in unseen:
+            unseen[key] = position
+    if unseen:
+        unseen = unseen.items()
+        # a local feature gives the same values on any sentence made of
+        # the same tokens.
+        column = feature.column([sentence[position] for key, position in unseen])
+        for (key, position), value in zip(unseen, column):
+            values[key] = value
+    
+    return [values[key] for key in keys]
+
+def cached_column(feature, sentence, entries, cache):
+    """
+    Returns the column of a local feature for a sentence, like
+    local_column, taking the values from a bounded cache (see
+    obj.cache.LRUCache) that is kept between documents.
+    """
+    
+    if len(entries) == 1:
+        entry = entries[0]
+        keys  = [token.get(entry) for token in sentence]
+    else:
+        keys = [tuple([token.get(entry) for entry in entries]) for token in sentence]
+    
+    column = [cache.get(key, _missing) for key in keys]
+    unseen = {}
+    for position, value in enumerate(column):
+        if value is _missing:
+            unseen.setdefault(keys[position], []).append(position)
+    if unseen:
+        unseen = unseen.items()
+        values = feature.column([sentence[positions[0]] for key, positions in unseen])
+        for (key, positions), value in zip(unseen, values):
+            cache.put(key, value)
+            for position in positions:
+                column[position] = value
+    
+    return column
+
+def enrich(keycorpus, informations, types=None):
     """
     An iterator to enrich a corpus. It will go through the data and
-    generate features, one feature at a time. If the feature has the
-    is_sequence property, it be called once and enrich the whole
-    sentence. If a feature does not have the is_sequence property, it
-    will be called at each and every token.
+    generate features, one feature at a time. Each feature computes its
+    whole column for a sentence at once (see Feature.column), which is
+    written in the tokens in place. Local features are computed once per
+    distinct token of the corpus (see local_column), or taken from their
+    cache if the informations have one (see cached_column). If the
+    informations are compiled, their function enriches each sentence
+    instead.
     
     Parameters
     ----------
@@ -52,6 +126,10 @@ def enrich(keycorpus, informations):
         data. Each token is a dict which works like TSV.
     informations : list of feature
         the features to enrich the keycorpus with.
+    types : dict
+        the values of local features by token, kept between calls to
+        enrich a corpus in several parts. Values are only kept for the
+        current call if None.
     
     Yields
     ------
@@ -59,16 +137,40 @@ def enrich(keycorpus, informations):
         the current sentence enriched with informations
     """
     
+    shared = informations.shared
+    if informations.function is not None:
+        for p in keycorpus:
+            informations.function(p)
+            for feature in shared:
+                feature.forget()
+            yield p
+        return
+    
+    if types is None:
+        types = {}
+    caches   = informations.caches or {}
+    features = []
+    for feature in informations.features:
+        if feature in caches:
+            features.append((feature, sorted(feature.entries()), caches[feature], cached_column))
+        elif feature.is_local and not feature.is_sequence:
+            features.append((feature, sorted(feature.entries()), types.setdefault(feature, {}), local_column))
+        else:
+            features.append((feature, None, None, None))
+    
     for p in keycorpus:
-        for feature in informations.features:
-            if feature.is_sequence:
-                for i, value in enumerate(feature(p)):
-                    p[i][feature.name] = value
+        for feature, entries, values, column_function in features:
+            name = feature.name
+            if column_function is not None:
+                column = column_function(feature, p, entries, values)
             else:
-                for i in range(len(p)):
-                    p[i][feature.name] = feature(p, i)
-                    if feature.is_boolean:
-                        p[i][feature.name] = int(p[i][feature.name])
+                column = feature.column(p)
+            if feature.is_boolean and not feature.is_sequence:
+                column = [int(value) for value in column]
+            for token, value in zip(p, column):
+                token[name] = value
+        for feature in shared:
+            feature.forget()
         yield p
 
 def document_enrich(document, informations, log_level="WARNING", log_file=None):
@@ -107,23 +209,24 @@ def document_enrich(document, informations, log_level="WARNING", log_file=None):
     
     enrich_logger.debug('enriching file "%s"' %document.name)
     
+    # sentences are enriched in place.
     new_fields             = [feature.name for feature in informations.features if feature.display]
     document.corpus.fields = informations.bentries + new_fields + informations.aentries
     nth                    = 0
-    for i, sentence in enumerate(enrich(document.corpus, informations)):
-        for j, token in enumerate(sentence):
-            for field in new_fields:
-                document.corpus.sentences[i][j][field] = token[field]
+    saved                  = informations.saved_evaluations
+    for sentence in enrich(document.corpus, informations):
         nth += 1
         if (0 == nth % 1000):
             enrich_logger.debug('%i sentences enriched' %nth)
     enrich_logger.debug('%i sentences enriched' %nth)
+    if informations.shared:
+        enrich_logger.info('%i evaluations saved by %i shared sub-features' %(informations.saved_evaluations - saved, len(informations.shared)))
     
     laps = time.time() - start
     enrich_logger.info("done in %s" %timedelta(seconds=laps))
 
 def enrich_file(infile, infofile, outfile,
-                mode=u"label",
+                mode=u"label", compile=False,
                 ienc="UTF-8", oenc="UTF-8",
                 log_level="WARNING", log_file=None):
     """
@@ -140,6 +243,9 @@ def enrich_file(infile, infofile, outfile,
         the mode to use for infofile. Some inputs may only be present in
         a particular mode. For example, the output tag is only available
         in "train" mode.
+    compile : bool
+        compile the features into a single function (see
+        obj.information.Informations.compile).
     log_level : str or int
         the logging level.
     log_file : str
@@ -155,6 +261,8 @@ def enrich_file(infile, infofile, outfile,
     enrich_logger.info('parsing enrichment file "%s"' %infofile)
     
     informations = Informations(path=infofile, mode=mode)
+    if compile:
+        informations.compile()
     
     enrich_logger.debug('enriching file "%s"' %infile)
     
@@ -185,6 +293,8 @@ if __name__ == "__main__":
                         help="The output file (CoNLL format)")
     parser.add_argument("-m", "--mode", dest="mode", default=u"label", choices=(u"train", u"label", u"annotate", u"annotation"),
                         help="The mode for enrichment. May make entries vary (default: %(default)s)")
+    parser.add_argument("-c", "--compile", dest="compile", action="store_true",
+                        help="Compile the features into a single function")
     parser.add_argument("--input-encoding", dest="ienc",
                         help="Encoding of the input (default: UTF-8)")
     parser.add_argument("--output-encoding", dest="oenc",
@@ -202,7 +312,7 @@ if __name__ == "__main__":
         args = parser.parse_args()
     
     enrich_file(args.infile, args.infofile, args.outfile,
-                mode=args.mode,
+                mode=args.mode, compile=args.compile,
                 ienc=args.ienc or args.enc, oenc=args.oenc or args.enc,
                 log_level=args.log_level, log_file=args.log_filename)
     sys.exit(0)
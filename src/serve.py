@@ -0,0 +1,373 @@
+#-*- coding: utf-8 -*-
+
+"""
+file: serve.py
+
+Description: a server keeping pipelines loaded in memory. Documents are
+sent over HTTP (on a TCP port or a Unix socket) and their annotations are
+answered in JSON.
+
+author: Yoann Dupont
+copyright (c) 2016 Yoann Dupont - all rights reserved
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see GNU official website.
+"""
+
+import BaseHTTPServer, Queue, SocketServer, json, logging, os, signal, threading, time, urlparse
+
+from datetime import timedelta
+
+from obj.logger           import default_handler, file_handler
+from obj.storage.document import Document
+
+from src.tagger import Pipeline, document_json
+
+serve_logger = logging.getLogger("sem.serve")
+serve_logger.addHandler(default_handler)
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Handles the requests to the tagging server:
+        - GET  /         lists the pipelines
+        - POST /pipeline tags the text given in the body of the request
+          (encoded in UTF-8) with the given pipeline and returns its
+          annotations in JSON. The name of the document may be given with
+          the "name" parameter of the query string.
+    """
+    
+    server_version = "SEM"
+    
+    def address_string(self):
+        if type(self.client_address) in (str, unicode): # Unix socket
+            return u"unix"
+        return BaseHTTPServer.BaseHTTPRequestHandler.address_string(self)
+    
+    def log_message(self, format, *args):
+        serve_logger.debug(u"%s - %s" %(self.address_string(), format %args))
+    
+    def send_json(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        path = urlparse.urlparse(self.path).path.strip(u"/")
+        if path == u"":
+            self.send_json(200, {"pipelines":sorted(self.server.pipelines.keys())})
+        else:
+            self.send_json(404, {"error":u'unknown path: "%s"' %path})
+    
+    def do_POST(self):
+        url      = urlparse.urlparse(self.path)
+        name     = url.path.strip(u"/")
+        query    = urlparse.parse_qs(url.query)
+        pipeline = self.server.pipelines.get(name)
+        if pipeline is None:
+            self.send_json(404, {"error":u'unknown pipeline: "%s"' %name})
+            return
+        
+        try:
+            content = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        except (ValueError, UnicodeDecodeError), exc:
+            self.send_json(400, {"error":unicode(exc)})
+            return
+        
+        start = time.time()
+        try:
+            document = self.server.process(name, query.get("name", [u"document"])[0].decode("utf-8"), content)
+        except Exception, exc:
+            serve_logger.exception(exc)
+            self.send_json(500, {"error":unicode(exc)})
+            return
+        laps = time.time() - start
+        serve_logger.info(u'tagged %i characters with "%s" in %s' %(len(content), name, timedelta(seconds=laps)))
+        
+        self.send_json(200, document_json(document))
+
+class MicroBatcher(object):
+    """
+    Tags the documents submitted to a pipeline by concurrent requests in
+    batches. A batch starts with the oldest waiting document and takes
+    every document submitted within window seconds, up to max_size
+    documents. The batch goes through the pipeline a process at a time
+    (see src.tagger.Pipeline.process_documents), so that every model
+    labels all its documents in a single Wapiti call, then each request
+    gets its own document back.
+    
+    With a window of 0, no request waits for others: a batch is made of
+    the documents that were submitted while the previous batch was tagged.
+    
+    Attributes
+    ----------
+    _pipeline : src.tagger.Pipeline
+        the pipeline documents go through.
+    _window : float
+        the time, in seconds, a batch waits for more documents.
+    _max_size : int
+        the maximum number of documents in a batch.
+    _queue : Queue.Queue
+        the submitted requests.
+    _batches : int
+        the number of batches tagged.
+    _documents : int
+        the number of documents tagged.
+    """
+    
+    class Request(object):
+        def __init__(self, name, content):
+            self.name     = name
+            self.content  = content
+            self.document = None
+            self.error    = None
+            self.done     = threading.Event()
+    
+    def __init__(self, pipeline, window=0.0, max_size=32):
+        if max_size < 1:
+            raise ValueError("batch size must be positive, got %s" %max_size)
+        
+        self._pipeline  = pipeline
+        self._window    = window
+        self._max_size  = max_size
+        self._queue     = Queue.Queue()
+        self._batches   = 0
+        self._documents = 0
+        self._thread    = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    @property
+    def batches(self):
+        return self._batches
+    
+    @property
+    def documents(self):
+        return self._documents
+    
+    def submit(self, name, content):
+        """
+        Returns the document named name with the given content, once it
+        went through the pipeline.
+        """
+        
+        request = MicroBatcher.Request(name, content)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.document
+    
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _collect(self):
+        batch    = [self._queue.get()]
+        deadline = time.time() + self._window
+        while batch[-1] is not None and len(batch) < self._max_size:
+            timeout = deadline - time.time()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except Queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        running = True
+        while running:
+            batch = self._collect()
+            if batch[-1] is None: # closing
+                running = False
+                batch   = batch[:-1]
+            if batch:
+                self._tag(batch)
+    
+    def _tag(self, batch):
+        for request in batch:
+            request.document = Document(request.name, content=request.content)
+        try:
+            self._pipeline.process_documents([request.document for request in batch])
+            serve_logger.debug(u"tagged a batch of %i documents" %len(batch))
+        except Exception, exc:
+            if len(batch) == 1:
+                batch[0].error = exc
+                batch[0].done.set()
+                return
+            else:
+                # the faulty document is not known: documents are tagged
+                # again one by one so that only its request fails.
+                serve_logger.warn(u"a batch of %i documents failed, tagging them one by one" %len(batch))
+                for request in batch:
+                    self._tag([request])
+                return
+        self._batches   += 1
+        self._documents += len(batch)
+        for request in batch:
+            request.done.set()
+
+class PipelineServer:
+    """
+    The part shared by the TCP and Unix socket servers: the pipelines,
+    loaded once and kept in memory, and the micro-batchers that feed
+    them. Like the mixins of SocketServer, it is an old-style class, as
+    SocketServer servers are.
+    
+    Attributes
+    ----------
+    pipelines : dict(unicode -> src.tagger.Pipeline)
+        the pipelines, by name.
+    batchers : dict(unicode -> MicroBatcher)
+        the micro-batcher of each pipeline.
+    """
+    
+    daemon_threads      = True
+    allow_reuse_address = True
+    
+    def load(self, pipelines, window=0.0, max_size=32):
+        self.pipelines = pipelines
+        self.batchers  = dict((name, MicroBatcher(pipeline, window=window, max_size=max_size)) for name, pipeline in pipelines.items())
+    
+    def process(self, name, document_name, content):
+        return self.batchers[name].submit(document_name, content)
+    
+    def unload(self):
+        for name, batcher in self.batchers.items():
+            batcher.close()
+            if batcher.batches > 0:
+                serve_logger.info(u'"%s": %i documents tagged in %i batches' %(name, batcher.documents, batcher.batches))
+        for pipeline in self.pipelines.values():
+            pipeline.close()
+
+class TCPServer(PipelineServer, SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    pass
+
+class UnixServer(PipelineServer, SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    pass
+
+def pipeline_name(masterfile):
+    return os.path.splitext(os.path.basename(masterfile))[0].decode("utf-8")
+
+def load_pipelines(masterfiles):
+    """
+    Returns the pipelines of masterfiles by name (the base name of the
+    master file without its extension). Every pipeline tags a short text
+    once so that its models are loaded and its Wapiti processes started
+    before the first request.
+    """
+    
+    pipelines = {}
+    for masterfile in masterfiles:
+        name = pipeline_name(masterfile)
+        if name in pipelines:
+            raise ValueError(u'two pipelines named "%s"' %name)
+        serve_logger.info(u'loading pipeline "%s" from %s' %(name, masterfile))
+        pipelines[name] = Pipeline(masterfile)
+        pipelines[name].process(u"SEM est prêt.", name=u"warm-up")
+    return pipelines
+
+def serve(masterfiles, host="localhost", port=8000, socket_path=None, window=0.0, max_size=32,
+          log_level="WARNING", log_file=None):
+    """
+    Starts a server that tags documents with pipelines kept in memory,
+    until it is interrupted.
+    
+    Parameters
+    ----------
+    masterfiles : list of str
+        the master files of the pipelines. Pipelines are named after the
+        base name of their master file.
+    host : str
+        the host the HTTP server listens on.
+    port : int
+        the port the HTTP server listens on.
+    socket_path : str
+        if not None, the server listens on this Unix socket instead of
+        host:port.
+    window : float
+        the time, in seconds, concurrent requests are waited for to be
+        tagged together (see MicroBatcher).
+    max_size : int
+        the maximum number of requests tagged together.
+    """
+    
+    if log_file is not None:
+        serve_logger.addHandler(file_handler(log_file))
+    serve_logger.setLevel(log_level)
+    
+    start     = time.time()
+    pipelines = load_pipelines(masterfiles)
+    laps      = time.time() - start
+    serve_logger.info(u"%i pipelines loaded in %s" %(len(pipelines), timedelta(seconds=laps)))
+    
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixServer(socket_path, RequestHandler)
+        serve_logger.info(u"listening on %s" %socket_path)
+    else:
+        server = TCPServer((host, port), RequestHandler)
+        serve_logger.info(u"listening on http://%s:%i" %(host, server.server_address[1]))
+    server.load(pipelines, window=window, max_size=max_size)
+    
+    # stopping the server with kill is a normal way to end it.
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+        server.unload()
+
+
+if __name__ == "__main__":
+    import argparse, sys
+    
+    parser = argparse.ArgumentParser(description="Keeps pipelines loaded in memory and tags the documents sent over HTTP, answering their annotations in JSON.")
+    
+    parser.add_argument("masterfiles", nargs="+",
+                        help="The master files of the pipelines, a pipeline is called by the base name of its master file (for pos.chunk.ner.xml: POST /pos.chunk.ner)")
+    parser.add_argument("--host", dest="host", default="localhost",
+                        help="The host to listen on (default: %(default)s)")
+    parser.add_argument("-p", "--port", dest="port", type=int, default=8000,
+                        help="The port to listen on (default: %(default)s)")
+    parser.add_argument("-s", "--socket", dest="socket_path",
+                        help="Listen on this Unix socket instead of host:port")
+    parser.add_argument("-w", "--batch-window", dest="window", type=float, default=0.0,
+                        help="The time, in milliseconds, to wait for concurrent requests to tag them together (default: %(default)s)")
+    parser.add_argument("-b", "--batch-size", dest="max_size", type=int, default=32,
+                        help="The maximum number of requests tagged together (default: %(default)s)")
+    parser.add_argument("-l", "--log", dest="log_level", choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"), default="INFO",
+                        help="The log level (default: %(default)s)")
+    parser.add_argument("--log-file", dest="log_file",
+                        help="The name of the log file")
+    
+    if __package__:
+        args = parser.parse_args(sys.argv[2:])
+    else:
+        args = parser.parse_args()
+    
+    serve(args.masterfiles, host=args.host, port=args.port, socket_path=args.socket_path, window=args.window / 1000.0, max_size=args.max_size,
+          log_level=args.log_level, log_file=args.log_file)
+    sys.exit(0)
@@ -22,7 +22,7 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see GNU official website.
 """
 
-import codecs, logging, os, shutil
+import Queue, codecs, glob, json, logging, multiprocessing, os, shutil, threading, traceback
 
 # measuring time laps
 import time
@@ -34,92 +34,352 @@ import software
 
 from obj import wapiti
 
-from obj.master_parser    import Master
-from obj.logger           import logging_format, default_handler
-from obj.storage.document import Document
-from obj.information      import Informations
+from obj.cache                import StageCache, file_digest
+
+from obj.master_parser        import Master
+from obj.exporters.dispatch   import get_exporter
+from obj.logger               import logging_format, default_handler, file_handler
+from obj.misc                 import correct_pos_tags
+from obj.storage.document     import Document
+from obj.storage.segmentation import Segmentation
+from obj.information          import Informations
+from obj.journal              import Journal
+from obj.tokenisers.dispatch  import get_tokeniser
 
 from src.pretreatment.segmentation import segmentation, document_segmentation
-from src.pretreatment.enrich       import enrich_file, document_enrich
-from src.posttreatment.clean_info  import clean_info, document_clean
+from src.pretreatment.enrich       import enrich, enrich_file, document_enrich
+from src.posttreatment.clean_info  import clean_info, document_clean, kept_fields
 from src.posttreatment.export      import export
 
 sem_tagger_logger = logging.getLogger("sem.tagger")
 sem_tagger_logger.addHandler(default_handler)
 
-def tagger(masterfile, file_name, directory="."):
+# the processes that can go through a document by blocks of sentences.
+_block_processes = set([u"enrich", u"label", u"clean_info"])
+# the arguments of processes that only change how fast they are, left out
+# of the keys of the stage cache (see Pipeline.stage_description).
+_speed_arguments = {u"enrich" : set([u"cache", u"compile"])}
+
+class Pipeline(object):
     """
-    Return a document after it passed through a pipeline.
+    A pipeline read from a master file whose resources are loaded once:
+    the tokeniser, the enrichment files (with their dictionaries) and the
+    label cache. Any number of documents can then go through it.
     
-    Parameters
+    Texts can be tagged in memory with process and process_many:
+    
+        pipeline  = Pipeline("resources/master/fr/pos.chunk.ner.xml")
+        document  = pipeline.process(u"Jean va à Lyon.")
+        documents = pipeline.process_many([u"Il pleut.", u"Il neige."])
+    
+    Attributes
     ----------
-    masterfile : str
-        the file containing the pipeline and global options
-    file_name : str
-        the input for the upcoming pipe. Its base value is the file to
-        treat, it can be either "plain text" or CoNNL-formatted file.
-    directory : str
-        the directory where every file will be outputted.
+    _masterfile : str
+        the master file the pipeline was read from, None if the pipeline
+        was built from an obj.master_parser.Master.
+    _directory : str
+        the directory relative paths of the pipeline start from.
+    _options : obj.master_parser.Master.Options
+        the global options of the pipeline.
+    _processes : list of obj.master_parser.Master.Process
+        the processes of the pipeline.
+    _resources : list
+        the resource of each process: the tokeniser for segmentation,
+        the obj.information.Informations for enrich, the model file for
+        label, None otherwise.
+    _cache : obj.cache.LabelCache
+        the label cache, None if labels are not cached.
+    _stages : obj.cache.StageCache
+        the cache of the states of documents after each process, None if
+        they are not cached.
+    _optimised : dict(int -> list of str)
+        the features left uncomputed by each enrich process (see
+        optimise).
     """
     
-    start = time.time()
+    def __init__(self, master, directory=None):
+        """
+        Parameters
+        ----------
+        master : str or obj.master_parser.Master
+            the master file or the parsed master file.
+        directory : str
+            the directory relative paths of the pipeline start from,
+            defaults to the directory of the master file (or the current
+            directory for a Master).
+        """
+        
+        if type(master) in (str, unicode):
+            self._masterfile = master
+            self._directory  = (directory if directory is not None else dirname(master))
+            master           = Master(master)
+        else:
+            self._masterfile = None
+            self._directory  = (directory if directory is not None else ".")
+        
+        self._options   = master.options
+        self._processes = master.pipeline
+        self._resources = []
+        self._cache     = None
+        self._stages    = None
+        self._optimised = {}
+        
+        options = self._options
+        if (options.log_file is not None):
+            sem_tagger_logger.addHandler(file_handler(options.log_file))
+        sem_tagger_logger.setLevel(options.log_level)
+        
+        start = time.time()
+        for nth, process in enumerate(self._processes, 1):
+            resource = None
+            if process.identifier == u"segmentation":
+                # segmentation may only be first.
+                if nth != 1:
+                    raise RuntimeError(u"Segmentation can only be performed first. Asked as process number %d" %nth)
+                sem_tagger_logger.info('loading tokeniser "%s"' %process.args["name"])
+                resource = get_tokeniser(process.args["name"])()
+            elif process.identifier == u"enrich":
+                information = join(self._directory, process.args["config"])
+                sem_tagger_logger.info('loading %s' %information)
+                resource    = Informations(information)
+                if process.args.get("compile", u"false").lower() == u"true":
+                    resource.compile()
+                if int(process.args.get("cache", 0)) > 0:
+                    resource.cache(int(process.args["cache"]))
+            elif process.identifier == u"label":
+                resource = join(self._directory, process.args["model"])
+                wapiti.preload_model(resource, options.wapiti_backend)
+            elif process.identifier not in (u"clean_info", u"export"):
+                sem_tagger_logger.error(u'unknown process: "%s"' %process.identifier)
+                raise RuntimeError(u'unknown process: "%s"' %process.identifier)
+            self._resources.append(resource)
+        
+        if options.optimise:
+            self._optimised = self.optimise()
+        
+        if options.wapiti_cache > 0:
+            cache_file = options.wapiti_cache_file
+            if cache_file is not None:
+                cache_file = join(self._directory, cache_file)
+            self._cache = wapiti.get_label_cache(capacity=options.wapiti_cache, path=cache_file)
+        
+        if options.stage_cache_file is not None:
+            self._stages = StageCache(join(self._directory, options.stage_cache_file))
+        
+        laps = time.time() - start
+        sem_tagger_logger.info('pipeline loaded in %s' %(timedelta(seconds=laps)))
     
-    MASTER   = Master(masterfile)
-    pipeline = MASTER.pipeline
-    options  = MASTER.options
+    @property
+    def masterfile(self):
+        return self._masterfile
     
-    if (options.log_file is not None):
-        sem_tagger_logger.addHandler(file_handler(log_file))
-    sem_tagger_logger.setLevel(options.log_level)
+    @property
+    def directory(self):
+        return self._directory
     
-    exports           = {} # keeping track of already done exports
-    file_shortname, _ = os.path.splitext(basename(file_name))
-    export_name       = os.path.join(directory, file_shortname)
+    @property
+    def options(self):
+        return self._options
     
-    nth  = 1
-    ienc = options.ienc
-    oenc = options.oenc
+    @property
+    def processes(self):
+        return self._processes
     
-    sem_tagger_logger.info("Reading %s" %(file_name))
+    @property
+    def cache(self):
+        return self._cache
     
-    if options.format == "text":
-        document = Document(basename(file_name), content=codecs.open(file_name, "rU", ienc).read())
-    elif options.format == "conll":
-        document = Document.from_conll(file_name, options.fields, options.word_field)
-    else:
-        raise ValueError(u"unknown format: %s" %options.format)
+    @property
+    def stages(self):
+        return self._stages
     
-    if pipeline[0].identifier == u"segmentation":
-        if len(document.corpus.sentences) == 0:
-            document_segmentation(document, pipeline[0].args["name"], log_level=options.log_level, log_file=options.log_file)
+    def read(self, file_name):
+        """
+        Returns the document read from file_name, according to the input
+        format and encoding of the pipeline.
+        """
+        
+        options = self._options
+        sem_tagger_logger.info("Reading %s" %(file_name))
+        
+        if options.format == "text":
+            return Document(basename(file_name), content=codecs.open(file_name, "rU", options.ienc).read())
+        elif options.format == "conll":
+            return Document.from_conll(file_name, options.fields, options.word_field)
         else:
-            sem_tagger_logger.warn("segmentation asked for already segmented input, skipping...")
-        nth      += 1
-        pipeline  = pipeline[1:]
+            raise ValueError(u"unknown format: %s" %options.format)
+    
+    def fields(self):
+        """
+        Returns the fields of the corpus before each process and at the
+        end of the pipeline.
+        """
+        
+        options = self._options
+        fields  = (options.fields[:] if options.format == "conll" else [])
+        result  = []
+        for process, resource in zip(self._processes, self._resources):
+            result.append(fields)
+            if process.identifier == u"segmentation" and not fields:
+                fields = [u"word"]
+            elif process.identifier == u"enrich":
+                fields = resource.bentries + [feature.name for feature in resource.features if feature.display] + resource.aentries
+            elif process.identifier == u"label":
+                fields = fields + [process.args["field"]]
+            elif process.identifier == u"clean_info":
+                fields = kept_fields(fields, process.args["to-keep"])
+        result.append(fields)
+        return result
+    
+    def optimise(self, placeholder=u"_"):
+        """
+        Leaves uncomputed the enrichment features whose values are never
+        read. A field is read if a later feature reads it, if a pattern of
+        a later model reads its column or if it is still in the corpus
+        when it is exported or at the end of the pipeline. Wapiti reads
+        columns by position, so unread features that are displayed are
+        replaced by a constant placeholder column: the fields of the corpus
+        stay the same.
+        
+        Returns
+        -------
+        dict(int -> list of str)
+            for each optimised enrich process (by index), the features
+            that are no longer computed.
+        """
+        
+        fields  = self.fields()
+        read    = set(fields[-1])
+        removed = {}
+        counts  = {}
+        for nth in reversed(xrange(len(self._processes))):
+            process  = self._processes[nth]
+            resource = self._resources[nth]
+            if process.identifier == u"export":
+                read.update(fields[nth])
+            elif process.identifier == u"label":
+                read.discard(process.args["field"])
+                try:
+                    columns = wapiti.model_columns(resource)
+                    read.update([field for column, field in enumerate(fields[nth]) if column in columns])
+                except (IOError, ValueError), exc:
+                    sem_tagger_logger.warn(u'cannot read the patterns of "%s" (%s), every column is kept' %(resource, exc))
+                    read.update(fields[nth])
+            elif process.identifier == u"enrich":
+                names  = set([feature.name for feature in resource.features])
+                needed = resource.used_features(read)
+                read  -= names
+                for feature in resource.features:
+                    if feature.name in needed:
+                        read.update(feature.entries() - names)
+                unused = [feature.name for feature in resource.features if feature.name not in needed]
+                if unused:
+                    removed[nth] = unused
+                    counts[nth]  = len(resource.features)
+                    self._resources[nth] = resource.without(set(unused), placeholder=placeholder)
+        
+        for nth in sorted(removed):
+            sem_tagger_logger.info(u'%s: %i features out of %i not computed: %s' %(self._processes[nth].args["config"], len(removed[nth]), counts[nth], u", ".join(removed[nth])))
+        if not removed:
+            sem_tagger_logger.info(u"every feature is used, nothing to optimise")
+        
+        return removed
+    
+    def process_document(self, document, export_name=None, directory="."):
+        """
+        Passes a document through every process of the pipeline. Exports
+        are written in files starting with export_name, they are skipped
+        if export_name is None.
+        
+        Returns
+        -------
+        str
+            the encoding of the document after the pipeline.
+        """
+        
+        return self.process_documents([document], export_names=[export_name], directory=directory)
     
-    for process in pipeline:
-        # segmentation may only be first. If we are in this loop, a segmentation
-        # cannot occur as it was handled before.
+    def process_documents(self, documents, export_names=None, directory="."):
+        """
+        Passes documents through every process of the pipeline, a process
+        at a time: every document is enriched before any is labelled, and
+        each model labels the sentences of all documents in a single
+        batch. Exports of the nth document are written in files starting
+        with export_names[n], they are skipped if export_names is None or
+        export_names[n] is None. If the pipeline has a stage cache,
+        documents go through process_cached instead.
+        
+        Returns
+        -------
+        str
+            the encoding of the documents after the pipeline.
+        """
+        
+        options = self._options
+        exports = {} # keeping track of already done exports
+        
+        if export_names is None:
+            export_names = [None] * len(documents)
+        
+        if self._stages is not None:
+            self.process_cached(documents, export_names=export_names, directory=directory)
+            return (options.oenc if self._processes else options.ienc)
+        
+        block_size = (options.pipelining_block_size if len(documents) == 1 else 0)
+        steps      = zip(self._processes, self._resources)
+        for nth, (process, resource) in enumerate(steps):
+            if block_size > 0 and process.identifier in _block_processes:
+                # consecutive processes that work by blocks are done at once.
+                if nth == 0 or steps[nth-1][0].identifier not in _block_processes:
+                    end = nth
+                    while end < len(steps) and steps[end][0].identifier in _block_processes:
+                        end += 1
+                    self.process_blocks(documents[0], steps[nth : end])
+            else:
+                self._process(nth, documents, export_names, directory, exports)
+        
+        return (options.oenc if self._processes else options.ienc)
+    
+    def _process(self, nth, documents, export_names, directory, exports):
+        """
+        Passes documents through the nth process of the pipeline. exports
+        counts the exports already done for each format.
+        """
+        
+        options  = self._options
+        oenc     = options.oenc
+        process  = self._processes[nth]
+        resource = self._resources[nth]
+        
         if process.identifier == u"segmentation":
-            raise RuntimeError(u"Segmentation can only be performed first. Asked as process number %d" %nth)
+            for document in documents:
+                if len(document.corpus.sentences) == 0:
+                    document_segmentation(document, resource, log_level=options.log_level, log_file=options.log_file)
+                else:
+                    sem_tagger_logger.warn("segmentation asked for already segmented input, skipping...")
             
         elif process.identifier == u"clean_info":
-            document_clean(document, process.args["to-keep"], log_level=options.log_level, log_file=options.log_file)
+            for document in documents:
+                document_clean(document, process.args["to-keep"], log_level=options.log_level, log_file=options.log_file)
             
         elif process.identifier == u"enrich":
-            information = join(dirname(masterfile), process.args["config"])
-            
-            document_enrich(document, information, log_level=options.log_level, log_file=options.log_file)
+            for document in documents:
+                document_enrich(document, resource, log_level=options.log_level, log_file=options.log_file)
+            self._log_feature_caches(process, resource)
             
         elif process.identifier == u"label":
-            model = join(dirname(masterfile), process.args["model"])
             field = process.args["field"]
             
             sem_tagger_logger.info("labeling %s with wapiti" %(field))
             label_start = time.clock()
-            wapiti.label_document(document, model, field, oenc)
+            if len(documents) == 1:
+                wapiti.label_document(documents[0], resource, field, oenc, backend=options.wapiti_backend, workers=options.wapiti_workers, stream=options.wapiti_stream, cache=self._cache, max_length=options.wapiti_max_length, overlap=options.wapiti_overlap)
+            else:
+                wapiti.label_documents(documents, resource, field, oenc, backend=options.wapiti_backend, workers=options.wapiti_workers, cache=self._cache, max_length=options.wapiti_max_length, overlap=options.wapiti_overlap)
             label_laps  = time.clock() - label_start
             sem_tagger_logger.info("labeled in %s" %(timedelta(seconds=label_laps)))
+            if self._cache is not None:
+                sem_tagger_logger.info("label cache: %(hits)i hits (%(disk_hits)i from disk), %(misses)i misses, %(size)i/%(capacity)i sentences in memory, %(evictions)i evictions" %self._cache.stats())
             
         elif process.identifier == u"export":
             export_format = process.args.get("format", "conll")
@@ -132,32 +392,654 @@ def tagger(masterfile, file_name, directory="."):
             if export_format not in exports:
                 exports[export_format] = 0
             exports[export_format] += 1
-            current_output = export_name + ".export-%i.%s" %(exports[export_format], export_format)
             
-            export(document, export_format, current_output, lang=lang, lang_style=lang_style, pos_column=poscol, chunk_column=chunkcol, ner_column=nercol, ienc=oenc, oenc=oenc, log_level=options.log_level, log_file=options.log_file)
+            for document, export_name in zip(documents, export_names):
+                if export_name is None:
+                    continue
+                current_output = export_name + ".export-%i.%s" %(exports[export_format], export_format)
+                export(document, export_format, current_output, lang=lang, lang_style=lang_style, pos_column=poscol, chunk_column=chunkcol, ner_column=nercol, ienc=oenc, oenc=oenc, log_level=options.log_level, log_file=options.log_file)
             
-            if export_format in ("html"):
+            if export_format in ("html") and any(export_name is not None for export_name in export_names):
                 shutil.copy(os.path.join(software.SEM_HOME, "resources", "css", "tabs.css"), directory)
                 shutil.copy(os.path.join(software.SEM_HOME, "resources", "css", lang, lang_style), directory)
-        else:
-            sem_tagger_logger.error(u'unknown process: "%s"' %process.identifier)
-            raise RuntimeError(u'unknown process: "%s"' %process.identifier)
+    
+    def process_cached(self, documents, export_names=None, directory="."):
+        """
+        Passes documents through the pipeline like process_documents,
+        reusing the states found in the stage cache. A document only goes
+        through the processes from the first one whose key changed (see
+        obj.cache.StageCache and stage_description), the state of every
+        process it went through is cached. The states of the processes
+        before are only loaded when needed: by an export or at the end of
+        the pipeline.
+        """
+        
+        cache   = self._stages
+        exports = {}
+        keys    = [cache.document_key(document) for document in documents]
+        loaded  = [True] * len(documents) # is the document in the state of its key ?
+        skipped = [0] * len(documents)
+        
+        if export_names is None:
+            export_names = [None] * len(documents)
+        
+        for nth, process in enumerate(self._processes):
+            if process.identifier == u"export":
+                for index, document in enumerate(documents):
+                    if not loaded[index]:
+                        cache.load(keys[index], document)
+                        loaded[index] = True
+                self._process(nth, documents, export_names, directory, exports)
+                continue
+            
+            description = self.stage_description(nth)
+            next_keys   = [cache.key(key, description) for key in keys]
+            missing     = []
+            for index, document in enumerate(documents):
+                if next_keys[index] in cache:
+                    cache.hit()
+                    loaded[index]   = False
+                    skipped[index] += 1
+                else:
+                    if not loaded[index]:
+                        cache.load(keys[index], document)
+                        loaded[index] = True
+                    missing.append(index)
+            if missing:
+                self._process(nth, [documents[index] for index in missing], [export_names[index] for index in missing], directory, exports)
+                for index in missing:
+                    cache.put(next_keys[index], documents[index])
+            keys = next_keys
+        
+        for index, document in enumerate(documents):
+            if not loaded[index]:
+                cache.load(keys[index], document)
+            sem_tagger_logger.info(u"%s: %i processes out of %i taken from the stage cache" %(document.name, skipped[index], len([process for process in self._processes if process.identifier != u"export"])))
+        sem_tagger_logger.info(u"stage cache: %(hits)i states reused, %(misses)i computed, %(size)i stored" %cache.stats())
+    
+    def stage_description(self, nth):
+        """
+        Returns the description of the nth process that makes the keys of
+        the stage cache: the version of SEM, the name and arguments of the
+        process (but the ones that only change its speed), the digests of
+        the files it reads (enrichment files, dictionaries, models) and the
+        options that change its result.
+        """
+        
+        options     = self._options
+        process     = self._processes[nth]
+        resource    = self._resources[nth]
+        ignored     = _speed_arguments.get(process.identifier, set())
+        description = [software.version(), process.identifier] + [u"%s=%s" %(name, value) for name, value in sorted(process.args.items()) if name not in ignored]
+        if process.identifier == u"enrich":
+            description.extend([file_digest(path) for path in resource.files()])
+            description.append(u"unused=%s" %u",".join(self._optimised.get(nth, [])))
+        elif process.identifier == u"label":
+            description.append(file_digest(resource))
+            description.append(u"max-length=%s overlap=%s encoding=%s" %(options.wapiti_max_length, options.wapiti_overlap, options.oenc))
+        return u"\n".join(description)
+    
+    def process_blocks(self, document, steps):
+        """
+        Passes a document through consecutive enrich, label and clean_info
+        processes by blocks of sentences. Every process runs in its own
+        thread and the blocks flow from one process to the next through
+        bounded queues, so that a block is enriched while the previous one
+        is labelled by Wapiti. The document ends up exactly as if every
+        process went through the whole document before the next one.
+        
+        Parameters
+        ----------
+        document : obj.storage.Document
+            the document, already segmented.
+        steps : list of (obj.master_parser.Master.Process, resource)
+            the processes and their resources (see _resources).
+        """
+        
+        options    = self._options
+        block_size = options.pipelining_block_size
+        sentences  = document.corpus.sentences
+        blocks     = []
+        offset     = 0
+        for start in xrange(0, len(sentences), block_size):
+            blocks.append((sentences[start : start+block_size], offset))
+            offset += sum([len(sentence) for sentence in sentences[start : start+block_size]])
+        
+        # the fields of the corpus are known before any block is treated,
+        # each process gets the fields it would see on the whole document.
+        fields  = document.corpus.fields[:]
+        stages  = []
+        labels  = [] # (field, tags) of every label process
+        removed = set()
+        for process, resource in steps:
+            if process.identifier == u"enrich":
+                missing_fields = set(resource.bentries + resource.aentries) - set(fields)
+                if len(missing_fields) > 0:
+                    raise ValueError("Missing fields in input corpus: %s" %u",".join(sorted(missing_fields)))
+                fields = resource.bentries + [feature.name for feature in resource.features if feature.display] + resource.aentries
+                stages.append(self._enrich_stage(resource))
+            elif process.identifier == u"label":
+                labels.append((process.args["field"], []))
+                stages.append(self._label_stage(document, resource, process.args["field"], fields[:], labels[-1][1]))
+                fields = fields + [process.args["field"]]
+                removed.discard(process.args["field"])
+            elif process.identifier == u"clean_info":
+                kept = kept_fields(fields, process.args["to-keep"])
+                stages.append(self._clean_stage([field for field in fields if field not in kept]))
+                removed.update([field for field in fields if field not in kept])
+                fields = kept
+        
+        sem_tagger_logger.info(u"%i processes running on %i blocks of %i sentences" %(len(stages), len(blocks), block_size))
+        start = time.time()
         
-        if ienc != oenc:
-            ienc = oenc
+        queues = [Queue.Queue(maxsize=options.pipelining_queue_size) for _ in xrange(len(stages)+1)]
+        errors = []
+        def work(stage, input_queue, output_queue):
+            while True:
+                block = input_queue.get()
+                if block is not None and not errors:
+                    try:
+                        stage(*block)
+                    except Exception, exc:
+                        sem_tagger_logger.exception(exc)
+                        errors.append(exc)
+                output_queue.put(block)
+                if block is None:
+                    break
         
-        nth += 1
+        threads = [threading.Thread(target=work, args=(stage, queues[nth], queues[nth+1])) for nth, stage in enumerate(stages)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        
+        # blocks are fed from another thread as the queues are bounded.
+        def feed():
+            for block in blocks:
+                queues[0].put(block)
+            queues[0].put(None)
+        feeder = threading.Thread(target=feed)
+        feeder.daemon = True
+        feeder.start()
+        
+        while queues[-1].get() is not None:
+            pass
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        
+        document.corpus.fields = fields
+        for field, tags in labels:
+            if tags:
+                document.add_annotation_from_tags(tags, field, field)
+        # adding an annotation writes its labels in the corpus again.
+        for field in removed & set([field for field, tags in labels]):
+            for sentence in sentences:
+                for token in sentence:
+                    token.pop(field, None)
+        
+        laps = time.time() - start
+        sem_tagger_logger.info(u"blocks done in %s" %timedelta(seconds=laps))
+        for process, resource in steps:
+            if process.identifier == u"enrich":
+                self._log_feature_caches(process, resource)
+    
+    def _log_feature_caches(self, process, resource):
+        if resource.caches is not None:
+            stats = resource.cache_stats()
+            stats["config"] = process.args["config"]
+            sem_tagger_logger.info(u"feature caches of %(config)s: %(features)i features, %(hits)i hits, %(misses)i misses, %(size)i/%(capacity)i values in memory, %(evictions)i evictions" %stats)
+    
+    def _enrich_stage(self, informations):
+        types = {} # local features are computed once per token for every block
+        def stage(sentences, offset):
+            for sentence in enrich(sentences, informations, types=types):
+                pass
+        return stage
+    
+    def _label_stage(self, document, model, field, fields, tags):
+        options  = self._options
+        encoding = options.oenc
+        scheme   = [] # whether labels are BIO, decided on the first sentence as for a whole document
+        def stage(sentences, offset):
+            lines  = wapiti.corpus_sentences(sentences, fields)
+            breaks = None
+            if options.wapiti_max_length is not None:
+                breaks = []
+                for line in lines:
+                    breaks.append(wapiti.sentence_breaks(line, document=document, offset=offset))
+                    offset += len(line)
+            block_tags = wapiti.label_batch(lines, model, encoding, backend=options.wapiti_backend, workers=options.wapiti_workers, cache=self._cache, max_length=options.wapiti_max_length, overlap=options.wapiti_overlap, breaks=breaks)
+            if not block_tags:
+                return
+            
+            tags.extend([sentence_tags[:] for sentence_tags in block_tags])
+            if not scheme:
+                scheme.append(all([tag[0] in u"BIO" for tag in block_tags[0]]))
+            
+            if scheme[0]:
+                for sentence, sentence_tags in zip(sentences, block_tags):
+                    for token, tag in zip(sentence, sentence_tags):
+                        token[field] = tag
+            else:
+                # tagging corrects some labels (see Document.add_tagging),
+                # a document holding the block writes their final value.
+                block = Document(document.name)
+                block.corpus.sentences = sentences
+                block.add_segmentation(Segmentation(u"tokens", spans=[]))
+                block.add_tagging(correct_pos_tags(block_tags), field, field)
+        return stage
+    
+    def _clean_stage(self, to_remove):
+        def stage(sentences, offset):
+            for sentence in sentences:
+                for token in sentence:
+                    for field in to_remove:
+                        del token[field]
+        return stage
     
-    if not any([process.identifier == "export" for process in pipeline]): # no export asked
-        if __name__ == "__main__": # we only export something if the module is called from command-line
+    def process(self, text, name=u"document"):
+        """
+        Returns the document of a text once it went through the pipeline.
+        Nothing is written: exports of the pipeline are skipped.
+        
+        Parameters
+        ----------
+        text : unicode
+            the text to tag.
+        name : unicode
+            the name of the document.
+        """
+        
+        return self.process_many([text], names=[name])[0]
+    
+    def process_many(self, texts, names=None, batch_size=100):
+        """
+        Returns the documents of texts once they went through the
+        pipeline. Texts are tagged batch_size at a time, each model
+        labelling a whole batch at once (see process_documents). Nothing
+        is written: exports of the pipeline are skipped.
+        
+        Parameters
+        ----------
+        texts : list of unicode
+            the texts to tag.
+        names : list of unicode
+            the names of the documents, defaults to "document-<n>".
+        batch_size : int
+            the number of texts tagged together.
+        """
+        
+        if len(self._processes) == 0 or self._processes[0].identifier != u"segmentation":
+            raise ValueError(u"texts can only be tagged by a pipeline starting with a segmentation")
+        if names is None:
+            names = [u"document-%i" %nth for nth in xrange(1, len(texts)+1)]
+        elif len(names) != len(texts):
+            raise ValueError(u"expected %i names, got %i" %(len(texts), len(names)))
+        
+        documents = [Document(name, content=text) for name, text in zip(names, texts)]
+        for start in xrange(0, len(documents), batch_size):
+            self.process_documents(documents[start : start+batch_size])
+        return documents
+    
+    def tag(self, file_name, directory=".", default_export=False):
+        """
+        Return a document after it passed through the pipeline.
+        
+        Parameters
+        ----------
+        file_name : str
+            the file to treat, it can be either "plain text" or
+            CoNNL-formatted file.
+        directory : str
+            the directory where every file will be outputted.
+        default_export : bool
+            export the document in CoNLL if the pipeline has no export.
+        """
+        
+        start = time.time()
+        
+        file_shortname, _ = os.path.splitext(basename(file_name))
+        export_name       = os.path.join(directory, file_shortname)
+        
+        document = self.read(file_name)
+        ienc     = self.process_document(document, export_name=export_name, directory=directory)
+        
+        if default_export and not any([process.identifier == "export" for process in self._processes]): # no export asked
             sem_tagger_logger.warn("no export in pipeline, exporting to conll by default")
-            export(document, "conll", export_name + ".conll", ienc=ienc, oenc=oenc, log_level=options.log_level, log_file=options.log_file)
+            export(document, "conll", export_name + ".conll", ienc=ienc, oenc=self._options.oenc, log_level=self._options.log_level, log_file=self._options.log_file)
+        
+        laps = time.time() - start
+        sem_tagger_logger.info('done in %s' %(timedelta(seconds=laps)))
+        
+        return document
+    
+    def export_unicode(self, document):
+        """
+        Returns a document in the format of the first export of the
+        pipeline, in CoNLL if the pipeline has no export.
+        """
+        
+        args     = ([process.args for process in self._processes if process.identifier == u"export"] or [{}])[0]
+        exporter = get_exporter(args.get("format", "conll"))(lang=args.get("lang", "fr"), lang_style=args.get("lang_style", "default.css"))
+        couples  = {}
+        if "word" in document.corpus.fields:
+            couples["token"] = "word"
+        elif "token" in document.corpus.fields:
+            couples["token"] = "token"
+        for name in ("pos", "chunking", "ner"):
+            if args.get(name, None):
+                couples[name] = args[name]
+        return exporter.document_to_unicode(document, couples, encoding=self._options.oenc)
+    
+    def outputs(self, file_name, directory=".", default_export=False):
+        """
+        Returns the files tag writes for file_name (see tag).
+        """
+        
+        export_name = os.path.join(directory, os.path.splitext(basename(file_name))[0])
+        outputs     = []
+        exports     = {}
+        for process in self._processes:
+            if process.identifier == u"export":
+                export_format          = process.args.get("format", "conll")
+                exports[export_format] = exports.get(export_format, 0) + 1
+                outputs.append(export_name + ".export-%i.%s" %(exports[export_format], export_format))
+        if default_export and not outputs:
+            outputs.append(export_name + ".conll")
+        return outputs
+    
+    def close(self):
+        if self._cache is not None:
+            self._cache.close()
+        if self._stages is not None:
+            self._stages.close()
+
+def document_json(document):
+    """
+    Returns a dictionary representing the annotations of a document, ready
+    to be dumped in JSON. Every annotation is a list of tags with their
+    value and their character bounds in the content of the document.
+    """
+    
+    content     = document.content
+    annotations = {}
+    for name in sorted(document.annotations):
+        annotations[name] = [{"value":tag.value, "start":tag.start, "end":tag.end, "text":content[tag.start : tag.end]} for tag in document.annotation(name).get_reference_annotations()]
+    return {"name":document.name, "content":content, "annotations":annotations}
+
+def read_documents(input_stream, encoding="utf-8", separator=u"\f", jsonl=False):
+    """
+    Yields the (name, content) couples of the documents of a stream, one
+    at a time as soon as they are read.
+    
+    Parameters
+    ----------
+    input_stream : file
+        the stream to read.
+    encoding : str
+        the encoding of the stream.
+    separator : unicode
+        the line that ends a document.
+    jsonl : bool
+        the stream has a document per line in JSON: either a string or
+        an object with a "content" and an optional "name".
+    """
+    
+    nth = 0
+    if jsonl:
+        for line in iter(input_stream.readline, ""):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            nth += 1
+            data = json.loads(line)
+            if isinstance(data, dict):
+                yield data.get("name", u"document-%i" %nth), data["content"]
+            else:
+                yield u"document-%i" %nth, data
+    else:
+        lines = []
+        for line in iter(input_stream.readline, ""): # iterating on the stream would wait for more lines
+            line = line.decode(encoding)
+            if line.rstrip(u"\r\n") == separator:
+                nth  += 1
+                yield u"document-%i" %nth, u"".join(lines)
+                lines = []
+            else:
+                lines.append(line)
+        if lines:
+            yield u"document-%i" %(nth+1), u"".join(lines)
+
+def input_files(inputs, file_list=None):
+    """
+    Returns the files to tag. Each input is either a file, a directory
+    (every file it contains is tagged) or a glob pattern. file_list is a
+    file containing one input file per line.
+    """
+    
+    files = []
+    for name in inputs:
+        if os.path.isdir(name):
+            files.extend(sorted([join(name, filename) for filename in os.listdir(name) if os.path.isfile(join(name, filename))]))
+        elif os.path.exists(name):
+            files.append(name)
+        else:
+            matches = sorted(glob.glob(name))
+            if not matches:
+                raise IOError(u"no such file: %s" %name)
+            files.extend(matches)
+    if file_list is not None:
+        with codecs.open(file_list, "rU", "utf-8") as input_stream:
+            files.extend([line.strip() for line in input_stream if line.strip()])
+    return files
+
+def tagger(masterfile, file_name, directory="."):
+    """
+    Return a document after it passed through a pipeline.
+    
+    Parameters
+    ----------
+    masterfile : str
+        the file containing the pipeline and global options
+    file_name : str
+        the input for the upcoming pipe. Its base value is the file to
+        treat, it can be either "plain text" or CoNNL-formatted file.
+    directory : str
+        the directory where every file will be outputted.
+    """
+    
+    pipeline = Pipeline(masterfile)
+    try:
+        # we only export something if the module is called from command-line
+        return pipeline.tag(file_name, directory=directory, default_export=(__name__ == "__main__"))
+    finally:
+        pipeline.close()
+
+# the pipeline used by worker processes, set before they are forked so
+# that they share its resources.
+__worker_pipeline = None
+# the pid of the worker tagging each file, 0 until it is started (see
+# _pool_results).
+__worker_started  = None
+
+def _tag_file(arguments):
+    """
+    Tags a file with the worker pipeline. Errors are returned instead of
+    raised, so that a failing document does not stop the others.
+    """
+    
+    index, file_name, directory, default_export = arguments
+    if __worker_started is not None:
+        __worker_started[index] = os.getpid()
+    try:
+        __worker_pipeline.tag(file_name, directory=directory, default_export=default_export)
+    except Exception:
+        return index, file_name, traceback.format_exc()
+    return index, file_name, None
+
+def _pool_results(pool, arguments, started, timeout=1.0):
+    """
+    Yields the results of _tag_file on arguments as workers of a pool
+    return them. A worker that dies (killed or crashed) never returns its
+    file and the pool replaces it silently: the files started by a worker
+    that is no longer running are yielded as errors instead of waiting
+    for them forever.
+    
+    Parameters
+    ----------
+    pool : multiprocessing.Pool
+        the pool of workers, forked once started was set.
+    arguments : list of tuple
+        the arguments of _tag_file, the index of each file first.
+    started : multiprocessing.Array
+        the pid of the worker tagging each file, 0 if not started.
+    timeout : float
+        the time, in seconds, to wait for a result before looking for
+        dead workers.
+    """
+    
+    pending = set(xrange(len(arguments)))
+    results = pool.imap_unordered(_tag_file, arguments)
+    while pending:
+        try:
+            index, file_name, error = results.next(timeout)
+        except multiprocessing.TimeoutError:
+            alive = set([worker.pid for worker in pool._pool if worker.exitcode is None])
+            for index in sorted(pending):
+                if started[index] != 0 and started[index] not in alive:
+                    pending.discard(index)
+                    yield index, arguments[index][1], u"the worker tagging it (pid %i) died" %started[index]
+            continue
+        if index in pending:
+            pending.discard(index)
+            yield index, file_name, error
+
+def tag_files(masterfile, file_names, directory=".", jobs=1, journal=None, resume=False):
+    """
+    Passes every file through a pipeline whose resources are loaded only
+    once. Documents are not kept once exported. A document that fails is
+    logged and skipped.
+    
+    Files whose outputs are written are recorded in a journal (see
+    obj.journal.Journal). When resuming, the files of the journal whose
+    outputs are still the ones written are skipped, every other file is
+    tagged again, which overwrites outputs that were partially written.
+    
+    Parameters
+    ----------
+    masterfile : str
+        the file containing the pipeline and global options
+    file_names : list of str
+        the files to treat.
+    directory : str
+        the directory where every file will be outputted.
+    jobs : int
+        the number of processes tagging documents in parallel. Workers
+        are forked once the pipeline is loaded and share its resources.
+    journal : str
+        the journal file, defaults to "sem.journal" in directory.
+    resume : bool
+        skip the files that are done according to the journal.
+    
+    Returns
+    -------
+    list of str
+        the files that could not be tagged.
+    """
+    
+    global __worker_pipeline, __worker_started
+    
+    start    = time.time()
+    pipeline = Pipeline(masterfile)
+    
+    # files are exported according to their base name.
+    seen = set()
+    for file_name in file_names:
+        shortname = os.path.splitext(basename(file_name))[0]
+        if shortname in seen:
+            sem_tagger_logger.warn(u'several inputs named "%s", their outputs will overwrite each other' %shortname)
+        seen.add(shortname)
+    
+    default_export = (__name__ == "__main__")
+    journal        = Journal(journal or join(directory, "sem.journal"), resume=resume)
+    if resume:
+        remaining  = [file_name for file_name in file_names if not journal.done(file_name)]
+        sem_tagger_logger.info(u"resuming from %s: %i files already tagged, %i to tag" %(journal.path, len(file_names) - len(remaining), len(remaining)))
+        file_names = remaining
+    
+    failures = []
+    pool     = None
+    __worker_pipeline = pipeline
+    try:
+        arguments = [(index, file_name, directory, default_export) for index, file_name in enumerate(file_names)]
+        if jobs > 1:
+            __worker_started = multiprocessing.Array("i", len(arguments), lock=False)
+            pool    = multiprocessing.Pool(processes=jobs)
+            results = _pool_results(pool, arguments, __worker_started)
+        else:
+            results = (_tag_file(argument) for argument in arguments)
+        for index, file_name, error in results:
+            if error is not None:
+                sem_tagger_logger.error(u'could not tag "%s":\n%s' %(file_name, error.rstrip()))
+                failures.append(file_name)
+            else:
+                try:
+                    journal.add(file_name, pipeline.outputs(file_name, directory=directory, default_export=default_export))
+                except (IOError, OSError), exc:
+                    sem_tagger_logger.error(u'could not record "%s" in the journal: %s' %(file_name, exc))
+                    failures.append(file_name)
+    finally:
+        if pool is not None:
+            # the pool waits for the results of dead workers when closed,
+            # every result was read or the run failed: workers are stopped.
+            pool.terminate()
+            pool.join()
+        __worker_pipeline = None
+        __worker_started  = None
+        pipeline.close()
+        journal.close()
     
     laps = time.time() - start
-    sem_tagger_logger.info('done in %s' %(timedelta(seconds=laps)))
+    sem_tagger_logger.info('%i files tagged in %s' %(len(file_names) - len(failures), timedelta(seconds=laps)))
+    if failures:
+        sem_tagger_logger.error('%i files could not be tagged: %s' %(len(failures), u", ".join(failures)))
     
-    return document
+    return failures
 
+def tag_stream(masterfile, input_stream, output_stream, separator=u"\f", jsonl=False):
+    """
+    Tags the documents of a stream (see read_documents) and writes each
+    one as soon as it is tagged, so that only one document is in memory
+    at a time. Documents are written in the format of the first export of
+    the pipeline followed by the separator line or, for JSON lines, as
+    their annotations in JSON (see document_json). Exports are not
+    written in files.
+    
+    Returns
+    -------
+    int
+        the number of documents tagged.
+    """
+    
+    pipeline = Pipeline(masterfile)
+    options  = pipeline.options
+    count    = 0
+    try:
+        for name, content in read_documents(input_stream, encoding=options.ienc, separator=separator, jsonl=jsonl):
+            document = pipeline.process(content, name=name)
+            if jsonl:
+                output_stream.write(json.dumps(document_json(document)) + "\n")
+            else:
+                output_stream.write((pipeline.export_unicode(document) + separator + u"\n").encode(options.oenc))
+            output_stream.flush()
+            count += 1
+    finally:
+        pipeline.close()
+    
+    sem_tagger_logger.info(u"%i documents tagged" %count)
+    return count
 
 if __name__ == '__main__':
     import argparse, sys
@@ -165,16 +1047,42 @@ if __name__ == '__main__':
     
     parser.add_argument("master",
                         help="The master configuration file. Defines at least the pipeline and may provide some options.")
-    parser.add_argument("input_file",
-                        help="The input file for the tagger.")
+    parser.add_argument("input_files", nargs="*",
+                        help="The input files for the tagger: files, directories (every file inside is tagged) or glob patterns. '-' reads documents from the standard input and writes them on the standard output.")
+    parser.add_argument("-f", "--file-list", dest="file_list",
+                        help="A file containing the input files, one per line.")
     parser.add_argument("-o", "--output-directory", dest="output_directory", default=".",
                         help="The output directory (default: '.')")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="The number of processes tagging files in parallel (default: %(default)s)")
+    parser.add_argument("--journal", dest="journal",
+                        help="The journal of the files that are tagged (default: sem.journal in the output directory)")
+    parser.add_argument("--resume", dest="resume", action="store_true",
+                        help="Skip the files that are tagged according to the journal")
+    parser.add_argument("--separator", dest="separator", default="\f",
+                        help="When reading the standard input, the line that ends a document (default: form feed)")
+    parser.add_argument("--jsonl", dest="jsonl", action="store_true",
+                        help="When reading the standard input, documents are JSON lines, results are written as JSON lines")
     
     if not __package__:
         args = parser.parse_args()
     else:
         args = parser.parse_args(sys.argv[2:])
     
-    tagger(args.master, args.input_file,
-           directory=args.output_directory)
+    if args.input_files == ["-"]:
+        tag_stream(args.master, sys.stdin, sys.stdout, separator=args.separator.decode(sys.getfilesystemencoding()), jsonl=args.jsonl)
+        sys.exit(0)
+    
+    files = input_files(args.input_files, file_list=args.file_list)
+    if not files:
+        parser.error("no input file")
+    
+    if len(files) == 1 and not args.resume:
+        tagger(args.master, files[0],
+               directory=args.output_directory)
+    else:
+        failures = tag_files(args.master, files,
+                             directory=args.output_directory, jobs=args.jobs, journal=args.journal, resume=args.resume)
+        if failures:
+            sys.exit(1)
     sys.exit(0)
@@ -0,0 +1,53 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, tempfile
+
+from obj.cache import LRUCache, LabelCache
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        handle, self.model = tempfile.mkstemp(suffix=".model")
+        os.write(handle, "model")
+        os.close(handle)
+        handle, self.store = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.labelled = []
+    
+    def tearDown(self):
+        os.remove(self.model)
+        os.remove(self.store)
+    
+    def label(self, sentences):
+        self.labelled.extend(sentences)
+        return [[line.upper() for line in sentence] for sentence in sentences]
+    
+    def test_lru(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEquals(cache.get("a"), 1)
+        cache.put("c", 3) # "b" is the least recently used
+        self.assertEquals(cache.get("b"), None)
+        self.assertEquals(cache.stats(), {"size":2, "capacity":2, "hits":1, "misses":1, "evictions":1})
+    
+    def test_labels(self):
+        sentences = [[u"le", u"chat"], [u"il", u"dort"], [u"le", u"chat"]]
+        expected  = [[u"LE", u"CHAT"], [u"IL", u"DORT"], [u"LE", u"CHAT"]]
+        
+        cache = LabelCache(capacity=10, path=self.store)
+        self.assertEquals(cache.label(sentences, self.model, self.label), expected)
+        self.assertEquals(len(self.labelled), 2) # duplicate labelled once
+        self.assertEquals(cache.label(sentences, self.model, self.label), expected)
+        self.assertEquals(len(self.labelled), 2)
+        cache.close()
+        
+        cache = LabelCache(capacity=10, path=self.store)
+        self.assertEquals(cache.label(sentences[:1], self.model, self.label), expected[:1])
+        self.assertEquals(len(self.labelled), 2)
+        self.assertEquals(cache.stats()["disk_hits"], 1)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,74 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import copy, os, tempfile
+
+from obj.information         import Informations
+from src.pretreatment.enrich import enrich
+
+information = """<?xml version="1.0" encoding="UTF-8"?>
+<information>
+    <entries>
+        <before>
+            <entry name="word" />
+        </before>
+    </entries>
+    <features>
+        <nullary name="lower" action="lower" />
+        <nullary name="prefix" action="substring" to_index="3" />
+        <nullary name="EOS" action="eos" />
+        <regexp name="suffix" action="subsequence" entry="lower">[a-zé]{2}$</regexp>
+        <string name="is-va" action="equal" casing="i">VA</string>
+        <nary name="shape" action="sequencer">
+            <binary action="substitute">
+                <pattern>[A-ZÉ]</pattern>
+                <replace>A</replace>
+            </binary>
+            <binary action="substitute">
+                <pattern>[a-zà]</pattern>
+                <replace>a</replace>
+            </binary>
+        </nary>
+        <list name="some" action="some">
+            <boolean action="or">
+                <regexp action="check" entry="shape" shift="-1">^A</regexp>
+                <nullary action="BOS" />
+            </boolean>
+            <boolean action="not">
+                <string action="equal" entry="lower" shift="1">lyon</string>
+            </boolean>
+        </list>
+        <find name="next-upper" action="forward" return_entry="word">
+            <unary action="isUpper">0</unary>
+        </find>
+    </features>
+</information>
+"""
+
+class TestCompiler(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".xml")
+        os.write(handle, information)
+        os.close(handle)
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def test_compile(self):
+        corpus = [[{u"word":word} for word in sentence.split()] for sentence in [u"Jean va à Lyon .", u"Été"]]
+        
+        informations = Informations(self.path)
+        expected     = list(enrich(copy.deepcopy(corpus), informations))
+        informations.compile()
+        self.assertEquals(list(enrich(copy.deepcopy(corpus), informations)), expected)
+        self.assertEquals(expected[0][2][u"shape"], u"a")
+        self.assertTrue(u"def enrich_sentence(sentence):" in informations.source)
+        self.assertTrue(u"token.get('word').lower()" in informations.source)
+        
+        # removed features are not computed by the compiled function either.
+        informations = informations.without(set([u"some"]))
+        self.assertEquals(list(enrich(copy.deepcopy(corpus), informations))[0][0][u"some"], u"_")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,55 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, tempfile
+
+from obj.crf import Model, Pattern, translate_regexp
+
+# two labels, one unigram pattern and one bigram pattern.
+model_text = """#mdl#2#4
+#rdr#2/1/0
+9:u:%%x[0,0],
+1:b,
+#qrk#2
+1:A,
+1:B,
+#qrk#3
+3:u:x,
+3:u:y,
+1:b,
+0=%s
+3=%s
+5=%s
+7=%s
+""" %(float.hex(1.0), float.hex(1.0), float.hex(-5.0), float.hex(0.5))
+
+class TestCRF(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".model")
+        os.write(handle, model_text)
+        os.close(handle)
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def test_regexp(self):
+        self.assertEquals(translate_regexp("^\\u.*"), "\\A[A-Z].*?")
+        self.assertEquals(translate_regexp("\\d?$"), "[0-9]?\\Z")
+    
+    def test_pattern(self):
+        tokens = [["The", "DET"], ["cat", "NC"]]
+        self.assertEquals(Pattern("u:%x[-1,0]/%x[0,1]")(tokens), ["u:_x-1/DET", "u:The/NC"])
+        self.assertEquals(Pattern("u:%X[@1,0]")(tokens), ["u:the", "u:the"])
+        self.assertEquals(Pattern('u:%t[1,0,"^\\u"]')(tokens), ["u:false", "u:false"])
+        self.assertEquals(Pattern('u:%m[0,0,"^\\l\\l\\l"]')(tokens), ["u:", "u:cat"])
+    
+    def test_label(self):
+        model = Model(self.path)
+        self.assertEquals(model.labels, ["A", "B"])
+        # unigram scores alone would give A B, the transition A -> B is
+        # too costly and B -> B is rewarded.
+        self.assertEquals(model.label([[["x"]], [["x"], ["y"]], [["z"], ["x"]]]), [["A"], ["B", "B"], ["A", "A"]])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
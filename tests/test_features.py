@@ -0,0 +1,75 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, tempfile
+
+from obj.information                    import Informations
+from obj.enrich.features.feature        import SharedFeature
+from obj.enrich.features.getterfeatures import DictGetterFeature
+
+from tests.test_compiler import information
+
+class TestFeatures(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".xml")
+        os.write(handle, information)
+        os.close(handle)
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def test_columns(self):
+        sentence = [{u"word":word} for word in u"Jean va à Lyon avec Marie .".split()]
+        
+        for feature in Informations(self.path).features:
+            values = [feature(sentence, position) for position in xrange(len(sentence))]
+            self.assertEquals(feature.column(sentence), values, feature.name)
+            for token, value in zip(sentence, values):
+                token[feature.name] = value
+        self.assertEquals([token[u"next-upper"] for token in sentence], [u"Lyon", u"Lyon", u"Lyon", u"Marie", u"Marie", None, None])
+    
+    def test_shift(self):
+        sentence = [{u"word":word} for word in u"Jean va .".split()]
+        
+        for shift in [-4, -3, -1, 0, 1, 3, 4]:
+            feature = DictGetterFeature(entry=u"word", shift=shift)
+            values  = [feature(sentence, position) for position in xrange(len(sentence))]
+            self.assertEquals(feature.column(sentence), values, shift)
+            self.assertEquals([feature.value_at(sentence, position) for position in xrange(len(sentence))], values, shift)
+            self.assertEquals(feature.is_local, shift == 0)
+        self.assertEquals(DictGetterFeature(entry=u"word", shift=3).column(sentence), [None, None, None])
+        self.assertEquals(DictGetterFeature(entry=u"word", shift=-1).column(sentence), [None, u"Jean", u"va"])
+    
+    def test_local(self):
+        features = Informations(self.path).features
+        self.assertEquals([feature.name for feature in features if feature.is_local], [u"lower", u"prefix", u"suffix", u"is-va", u"shape"])
+        
+        # "some" reads the shape of the previous token.
+        some = [feature for feature in features if feature.name == u"some"][0]
+        self.assertFalse(some.is_local)
+    
+    def test_shared(self):
+        lower    = Informations(self.path).features[0]
+        shared   = SharedFeature(lower)
+        sentence = [{u"word":word} for word in u"Jean va".split()]
+        
+        self.assertEquals(shared.column(sentence), [u"jean", u"va"])
+        self.assertEquals(shared.value_at(sentence, 1), u"va")
+        self.assertEquals(shared.saved, 1)
+        
+        # the same list holding the next sentence: its column is the one
+        # of the previous sentence until forget is called.
+        sentence[:] = [{u"word":word} for word in u"Il pleut".split()]
+        self.assertEquals(shared.column(sentence), [u"jean", u"va"])
+        shared.forget()
+        self.assertEquals(shared.value_at(sentence, 0), u"il")
+        self.assertEquals(shared.column(sentence), [u"il", u"pleut"])
+        self.assertEquals(shared.saved, 3)
+        
+        shared = SharedFeature(lower, field=u"lower")
+        self.assertEquals(shared.column([{u"word":u"Jean", u"lower":u"jean"}]), [u"jean"])
+        self.assertEquals(shared.entries(), set([u"word", u"lower"]))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
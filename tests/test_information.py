@@ -0,0 +1,150 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import copy, os, tempfile
+
+from obj.information         import Informations
+from src.pretreatment.enrich import enrich
+
+from tests.test_compiler import information
+
+shared_information = """<?xml version="1.0" encoding="UTF-8"?>
+<information>
+    <entries>
+        <before>
+            <entry name="word" />
+            <entry name="POS" />
+        </before>
+    </entries>
+    <features>
+        <nullary name="lower" action="lower" />
+        <nary name="shape" action="sequencer">
+            <nullary action="lower" />
+            <binary action="substitute">
+                <pattern>[a-zà]</pattern>
+                <replace>a</replace>
+            </binary>
+        </nary>
+        <find name="next-verb" action="forward" return_entry="word">
+            <regexp action="check" entry="POS">^V</regexp>
+        </find>
+        <find name="previous-verb" action="backward" return_entry="word">
+            <regexp action="check" entry="POS">^V</regexp>
+        </find>
+        <boolean name="upper-not-verb" action="and">
+            <unary action="isUpper">0</unary>
+            <boolean action="not">
+                <regexp action="check" entry="POS">^V</regexp>
+            </boolean>
+        </boolean>
+    </features>
+</information>
+"""
+
+def enriched(corpus, informations):
+    """
+    Returns a copy of a corpus enriched one token at a time.
+    """
+    
+    corpus = copy.deepcopy(corpus)
+    for sentence in corpus:
+        for feature in informations.features:
+            values = [feature(sentence, position) for position in xrange(len(sentence))]
+            for token, value in zip(sentence, values):
+                token[feature.name] = (int(value) if feature.is_boolean and not feature.is_sequence else value)
+    return corpus
+
+class TestInformation(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".xml")
+        os.write(handle, information)
+        os.close(handle)
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def test_local(self):
+        corpus = [[{u"word":word} for word in sentence.split()] for sentence in [u"Jean va à Lyon .", u"Lyon va à Jean", u"VA"]]
+        
+        informations = Informations(self.path)
+        expected     = enriched(corpus, informations)
+        
+        # local features are computed once per distinct token, across calls.
+        types  = {}
+        result = list(enrich(copy.deepcopy(corpus[:1]), informations, types=types)) + list(enrich(copy.deepcopy(corpus[1:]), informations, types=types))
+        self.assertEquals(result, expected)
+        self.assertEquals(len(types[informations.features[0]]), 6)
+    
+    def test_cache(self):
+        corpus = [[{u"word":word} for word in sentence.split()] for sentence in [u"Jean va à Lyon .", u"Lyon va à Jean", u"VA"]]
+        
+        informations = Informations(self.path)
+        expected     = list(enrich(copy.deepcopy(corpus), informations))
+        informations.cache(capacity=3)
+        self.assertEquals(len(informations.caches), 5)
+        self.assertEquals(list(enrich(copy.deepcopy(corpus[:1]), informations)) + list(enrich(copy.deepcopy(corpus[1:]), informations)), expected)
+        
+        stats = informations.cache_stats()
+        self.assertEquals(stats["hits"] + stats["misses"], 5 * 10)
+        self.assertEquals(stats["size"], 5 * 3)
+        self.assertTrue(stats["hits"] > 0 and stats["evictions"] > 0)
+    
+    def test_eviction(self):
+        documents = [[[{u"word":word} for word in text.split()]] for text in [u"Jean", u"va", u"Lyon", u"Jean", u"Lyon"]]
+        
+        informations = Informations(self.path)
+        informations.cache(capacity=2)
+        for document in documents:
+            self.assertEquals(list(enrich(copy.deepcopy(document), informations)), enriched(document, informations))
+        
+        # "Lyon" evicts "Jean", which evicts "va" when it comes back: only
+        # the second "Lyon" is found, in each of the 5 caches.
+        stats = informations.cache_stats()
+        self.assertEquals((stats["hits"], stats["misses"], stats["evictions"], stats["size"]), (5 * 1, 5 * 4, 5 * 2, 5 * 2))
+    
+    def test_share(self):
+        handle, path = tempfile.mkstemp(suffix=".xml")
+        os.write(handle, shared_information)
+        os.close(handle)
+        try:
+            informations = Informations(path)
+        finally:
+            os.remove(path)
+        self.assertEquals(sorted([feature.field for feature in informations.shared]), [None, u"lower"])
+        
+        sentence = [{u"word":word, u"POS":pos} for word, pos in zip(u"Jean mange à Lyon .".split(), u"NPP V P NPP PONCT".split())]
+        expected = enriched([sentence], informations)
+        
+        self.assertEquals(list(enrich([copy.deepcopy(sentence)], informations)), expected)
+        # the lower field is read by shape and the check of the find
+        # features is computed once. The conjunction is local, it is
+        # computed on the distinct tokens only (see local_column).
+        self.assertEquals(informations.saved_evaluations, 5 + 5)
+        
+        informations.compile()
+        self.assertEquals(list(enrich([copy.deepcopy(sentence)], informations)), expected)
+        self.assertTrue(u"token['lower']" in informations.source)
+    
+    def test_forget(self):
+        handle, path = tempfile.mkstemp(suffix=".xml")
+        os.write(handle, shared_information)
+        os.close(handle)
+        try:
+            informations = Informations(path)
+        finally:
+            os.remove(path)
+        corpus = [[{u"word":word, u"POS":pos} for word, pos in zip(words.split(), tags.split())] for words, tags in [(u"Jean mange .", u"NPP V PONCT"), (u"Demain il pleut", u"ADV CLS V")]]
+        
+        # a reader giving every sentence in the same list: shared features
+        # must not reuse the column of the previous sentence.
+        def reader():
+            sentence = []
+            for tokens in copy.deepcopy(corpus):
+                sentence[:] = tokens
+                yield sentence
+        
+        self.assertEquals([copy.deepcopy(sentence) for sentence in enrich(reader(), informations)], enriched(corpus, informations))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,47 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, shutil, tempfile
+
+from os.path import join
+
+from obj.journal import Journal
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal   = join(self.directory, "sem.journal")
+        for name in ["a.txt", "b.txt", "a.conll", "b.conll"]:
+            with open(join(self.directory, name), "w") as output_stream:
+                output_stream.write(name)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_resume(self):
+        a, b, a_out, b_out = [join(self.directory, name) for name in ["a.txt", "b.txt", "a.conll", "b.conll"]]
+        
+        journal = Journal(self.journal)
+        journal.add(a, [a_out])
+        journal.add(b, [b_out])
+        self.assertRaises(IOError, journal.add, a, [join(self.directory, "missing")])
+        journal.close()
+        with open(self.journal, "a") as output_stream:
+            output_stream.write("cut short")
+        with open(b_out, "a") as output_stream:
+            output_stream.write("partially written")
+        
+        journal = Journal(self.journal, resume=True)
+        self.assertEquals(len(journal), 2)
+        self.assertTrue(journal.done(a))
+        self.assertFalse(journal.done(b))
+        journal.close()
+        self.assertEquals(len(open(self.journal).read().splitlines()), 2)
+        
+        journal = Journal(self.journal)
+        self.assertFalse(journal.done(a))
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
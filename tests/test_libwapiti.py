@@ -0,0 +1,37 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, tempfile
+
+from obj.libwapiti import library_name, Model
+
+from tests.test_crf import model_text
+
+@unittest.skipUnless(os.path.exists(library_name()), "Wapiti library not built")
+class TestLibWapiti(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".model")
+        os.write(handle, model_text)
+        os.close(handle)
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def test_label(self):
+        model = Model(self.path)
+        self.assertEquals(model.labels, ["A", "B"])
+        self.assertEquals(model.label([[["x"]], [["x"], ["y"]], [["z"], ["x"]]]), [["A"], ["B", "B"], ["A", "A"]])
+    
+    def test_error(self):
+        model = Model(self.path)
+        self.assertRaises(RuntimeError, model.label, [[[]]])
+        self.assertRaises(RuntimeError, Model, self.path + ".missing")
+        
+        # errors while reading the file are reported as well.
+        with open(self.path, "w") as output_stream:
+            output_stream.write(model_text[ : model_text.index("#qrk#3") + 8])
+        self.assertRaises(RuntimeError, Model, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,54 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, shutil, stat, tempfile
+
+from os.path import join
+
+from obj                   import wapiti
+from src.model.prune_model import prune_model
+
+from tests.test_update_model import training, patterns, write
+
+@unittest.skipUnless(os.path.exists(wapiti.command_name()), "Wapiti not built")
+class TestPruneModel(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.training  = write(join(self.directory, "train.conll"), training)
+        self.model     = join(self.directory, "model")
+        wapiti.train(self.training, pattern=write(join(self.directory, "patterns"), patterns), output=self.model)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_prune(self):
+        pruned = join(self.directory, "pruned")
+        os.chmod(self.model, 0640)
+        report = prune_model(self.model, pruned, threshold=0.5, heldout=self.training)
+        self.assertTrue(0 < report["kept"] < report["weights"])
+        self.assertTrue(report["pruned_size"] < report["size"])
+        self.assertEquals(os.path.getsize(pruned), report["pruned_size"])
+        self.assertEquals(stat.S_IMODE(os.stat(pruned).st_mode), 0640)
+        
+        # the pruned model still loads and labels every token.
+        output = join(self.directory, "labels")
+        wapiti.label(self.training, pruned, output=output, only_labels=True, check=True)
+        self.assertEquals(len([line for line in open(output) if line.strip()]), 9)
+        
+        report = prune_model(self.model, pruned, min_count=3, data=self.training)
+        self.assertTrue(report["kept"] < report["weights"])
+    
+    def test_spaces(self):
+        # the observations of this pattern hold a space.
+        model = join(self.directory, "spaces")
+        wapiti.train(self.training, pattern=write(join(self.directory, "spaces.pattern"), u"u:a b %x[0,0]\nb\n"), output=model, rho1=0)
+        report = prune_model(model, model, threshold=0.5)
+        self.assertTrue(0 < report["kept"] < report["weights"])
+    
+    def test_nothing_to_prune(self):
+        self.assertRaises(ValueError, prune_model, self.model, join(self.directory, "pruned"))
+        self.assertRaises(ValueError, prune_model, self.model, join(self.directory, "pruned"), min_count=2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,56 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, tempfile, threading
+
+from obj.storage.document import Document
+from src.serve import document_json, MicroBatcher
+
+class UpperPipeline(object):
+    def __init__(self):
+        self.batches = []
+    
+    def process_documents(self, documents):
+        if any(document.content == u"fail" for document in documents):
+            raise ValueError("cannot tag")
+        self.batches.append(len(documents))
+        for document in documents:
+            document.content = document.content.upper()
+
+class TestServe(unittest.TestCase):
+    def test_document_json(self):
+        handle, path = tempfile.mkstemp(suffix=".conll")
+        os.write(handle, u"Jean\nva\nà\nLyon\n".encode("utf-8"))
+        os.close(handle)
+        document = Document.from_conll(path, [u"word"], u"word")
+        os.remove(path)
+        document.add_annotation_from_tags([[u"B-PER", u"O", u"O", u"B-LOC"]], u"NER", u"NER")
+        
+        data = document_json(document)
+        self.assertEquals(data["content"], u"Jean va à Lyon")
+        self.assertEquals(data["annotations"][u"NER"], [{"value":u"PER", "start":0, "end":4, "text":u"Jean"}, {"value":u"LOC", "start":10, "end":14, "text":u"Lyon"}])
+    
+    def test_micro_batching(self):
+        pipeline = UpperPipeline()
+        batcher  = MicroBatcher(pipeline, window=0.5, max_size=4)
+        contents = [u"a", u"b", u"fail", u"c", u"d", u"e"]
+        results  = {}
+        def submit(content):
+            try:
+                results[content] = batcher.submit(content, content).content
+            except ValueError:
+                results[content] = None
+        threads = [threading.Thread(target=submit, args=(content,)) for content in contents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+        
+        self.assertEquals(results, {u"a":u"A", u"b":u"B", u"fail":None, u"c":u"C", u"d":u"D", u"e":u"E"})
+        self.assertEquals(batcher.documents, 5)
+        self.assertTrue(batcher.batches < 5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,244 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, shutil, stat, tempfile, StringIO
+
+from os.path import join
+
+from obj               import wapiti
+from obj.master_parser import Master
+from src.tagger        import input_files, read_documents, tag_files, Pipeline
+from tests.test_wapiti import fake_wapiti
+
+master = """<?xml version="1.0" encoding="UTF-8"?>
+<master>
+    <pipeline>
+        <segmentation name="fr" />
+        <clean_info to-keep="word" />
+    </pipeline>
+</master>
+"""
+
+enrich_master = """<?xml version="1.0" encoding="UTF-8"?>
+<master>
+    <pipeline>
+        <segmentation name="fr" />
+        <enrich config="enrich.xml" />
+        <clean_info to-keep="word,UpperNotBos" />
+        <enrich config="enrich.xml" />
+    </pipeline>
+    <options>
+        %s
+    </options>
+</master>
+"""
+
+label_master = """<?xml version="1.0" encoding="UTF-8"?>
+<master>
+    <pipeline>
+        <segmentation name="fr" />
+        <enrich config="enrich.xml" />
+        <label model="model" field="label" />
+        <clean_info to-keep="word,lower2,label" />
+    </pipeline>
+    <options>
+        <wapiti backend="subprocess" />
+        %s
+    </options>
+</master>
+"""
+
+export_master = """<?xml version="1.0" encoding="UTF-8"?>
+<master>
+    <pipeline>
+        <segmentation name="fr" />
+        <export format="conll" />
+    </pipeline>
+</master>
+"""
+
+information = """<?xml version="1.0" encoding="UTF-8"?>
+<information>
+    <entries>
+        <before>
+            <entry name="word" />
+        </before>
+    </entries>
+    <features>
+        <nullary name="lower" action="lower" display="no" />
+        <boolean name="UpperNotBos" action="and">
+            <unary action="isUpper">0</unary>
+            <boolean action="not">
+                <nullary action="BOS" />
+            </boolean>
+        </boolean>
+        <nullary name="lower2" action="lower" />
+    </features>
+</information>
+"""
+
+class TestTagger(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ["b.txt", "a.txt", "c.conll"]:
+            open(join(self.directory, name), "w").close()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_input_files(self):
+        a, b, c = [join(self.directory, name) for name in ["a.txt", "b.txt", "c.conll"]]
+        file_list = join(self.directory, "list")
+        with open(file_list, "w") as output_stream:
+            output_stream.write("%s\n\n%s\n" %(c, a))
+        
+        self.assertEquals(input_files([self.directory + os.sep + "*.txt"]), [a, b])
+        self.assertEquals(input_files([c], file_list=file_list), [c, c, a])
+        self.assertEquals(input_files([self.directory]), [a, b, c, file_list])
+        self.assertRaises(IOError, input_files, [join(self.directory, "*.xml")])
+    
+    def test_read_documents(self):
+        stream = StringIO.StringIO(u"Jean va à Lyon.\n\nIl pleut.\n\f\nIl neige.".encode("utf-8"))
+        self.assertEquals(list(read_documents(stream)), [(u"document-1", u"Jean va à Lyon.\n\nIl pleut.\n"), (u"document-2", u"Il neige.")])
+        
+        stream = StringIO.StringIO('{"name":"jean", "content":"Jean va \\u00e0 Lyon."}\n\n"Il pleut."\n')
+        self.assertEquals(list(read_documents(stream, jsonl=True)), [(u"jean", u"Jean va à Lyon."), (u"document-2", u"Il pleut.")])
+    
+    def test_pipeline(self):
+        masterfile = join(self.directory, "master.xml")
+        with open(masterfile, "w") as output_stream:
+            output_stream.write(master)
+        
+        for pipeline in [Pipeline(masterfile), Pipeline(Master(masterfile))]:
+            document = pipeline.process(u"Jean va à Lyon.", name=u"jean")
+            self.assertEquals(document.name, u"jean")
+            self.assertEquals([[token[u"word"] for token in sentence] for sentence in document.corpus], [[u"Jean", u"va", u"à", u"Lyon", u"."]])
+            
+            documents = pipeline.process_many([u"Il pleut.", u"Il neige. Il vente."], batch_size=1)
+            self.assertEquals([document.name for document in documents], [u"document-1", u"document-2"])
+            self.assertEquals([len(document.corpus.sentences) for document in documents], [1, 2])
+            pipeline.close()
+        self.assertEquals(sorted(os.listdir(self.directory)), ["a.txt", "b.txt", "c.conll", "master.xml"]) # nothing written
+    
+    def test_blocks(self):
+        with open(join(self.directory, "enrich.xml"), "w") as output_stream:
+            output_stream.write(information)
+        text    = u"Jean va à Lyon. Il y voit Marie. Elle rentre à Paris. Fin."
+        corpora = []
+        for options in [u"", u'<pipelining block-size="1" queue-size="1"/>']:
+            masterfile = join(self.directory, "master.xml")
+            with open(masterfile, "w") as output_stream:
+                output_stream.write(enrich_master %options)
+            pipeline = Pipeline(masterfile)
+            document = pipeline.process(text)
+            corpora.append((document.corpus.fields, unicode(document.corpus)))
+        
+        self.assertEquals(corpora[0][0], [u"word", u"UpperNotBos", u"lower2"])
+        self.assertEquals(corpora[0], corpora[1])
+    
+    def test_label_blocks(self):
+        with open(join(self.directory, "enrich.xml"), "w") as output_stream:
+            output_stream.write(information)
+        command = join(self.directory, "wapiti.py")
+        with open(command, "w") as output_stream:
+            output_stream.write(fake_wapiti)
+        os.chmod(command, stat.S_IRWXU)
+        text    = u"Jean va à Lyon. Il y voit Marie. Elle rentre à Paris. Fin."
+        corpora = []
+        command_name = wapiti.command_name
+        wapiti.command_name = lambda: command
+        try:
+            for options in [u"", u'<pipelining block-size="1" />', u'<pipelining block-size="2" />', u'<pipelining block-size="10" />']:
+                masterfile = join(self.directory, "master.xml")
+                with open(masterfile, "w") as output_stream:
+                    output_stream.write(label_master %options)
+                document = Pipeline(masterfile).process(text)
+                corpora.append((document.corpus.fields, unicode(document.corpus)))
+        finally:
+            wapiti.command_name = command_name
+        
+        self.assertEquals(corpora[0][0], [u"word", u"lower2", u"label"])
+        self.assertTrue(u"Marie\tmarie\tMARIE/3" in corpora[0][1])
+        for corpus in corpora[1:]:
+            self.assertEquals(corpus, corpora[0])
+    
+    def test_tag_files(self):
+        masterfile = join(self.directory, "master.xml")
+        with open(masterfile, "w") as output_stream:
+            output_stream.write(export_master)
+        a, b = [join(self.directory, name) for name in ["a.txt", "b.txt"]]
+        for name in [a, b]:
+            with open(name, "w") as output_stream:
+                output_stream.write("Il pleut.")
+        
+        # an output that is not written fails its file only.
+        outputs = Pipeline.outputs
+        Pipeline.outputs = lambda pipeline, file_name, **kwargs: (outputs(pipeline, file_name, **kwargs) if file_name != b else [join(self.directory, "missing")])
+        try:
+            self.assertEquals(tag_files(masterfile, [b, a], directory=self.directory), [b])
+        finally:
+            Pipeline.outputs = outputs
+        self.assertTrue(os.path.exists(join(self.directory, "a.export-1.conll")))
+        
+        self.assertEquals(tag_files(masterfile, [a, b], directory=self.directory, resume=True), [])
+        
+        # a worker dying on b (as when killed for lack of memory) fails
+        # it, the other files are tagged.
+        tag = Pipeline.tag
+        Pipeline.tag = lambda pipeline, file_name, **kwargs: (tag(pipeline, file_name, **kwargs) if file_name != b else os._exit(1))
+        try:
+            self.assertEquals(tag_files(masterfile, [a, b, a], directory=self.directory, jobs=2), [b])
+        finally:
+            Pipeline.tag = tag
+    
+    def test_optimise(self):
+        with open(join(self.directory, "enrich.xml"), "w") as output_stream:
+            output_stream.write(information)
+        masterfile = join(self.directory, "master.xml")
+        with open(masterfile, "w") as output_stream:
+            output_stream.write(enrich_master %u"")
+        text = u"Jean va à Lyon. Il y voit Marie."
+        
+        pipeline = Pipeline(masterfile)
+        expected = unicode(pipeline.process(text).corpus)
+        self.assertEquals(pipeline.optimise(), {1:[u"lower", u"UpperNotBos", u"lower2"], 3:[u"lower"]})
+        self.assertEquals([feature.name for feature in pipeline._resources[1].features], [u"UpperNotBos", u"lower2"]) # placeholders
+        self.assertEquals(unicode(pipeline.process(text).corpus), expected)
+    
+    def test_stage_cache(self):
+        enrich = join(self.directory, "enrich.xml")
+        with open(enrich, "w") as output_stream:
+            output_stream.write(information)
+        masterfile = join(self.directory, "master.xml")
+        with open(masterfile, "w") as output_stream:
+            output_stream.write(enrich_master %u'<stage-cache file="stages.db" />')
+        texts = [u"Jean va à Lyon.", u"Il y voit Marie."]
+        
+        pipeline  = Pipeline(masterfile)
+        expected  = [unicode(document.corpus) for document in pipeline.process_many(texts)]
+        self.assertEquals(pipeline.stages.stats(), {"hits":0, "misses":8, "size":8})
+        documents = pipeline.process_many(texts, names=[u"a", u"b"])
+        self.assertEquals([unicode(document.corpus) for document in documents], expected)
+        self.assertEquals([document.name for document in documents], [u"a", u"b"])
+        self.assertEquals(pipeline.stages.stats()["hits"], 8)
+        pipeline.close()
+        
+        # changing the enrichment file invalidates the states from the first enrich.
+        with open(enrich, "w") as output_stream:
+            output_stream.write(information.replace(u'"lower2" action="lower"', u'"lower2" action="lower" display="yes"'))
+        pipeline = Pipeline(masterfile)
+        self.assertEquals([unicode(document.corpus) for document in pipeline.process_many(texts)], expected)
+        self.assertEquals(pipeline.stages.stats(), {"hits":2, "misses":6, "size":14})
+        pipeline.close()
+        
+        # compiling and caching features do not change the states.
+        with open(masterfile, "w") as output_stream:
+            output_stream.write(enrich_master.replace(u'config="enrich.xml"', u'config="enrich.xml" compile="true" cache="100"') %u'<stage-cache file="stages.db" />')
+        pipeline = Pipeline(masterfile)
+        self.assertEquals([unicode(document.corpus) for document in pipeline.process_many(texts)], expected)
+        self.assertEquals(pipeline.stages.stats(), {"hits":8, "misses":0, "size":14})
+        pipeline.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,63 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import os, shutil, stat, tempfile
+
+from os.path import join
+
+from obj                    import wapiti
+from src.model.update_model import data_labels, update_model
+
+training = u"le DET\nchat NC\ndort V\n\nun DET\nchien NC\nmange V\n\nle DET\nchien NC\ndort V\n"
+patterns = u"u:%x[0,0]\nu:%x[-1,0]\nb\n"
+
+def write(path, content):
+    with open(path, "w") as output_stream:
+        output_stream.write(content.encode("utf-8"))
+    return path
+
+@unittest.skipUnless(os.path.exists(wapiti.command_name()), "Wapiti not built")
+class TestUpdateModel(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.training  = write(join(self.directory, "train.conll"), training)
+        self.model     = join(self.directory, "model")
+        wapiti.train(self.training, pattern=write(join(self.directory, "patterns"), patterns), output=self.model)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def labels(self, model):
+        output = join(self.directory, "labels")
+        wapiti.label(self.training, model, output=output, only_labels=True, check=True)
+        return [line.strip() for line in open(output) if line.strip()]
+    
+    def test_update(self):
+        before = self.labels(self.model)
+        self.assertEquals(before, ["DET", "NC", "V"] * 3)
+        
+        new_data = write(join(self.directory, "new.conll"), u"un DET\nchat NC\nmange V\n")
+        self.assertEquals(data_labels(new_data), set([u"DET", u"NC", u"V"]))
+        os.chmod(self.model, 0640)
+        update_model(self.model, [new_data, self.training], self.model, maxiter=5)
+        self.assertEquals(self.labels(self.model), before)
+        self.assertEquals(sorted(wapiti.model_labels(self.model)), ["DET", "NC", "V"])
+        # the model was replaced by renaming, no temporary file is left.
+        self.assertEquals(sorted(os.listdir(self.directory)), ["labels", "model", "new.conll", "patterns", "train.conll"])
+        self.assertEquals(stat.S_IMODE(os.stat(self.model).st_mode), 0640)
+        
+        # a patch in the dump format gives the weights back.
+        dump = join(self.directory, "dump")
+        wapiti.dump(self.model, output=dump)
+        weights = len(open(dump).read().split("\n"))
+        wapiti.update(self.model, dump, output=join(self.directory, "updated"))
+        self.assertEquals(self.labels(join(self.directory, "updated")), before)
+        self.assertTrue(weights > 1)
+    
+    def test_unknown_label(self):
+        new_data = write(join(self.directory, "new.conll"), u"Paris NPP\n")
+        self.assertRaises(ValueError, update_model, self.model, [new_data], self.model)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,198 @@
+#-*- encoding: utf-8 -*-
+
+import unittest
+import codecs, os, stat, sys, tempfile
+
+from obj.storage.document import Document
+from obj                  import wapiti
+from obj.wapiti import backends, shard_sentences, parallel_label_sentences, label_documents, split_windows, label_batch, command_name, WapitiServer
+
+from tests.test_crf import model_text
+
+def label_lengths(sentences, model, encoding, worker=0):
+    return [[u"%i" %len(sentence)] * len(sentence) for sentence in sentences]
+
+batches = []
+def label_upper(sentences, model, encoding, worker=0):
+    batches.append(sentences)
+    return [[line.upper() for line in sentence] for sentence in sentences]
+
+# a stand-in for "wapiti label": the label of a token is its first column in
+# upper case followed by its position in the sentence. With the model
+# "short", the last token of every sentence gets no label. As Wapiti, the
+# last sentence is labelled even without a blank line after it.
+fake_wapiti = """#!%s
+import sys
+short    = sys.argv[sys.argv.index("-m") + 1] == "short"
+sentence = []
+while True:
+    line = sys.stdin.readline()
+    if line.strip():
+        sentence.append(line.split()[0])
+    elif sentence:
+        for position, word in enumerate(sentence[: len(sentence) - short]):
+            sys.stdout.write("%%s/%%i\\n" %%(word.upper(), position))
+        sys.stdout.write("\\n")
+        sys.stdout.flush()
+        sentence = []
+    if not line:
+        break
+""" %sys.executable
+
+class TestWapiti(unittest.TestCase):
+    def test_shard(self):
+        sentences = [[u"a"] * length for length in [5, 1, 4, 2, 3, 3]]
+        shards    = shard_sentences(sentences, 3)
+        
+        self.assertEquals(sorted(sum(shards, [])), range(len(sentences)))
+        self.assertEquals([sum(len(sentences[i]) for i in shard) for shard in shards], [6, 6, 6])
+        self.assertEquals(len(shard_sentences(sentences[:2], 3)), 2)
+    
+    def test_parallel(self):
+        sentences = [[u"a"] * length for length in [5, 1, 4, 2, 3, 3]]
+        
+        self.assertEquals(parallel_label_sentences(sentences, None, "utf-8", label_lengths, 4), label_lengths(sentences, None, "utf-8"))
+    
+    def test_split(self):
+        self.assertEquals(split_windows(5, 10), [(0, 5, 0, 5)])
+        self.assertEquals(split_windows(10, 4, breaks=[3, 6]), [(0, 3, 0, 3), (3, 6, 3, 6), (6, 10, 6, 10)])
+        self.assertEquals(split_windows(10, 4, overlap=2), [(0, 4, 0, 3), (2, 6, 3, 5), (4, 8, 5, 7), (6, 10, 7, 10)])
+    
+    def test_split_labels(self):
+        sentences = [[u"a"] * 3, [u"a", u",", u"a", u"a", u",", u"a", u"a"]]
+        
+        backends[u"lengths"] = label_lengths
+        try:
+            tags = label_batch(sentences, None, "utf-8", backend=u"lengths", max_length=4, overlap=0)
+        finally:
+            del backends[u"lengths"]
+        
+        self.assertEquals(tags, [[u"3"] * 3, [u"2", u"2", u"3", u"3", u"3", u"2", u"2"]])
+    
+    def test_documents(self):
+        documents = []
+        for content in [u"le\nchat\n\nil\ndort\n", u"un\nchien\n"]:
+            handle, path = tempfile.mkstemp(suffix=".conll")
+            os.write(handle, content.encode("utf-8"))
+            os.close(handle)
+            documents.append(Document.from_conll(path, [u"word"], u"word"))
+            os.remove(path)
+        
+        del batches[:]
+        backends[u"upper"] = label_upper
+        try:
+            label_documents(documents, None, u"POS", "utf-8", backend=u"upper")
+        finally:
+            del backends[u"upper"]
+        
+        self.assertEquals(len(batches), 1) # a single call for all documents
+        self.assertEquals([[[token[u"POS"] for token in sentence] for sentence in document.corpus] for document in documents], [[[u"LE", u"CHAT"], [u"IL", u"DORT"]], [[u"UN", u"CHIEN"]]])
+        self.assertEquals([tag.value for tag in documents[1].annotation(u"POS")], [u"UN", u"CHIEN"])
+    
+    def test_stream(self):
+        handle, path = tempfile.mkstemp(suffix=".conll")
+        os.write(handle, u"le\tDET\nchat\tNC\ndort\tV\n\nIl\tCLS\n\nun\tDET\nchien\tNC\n".encode("utf-8"))
+        os.close(handle)
+        document = Document.from_conll(path, [u"word", u"POS"], u"word")
+        os.remove(path)
+        
+        handle, command = tempfile.mkstemp(suffix=".py")
+        os.write(handle, fake_wapiti)
+        os.close(handle)
+        os.chmod(command, stat.S_IRWXU)
+        command_name = wapiti.command_name
+        wapiti.command_name = lambda: command
+        try:
+            self.assertRaises(IOError, wapiti.stream_label_corpus, document.corpus, u"short", u"label", "utf-8", [u"word", u"POS"])
+            wapiti.label_document(document, u"model", u"label", "utf-8", stream=True)
+            empty = Document(u"empty")
+            wapiti.label_document(empty, u"model", u"label", "utf-8", stream=True)
+        finally:
+            wapiti.command_name = command_name
+            os.remove(command)
+        
+        self.assertEquals([[token[u"label"] for token in sentence] for sentence in document.corpus], [[u"LE/0", u"CHAT/1", u"DORT/2"], [u"IL/0"], [u"UN/0", u"CHIEN/1"]])
+        self.assertEquals(document.corpus.fields, [u"word", u"POS", u"label"])
+        self.assertEquals(empty.corpus.fields, [u"label"])
+
+class FailingServer(WapitiServer):
+    """
+    A server whose running Wapiti answers with the wrong number of labels.
+    """
+    
+    starts = 0
+    
+    def start(self):
+        FailingServer.starts += 1
+        super(FailingServer, self).start()
+    
+    def _communicate(self, sentences):
+        raise IOError("expected %i labels from wapiti, got 0" %len(sentences[0]))
+
+@unittest.skipUnless(os.path.exists(command_name()), "Wapiti not built")
+class TestWapitiServer(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".model")
+        os.write(handle, model_text)
+        os.close(handle)
+        self.sentences = [[u"x"], [u"x", u"y"], [u"z", u"x"]]
+        self.labels    = [[u"A"], [u"B", u"B"], [u"A", u"A"]]
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def test_label(self):
+        server = WapitiServer(self.path)
+        try:
+            # sentences are framed: each one gets its own labels.
+            self.assertEquals(server.label(self.sentences), self.labels)
+            self.assertEquals(server.label(self.sentences[::-1]), self.labels[::-1])
+            self.assertEquals(server.label([]), [])
+        finally:
+            server.stop()
+    
+    def test_restart(self):
+        server = WapitiServer(self.path)
+        try:
+            server.label(self.sentences)
+            process = server._process
+            process.kill()
+            process.wait()
+            self.assertEquals(server.label(self.sentences), self.labels)
+            self.assertTrue(server.alive and server._process is not process)
+        finally:
+            server.stop()
+    
+    def test_live_error(self):
+        server = FailingServer(self.path)
+        FailingServer.starts = 0
+        try:
+            self.assertRaises(IOError, server.label, self.sentences)
+            self.assertEquals(FailingServer.starts, 1) # not restarted
+        finally:
+            server.stop()
+    
+    def test_fork(self):
+        server = WapitiServer(self.path)
+        try:
+            server.label(self.sentences)
+            process = server._process
+            pid     = os.fork()
+            if pid == 0:
+                # the child starts its own Wapiti process.
+                status = 1
+                try:
+                    if server.label(self.sentences) == self.labels and server._process is not process:
+                        status = 0
+                    server.stop()
+                finally:
+                    os._exit(status)
+            self.assertEquals(os.waitpid(pid, 0)[1], 0)
+            self.assertTrue(server._process is process and server.alive)
+            self.assertEquals(server.label(self.sentences), self.labels)
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)